@@ -1 +1,22 @@
-from api.weather_api import WeatherApi
\ No newline at end of file
+from api.weather_api import WeatherApi
+from api.weather_cache import WeatherCache
+from api.geo_candidate import GeoCandidate
+from api.geocoding_cache import GeocodingCache
+from api.reverse_geocoding_index import ReverseGeocodingIndex
+from api.weather_observation import WeatherObservation
+from api.forecast import DailyForecast, Forecast
+from api.weather_formatter import (
+    format_weather_observation,
+    format_weather_summary,
+    format_forecast_day,
+    format_forecast_week,
+)
+from api.quota_governor import (
+    Priority,
+    QuotaGovernor,
+    QuotaExceededError,
+    current_max_wait,
+    current_priority,
+)
+from api.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from api.retry_policy import RetryPolicy
\ No newline at end of file
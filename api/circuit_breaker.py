@@ -0,0 +1,129 @@
+import logging
+import time
+from enum import Enum
+from typing import Callable, Dict
+
+from api.quota_governor import QuotaExceededError
+from metrics import CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(QuotaExceededError):
+    # для пользователя это то же "сервис погоды недоступен, попробуйте позже",
+    # поэтому роутеры ловят его вместе с QuotaExceededError
+    pass
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+# числовой код состояния для /metrics
+STATE_CODES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к внешнему сервису.
+
+    После ``failure_threshold`` неудач подряд размыкается: запросы сразу
+    получают CircuitOpenError, не тратя квоту и время на таймауты. Через
+    ``recovery_timeout`` секунд пропускает ``half_open_max_calls`` пробных
+    запросов: успех замыкает цепь, неудача размыкает ее снова.
+    """
+
+    def __init__(
+        self,
+        name: str = "upstream",
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> CircuitState:
+        # переход в half_open ленивый: проверяется при обращении
+        if (
+            self._state is CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def allow(self) -> None:
+        """Бросает CircuitOpenError, если запрос сейчас нельзя пропускать."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return
+        if state is CircuitState.HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError(f"{self.name}: сервис недоступен, цепь разомкнута")
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self._state is not CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def release(self) -> None:
+        # запрос не дошел до сервиса (отмена, нет квоты) - пробный слот свободен
+        if self._state is CircuitState.HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record_failure(self) -> None:
+        if self._state is CircuitState.HALF_OPEN:
+            # пробный запрос не прошел - ждем еще один recovery_timeout
+            self._transition(CircuitState.OPEN)
+            return
+
+        self._failures += 1
+        if (
+            self._state is CircuitState.CLOSED
+            and self._failures >= self.failure_threshold
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        previous, self._state = self._state, state
+        self._probes = 0
+        if state is CircuitState.OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+        if state is CircuitState.CLOSED:
+            self._failures = 0
+
+        CIRCUIT_TRANSITIONS.labels(self.name, state.value).inc()
+        logger.warning(
+            "Предохранитель %s: %s -> %s (неудач подряд: %d)",
+            self.name,
+            previous.value,
+            state.value,
+            self._failures,
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "state": STATE_CODES[self.state],
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
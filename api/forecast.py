@@ -0,0 +1,248 @@
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+# секунд в сутках и порядковый номер 1970-01-01 для перевода номера дня в дату
+DAY = 24 * 60 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# когда считать, что в этот день будет дождь: сумма осадков или вероятность
+RAIN_MIN_MM = 0.3
+RAIN_MIN_POP = 0.5
+
+
+class DailyForecast:
+    """Сводка прогноза за один местный календарный день."""
+
+    __slots__ = (
+        "day",
+        "start",
+        "end",
+        "temp_min",
+        "temp_max",
+        "temp_mean",
+        "wind_max",
+        "precipitation",
+        "pop_max",
+        "description",
+    )
+
+    def __init__(
+        self,
+        day: int,
+        start: int,
+        end: int,
+        temp_min: float,
+        temp_max: float,
+        temp_mean: float,
+        wind_max: float,
+        precipitation: float,
+        pop_max: float,
+        description: str,
+    ) -> None:
+        self.day = day
+        # границы дня в колонках Forecast: [start, end)
+        self.start = start
+        self.end = end
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.temp_mean = temp_mean
+        self.wind_max = wind_max
+        self.precipitation = precipitation
+        self.pop_max = pop_max
+        self.description = description
+
+    @property
+    def date(self) -> date:
+        return date.fromordinal(EPOCH_ORDINAL + self.day)
+
+    @property
+    def rain_expected(self) -> bool:
+        return self.precipitation >= RAIN_MIN_MM or self.pop_max >= RAIN_MIN_POP
+
+    def __repr__(self) -> str:
+        return (
+            f"DailyForecast(date={self.date}, temp_min={self.temp_min:.1f}, "
+            f"temp_max={self.temp_max:.1f}, rain_expected={self.rain_expected})"
+        )
+
+
+class Forecast:
+    """Прогноз на 5 дней с шагом 3 часа в колоночном виде.
+
+    Вместо 40 словарей из ответа API - по одному array на величину: время,
+    температура, ветер, осадки за 3 часа и их вероятность. Описания погоды
+    хранятся словарем: колонка кодов и кортеж уникальных строк. Сводки по
+    дням считаются срезами колонок один раз и запоминаются, поэтому показ
+    сегодня/завтра/5 дней из кэша для любого числа пользователей почти
+    ничего не стоит.
+    """
+
+    __slots__ = (
+        "name",
+        "lat",
+        "lon",
+        "tz_offset",
+        "times",
+        "temp",
+        "wind",
+        "precipitation",
+        "pop",
+        "codes",
+        "descriptions",
+        "_days",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        lat: float,
+        lon: float,
+        tz_offset: int,
+        times: array,
+        temp: array,
+        wind: array,
+        precipitation: array,
+        pop: array,
+        codes: array,
+        descriptions: Tuple[str, ...],
+    ) -> None:
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        # сдвиг местного времени от UTC в секундах, по нему режутся дни
+        self.tz_offset = tz_offset
+        self.times = times
+        self.temp = temp
+        self.wind = wind
+        self.precipitation = precipitation
+        self.pop = pop
+        self.codes = codes
+        self.descriptions = descriptions
+        self._days: Optional[Tuple[DailyForecast, ...]] = None
+
+    @classmethod
+    def from_response(cls, forecast_data: dict) -> Optional["Forecast"]:
+        # в ответе /forecast cod - строка
+        if str(forecast_data.get("cod")) != "200" or not forecast_data.get("list"):
+            return None
+
+        city = forecast_data.get("city", {})
+        coord = city.get("coord", {})
+        times = array("q")
+        temp = array("f")
+        wind = array("f")
+        precipitation = array("f")
+        pop = array("f")
+        codes = array("B")
+        description_codes: Dict[str, int] = {}
+
+        for step in sorted(forecast_data["list"], key=lambda item: item["dt"]):
+            times.append(step["dt"])
+            temp.append(step["main"]["temp"])
+            wind.append(step.get("wind", {}).get("speed", 0.0))
+            precipitation.append(
+                step.get("rain", {}).get("3h", 0.0) + step.get("snow", {}).get("3h", 0.0)
+            )
+            pop.append(step.get("pop", 0.0))
+            weather = step.get("weather") or [{}]
+            description = weather[0].get("description", "")
+            codes.append(description_codes.setdefault(description, len(description_codes)))
+
+        return cls(
+            name=city.get("name", ""),
+            lat=coord.get("lat", 0.0),
+            lon=coord.get("lon", 0.0),
+            tz_offset=city.get("timezone", 0),
+            times=times,
+            temp=temp,
+            wind=wind,
+            precipitation=precipitation,
+            pop=pop,
+            codes=codes,
+            descriptions=tuple(description_codes),
+        )
+
+    @property
+    def coord(self) -> Tuple[float, float]:
+        return (self.lat, self.lon)
+
+    def local_day(self, timestamp: float) -> int:
+        return int(timestamp + self.tz_offset) // DAY
+
+    def days(self) -> Tuple[DailyForecast, ...]:
+        if self._days is None:
+            self._days = self._aggregate()
+        return self._days
+
+    def day(self, offset: int = 0, now: Optional[float] = None) -> Optional[DailyForecast]:
+        """Сводка на сегодня (offset=0), завтра (1) и т.д. по местному времени."""
+        target = self.local_day(time.time() if now is None else now) + offset
+        for daily in self.days():
+            if daily.day == target:
+                return daily
+        return None
+
+    def _aggregate(self) -> Tuple[DailyForecast, ...]:
+        times = self.times
+        if not times:
+            return ()
+
+        days = []
+        for day in range(self.local_day(times[0]), self.local_day(times[-1]) + 1):
+            # время отсортировано, границы дня находятся двоичным поиском
+            start = bisect_left(times, day * DAY - self.tz_offset)
+            end = bisect_left(times, (day + 1) * DAY - self.tz_offset, start)
+            if start == end:
+                continue
+
+            temp = self.temp[start:end]
+            codes = self.codes[start:end]
+            # самое частое описание за день; count по array идет без объектов Python
+            code = max(set(codes), key=codes.count)
+            days.append(
+                DailyForecast(
+                    day=day,
+                    start=start,
+                    end=end,
+                    temp_min=min(temp),
+                    temp_max=max(temp),
+                    temp_mean=sum(temp) / len(temp),
+                    wind_max=max(self.wind[start:end]),
+                    precipitation=sum(self.precipitation[start:end]),
+                    pop_max=max(self.pop[start:end]),
+                    description=self.descriptions[code],
+                )
+            )
+        return tuple(days)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __sizeof__(self) -> int:
+        # колонки и строки, чтобы лимит памяти кэша был честным
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self.name)
+            + sum(
+                sys.getsizeof(column)
+                for column in (
+                    self.times,
+                    self.temp,
+                    self.wind,
+                    self.precipitation,
+                    self.pop,
+                    self.codes,
+                )
+            )
+            + sum(sys.getsizeof(description) for description in self.descriptions)
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Forecast(name={self.name!r}, lat={self.lat}, lon={self.lon}, "
+            f"steps={len(self.times)})"
+        )
@@ -0,0 +1,53 @@
+from typing import List, Optional, Tuple
+
+GeoRow = Tuple[str, float, float, str, str]
+
+
+class GeoCandidate:
+    """Один вариант из ответа геокодера OpenWeatherMap."""
+
+    __slots__ = ("name", "lat", "lon", "country", "state")
+
+    def __init__(
+        self, name: str, lat: float, lon: float, country: str = "", state: str = ""
+    ) -> None:
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.country = country
+        self.state = state
+
+    @classmethod
+    def from_response(cls, item: dict) -> Optional["GeoCandidate"]:
+        try:
+            lat, lon = float(item["lat"]), float(item["lon"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        # русское название, если геокодер его знает
+        name = (item.get("local_names") or {}).get("ru") or item.get("name", "")
+        return cls(name, lat, lon, item.get("country", ""), item.get("state", ""))
+
+    @classmethod
+    def from_row(cls, row: GeoRow) -> "GeoCandidate":
+        return cls(*row)
+
+    def to_row(self) -> GeoRow:
+        return (self.name, self.lat, self.lon, self.country, self.state)
+
+    @property
+    def coord(self) -> Tuple[float, float]:
+        return (self.lat, self.lon)
+
+    def __repr__(self) -> str:
+        return f"GeoCandidate(name={self.name!r}, lat={self.lat}, lon={self.lon})"
+
+
+def parse_candidates(response: list) -> List[GeoCandidate]:
+    candidates = []
+    for item in response:
+        if isinstance(item, dict):
+            candidate = GeoCandidate.from_response(item)
+            if candidate is not None:
+                candidates.append(candidate)
+    return candidates
@@ -0,0 +1,137 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.geo_candidate import GeoCandidate
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingCache:
+    """Кэш прямого геокодирования "название -> варианты координат".
+
+    Ключ - нормализованный запрос: регистр, пробелы и ё/е не различаются.
+    Найденные варианты живут ``ttl`` секунд, пустой ответ (такого места нет)
+    кэшируется на ``negative_ttl``. Перед постоянным хранилищем ``store``
+    (таблица в SQLite) стоит небольшой LRU в памяти. Просроченные строки
+    хранилища удаляются при старте и затем не чаще раза в ``purge_interval``.
+    """
+
+    def __init__(
+        self,
+        store: Optional[Any] = None,
+        ttl: int = 30 * 24 * 60 * 60,
+        negative_ttl: int = 24 * 60 * 60,
+        max_entries: int = 10_000,
+        purge_interval: int = 6 * 60 * 60,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._clock = clock
+        self._next_purge = 0.0
+
+        # ключ -> (варианты, когда истекает)
+        self._entries: "OrderedDict[str, Tuple[List[GeoCandidate], float]]" = (
+            OrderedDict()
+        )
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.purged = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.casefold().replace("ё", "е").split())
+
+    def _remember(
+        self, key: str, candidates: List[GeoCandidate], expires_at: float
+    ) -> None:
+        self._entries[key] = (candidates, expires_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _hit(self, candidates: List[GeoCandidate]) -> List[GeoCandidate]:
+        if candidates:
+            self.hits += 1
+        else:
+            self.negative_hits += 1
+        return candidates
+
+    async def get(self, key: str) -> Optional[List[GeoCandidate]]:
+        """Варианты по ключу, пустой список для известного промаха, None - неизвестно."""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            candidates, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return self._hit(candidates)
+            del self._entries[key]
+
+        if self._store is not None:
+            try:
+                row = await self._store.get_geocoding(key)
+            except Exception as e:
+                logger.warning("Кэш геокодирования недоступен: %r", e)
+                row = None
+            if row is not None and row[1] > now:
+                candidates = [GeoCandidate.from_row(item) for item in json.loads(row[0])]
+                self._remember(key, candidates, row[1])
+                self.store_hits += 1
+                return self._hit(candidates)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, candidates: List[GeoCandidate]) -> None:
+        expires_at = self._clock() + (self.ttl if candidates else self.negative_ttl)
+        self._remember(key, candidates, expires_at)
+
+        if self._store is not None:
+            payload = json.dumps(
+                [candidate.to_row() for candidate in candidates],
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            try:
+                await self._store.set_geocoding(key, payload, int(expires_at))
+            except Exception as e:
+                logger.warning("Не удалось сохранить геокодирование %r: %r", key, e)
+            if self._clock() >= self._next_purge:
+                await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        # без чистки таблица копит промахи и устаревшие названия бесконечно
+        if self._store is None:
+            return 0
+        now = self._clock()
+        self._next_purge = now + self.purge_interval
+        try:
+            removed = await self._store.delete_geocoding_before(int(now))
+        except Exception as e:
+            logger.warning("Не удалось почистить кэш геокодирования: %r", e)
+            return 0
+        if removed:
+            logger.info("Из кэша геокодирования удалено просроченных записей: %d", removed)
+        self.purged += removed
+        return removed
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "purged": self.purged,
+        }
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    # меньше - важнее
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# приоритет текущего запроса; фоновые задачи выставляют BACKGROUND в своем контексте
+current_priority: ContextVar[Priority] = ContextVar(
+    "current_priority", default=Priority.INTERACTIVE
+)
+
+# предел ожидания для фоновых запросов текущей задачи, если ей нужно больше
+# background_max_wait; рассылка задает его по числу мест в пачке
+current_max_wait: ContextVar[Optional[float]] = ContextVar(
+    "current_max_wait", default=None
+)
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class QuotaGovernor:
+    """Token bucket на все запросы к OpenWeatherMap с приоритетной очередью.
+
+    Пока токены есть, запрос проходит сразу. Иначе он встает в очередь, где
+    интерактивные запросы обслуживаются раньше фоновых. Если очередь полна или
+    ожидаемое ожидание больше ``max_wait`` (``background_max_wait`` или
+    ``current_max_wait`` для фоновых), бросается QuotaExceededError. Длина очереди и ожидание считаются только по
+    тем, кто будет обслужен раньше: фоновые ожидающие интерактивному запросу
+    не мешают. Ответ 429 от API переводит ведро в долг на ``retry_after``
+    секунд, и новые токены появляются только после паузы.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 10,
+        max_queue: int = 100,
+        max_wait: float = 5.0,
+        background_max_wait: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # фоновые задачи (рассылки, обновления) могут ждать квоту дольше
+        self.background_max_wait = background_max_wait
+        self._clock = clock
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._pending = 0
+        self._pending_by_priority: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._seq = itertools.count()
+        self._wake_task: Optional[asyncio.Task] = None
+
+        self.granted = 0
+        self.rejected = 0
+        self.waited = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: Optional[Priority] = None) -> None:
+        if priority is None:
+            priority = current_priority.get()
+
+        if priority == Priority.INTERACTIVE:
+            max_wait = self.max_wait
+        else:
+            max_wait = max(self.background_max_wait, current_max_wait.get() or 0.0)
+
+        self._refill()
+        # ожидающие с тем же или более высоким приоритетом будут обслужены раньше
+        ahead = sum(
+            count
+            for waiter_priority, count in self._pending_by_priority.items()
+            if waiter_priority <= priority
+        )
+        if ahead == 0 and self._tokens >= 1:
+            self._tokens -= 1
+            self.granted += 1
+            return
+
+        expected_wait = (ahead + 1 - self._tokens) / self.rate
+        if ahead >= self.max_queue or expected_wait > max_wait:
+            self.rejected += 1
+            raise QuotaExceededError(
+                f"Лимит запросов к OpenWeatherMap исчерпан, очередь: {ahead}"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self._pending += 1
+        self._pending_by_priority[priority] += 1
+        future.add_done_callback(lambda _: self._on_waiter_done(priority))
+        if self._wake_task is None or self._wake_task.done():
+            self._wake_task = asyncio.create_task(self._wake_waiters())
+
+        started = self._clock()
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QuotaExceededError(
+                "Не дождались своей очереди к OpenWeatherMap"
+            ) from None
+
+        waited = self._clock() - started
+        self.granted += 1
+        self.waited += 1
+        self.total_wait += waited
+        self.max_observed_wait = max(self.max_observed_wait, waited)
+
+    def wait_budget(self, requests: int) -> float:
+        # сколько ждать последнему из requests новых фоновых запросов, если перед
+        # ними обслужат всю текущую очередь; лишний токен - запас на таймеры
+        return (self._pending + requests + 1) / self.rate
+
+    def throttle(self, retry_after: float) -> None:
+        # API сам сказал, что квота кончилась: до конца паузы токенов нет
+        self._refill()
+        self._tokens = min(self._tokens, -retry_after * self.rate)
+        self.throttled += 1
+
+    def _on_waiter_done(self, priority: Priority) -> None:
+        self._pending -= 1
+        self._pending_by_priority[priority] -= 1
+
+    async def _wake_waiters(self) -> None:
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    def close(self) -> None:
+        if self._wake_task is not None:
+            self._wake_task.cancel()
+            self._wake_task = None
+        for _, _, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._pending,
+            "interactive_queue_depth": self._pending_by_priority[Priority.INTERACTIVE],
+            "background_queue_depth": self._pending_by_priority[Priority.BACKGROUND],
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "waited": self.waited,
+            "throttled": self.throttled,
+            "avg_wait": self.total_wait / self.waited if self.waited else 0.0,
+            "max_wait": self.max_observed_wait,
+        }
@@ -0,0 +1,34 @@
+import random
+from typing import Callable
+
+
+class RetryPolicy:
+    """Сколько раз повторять идемпотентный запрос и сколько ждать между попытками.
+
+    Пауза - экспоненциальная с полным джиттером: случайное значение от нуля
+    до ``base_delay * 2**n`` (не больше ``max_delay``), чтобы повторы от многих
+    пользователей не били в восстанавливающийся сервис одновременно.
+    """
+
+    # 5xx - временные ответы, остальные статусы повтор не исправит;
+    # 429 повторяется отдельно, через паузу QuotaGovernor
+    RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        rand: Callable[[], float] = random.random,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rand = rand
+
+    def should_retry_status(self, status: int) -> bool:
+        return status in self.RETRY_STATUSES
+
+    def delay(self, retry: int) -> float:
+        # retry - номер повтора, начиная с нуля
+        return self._rand() * min(self.max_delay, self.base_delay * 2 ** retry)
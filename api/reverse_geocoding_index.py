@@ -0,0 +1,124 @@
+import logging
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# метров в одном градусе широты
+METERS_PER_DEGREE = 111_320.0
+EARTH_RADIUS_M = 6_371_000.0
+
+ReversePoint = Tuple[float, float, str]
+Cell = Tuple[int, int]
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class ReverseGeocodingIndex:
+    """Кэш обратного геокодирования на равномерной сетке.
+
+    Сторона ячейки равна ``radius_m`` по широте, поэтому ближайшее известное
+    название в радиусе ищется только в соседних ячейках - O(1) независимо от
+    числа точек. Пустое название тоже запоминается: "здесь ничего нет" (море,
+    тайга) не требует повторного запроса. Точки пишутся в ``store`` (SQLite) и
+    подгружаются при старте; и в памяти, и в хранилище держится не больше
+    ``max_entries`` последних точек.
+    """
+
+    def __init__(
+        self,
+        store: Optional[Any] = None,
+        radius_m: float = 500.0,
+        max_entries: int = 100_000,
+    ) -> None:
+        self._store = store
+        self.radius_m = radius_m
+        self.max_entries = max_entries
+        self._cell_deg = radius_m / METERS_PER_DEGREE
+
+        self._cells: Dict[Cell, List[ReversePoint]] = {}
+        # порядок добавления, чтобы вытеснять самые старые точки
+        self._order: Deque[Tuple[Cell, ReversePoint]] = deque()
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return (math.floor(lat / self._cell_deg), math.floor(lon / self._cell_deg))
+
+    async def load(self) -> None:
+        if self._store is None or self._loaded:
+            return
+        self._loaded = True
+        try:
+            points = await self._store.get_reverse_geocoding_points(self.max_entries)
+        except Exception as e:
+            logger.warning("Не удалось загрузить кэш обратного геокодирования: %r", e)
+            return
+        # из базы приходят новые первыми, добавляем от старых к новым
+        for lat, lon, name in reversed(points):
+            self._remember((lat, lon, name))
+
+    def lookup(self, lat: float, lon: float) -> Optional[str]:
+        """Название ближайшей известной точки в радиусе или None."""
+        cell_lat, cell_lon = self._cell(lat, lon)
+        # ближе к полюсам градус долготы короче, поэтому соседей по долготе больше
+        lon_span = math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))
+
+        best: Optional[ReversePoint] = None
+        best_distance = self.radius_m
+        for d_lat in (-1, 0, 1):
+            for d_lon in range(-lon_span, lon_span + 1):
+                for point in self._cells.get((cell_lat + d_lat, cell_lon + d_lon), ()):
+                    distance = distance_m(lat, lon, point[0], point[1])
+                    if distance <= best_distance:
+                        best, best_distance = point, distance
+
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return best[2]
+
+    def _remember(self, point: ReversePoint) -> None:
+        cell = self._cell(point[0], point[1])
+        self._cells.setdefault(cell, []).append(point)
+        self._order.append((cell, point))
+
+        if len(self._order) > self.max_entries:
+            old_cell, old_point = self._order.popleft()
+            points = self._cells[old_cell]
+            points.remove(old_point)
+            if not points:
+                del self._cells[old_cell]
+
+    async def add(self, lat: float, lon: float, name: str) -> None:
+        self._remember((lat, lon, name))
+        if self._store is not None:
+            try:
+                await self._store.add_reverse_geocoding(lat, lon, name, self.max_entries)
+            except Exception as e:
+                logger.warning("Не удалось сохранить название точки: %r", e)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "points": len(self._order),
+            "cells": len(self._cells),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from api.quota_governor import Priority, current_priority
+
+
+class SingleFlight:
+    """Склеивает одновременные вызовы с одинаковым ключом в один.
+
+    Первый вызов запускает задачу, остальные ждут ее же результат.
+    Ошибка или отмена самой задачи доходит до каждого ожидающего,
+    а отмена одного ожидающего не отменяет запрос для остальных.
+
+    Задача выполняется с приоритетом квоты того, кто ее запустил, поэтому
+    вызов присоединяется только к задаче не ниже своего приоритета:
+    интерактивный запрос не ждет в фоновой очереди чужой рассылки.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[Tuple[Hashable, Priority], asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        priority = current_priority.get()
+        task = self._find(key, priority)
+        if task is None:
+            flight = (key, priority)
+            task = asyncio.create_task(fn())
+            self._in_flight[flight] = task
+            task.add_done_callback(lambda _: self._forget(flight, task))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        return await asyncio.shield(task)
+
+    def _find(self, key: Hashable, priority: Priority) -> Any:
+        # Priority упорядочен от важного к фоновому
+        for flight_priority in Priority:
+            if flight_priority > priority:
+                break
+            task = self._in_flight.get((key, flight_priority))
+            if task is not None:
+                return task
+        return None
+
+    def _forget(self, flight: Tuple[Hashable, Priority], task: asyncio.Task) -> None:
+        if self._in_flight.get(flight) is task:
+            del self._in_flight[flight]
+        # результат забирают ожидающие, здесь только гасим "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def cancel_all(self) -> None:
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        self._in_flight.clear()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
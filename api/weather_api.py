@@ -1,9 +1,56 @@
+import asyncio
+import logging
+import time
 import aiohttp
-from typing import Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from api.circuit_breaker import CircuitBreaker, CircuitOpenError
+from api.forecast import Forecast
+from api.geo_candidate import GeoCandidate, parse_candidates
+from api.geocoding_cache import GeocodingCache
+from api.reverse_geocoding_index import ReverseGeocodingIndex
+from api.quota_governor import Priority, QuotaGovernor, current_priority
+from api.retry_policy import RetryPolicy
+from api.single_flight import SingleFlight
+from api.weather_cache import WeatherCache
+from api.weather_formatter import format_weather_observation
+from api.weather_observation import WeatherObservation
+from metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_RESPONSES, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+ObservationFetch = Callable[[], Awaitable[Optional[Any]]]
 
 
 class WeatherApi:
     BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+    GROUP_URL = "https://api.openweathermap.org/data/2.5/group"
+    GEOCODING_URL = "https://api.openweathermap.org/geo/1.0/direct"
+    REVERSE_GEOCODING_URL = "https://api.openweathermap.org/geo/1.0/reverse"
+    FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+    # сколько вариантов просить у геокодера на одно название
+    GEOCODING_LIMIT = 5
+
+    # пакетные запросы: ids на один вызов /group и параллельность одиночных запросов
+    GROUP_MAX_IDS = 20
+    FANOUT_CONCURRENCY = 8
+    CITY_IDS_LIMIT = 50_000
+
+    # параметры пула соединений общей сессии
+    CONNECTION_LIMIT = 100
+    CONNECTION_LIMIT_PER_HOST = 30
+    DNS_CACHE_TTL = 300
+    KEEPALIVE_TIMEOUT = 60
+
+    # сетевые ошибки, после которых запрос можно повторить
+    RETRY_EXCEPTIONS = (asyncio.TimeoutError, aiohttp.ClientError)
+
+    # пауза после 429 без Retry-After и верхняя граница для присланной
+    DEFAULT_RETRY_AFTER = 10.0
+    MAX_RETRY_AFTER = 300.0
+
     _instance = None
 
     def __new__(cls, *args, **kwargs):
@@ -11,8 +58,52 @@ class WeatherApi:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, api_key: str = None) -> None:
+    def __init__(
+        self,
+        api_key: str = None,
+        cache: Optional[WeatherCache] = None,
+        forecast_cache: Optional[WeatherCache] = None,
+        governor: Optional[QuotaGovernor] = None,
+        geocoding_cache: Optional[GeocodingCache] = None,
+        reverse_geocoding: Optional[ReverseGeocodingIndex] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+    ) -> None:
         self._api_key = api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+        # connect - установка соединения вместе с ожиданием места в пуле,
+        # sock_read - пауза между порциями ответа; total ограничивает одну попытку
+        self._timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self._cache = cache if cache is not None else WeatherCache()
+        # прогноз обновляется раз в 3 часа, поэтому живет дольше текущей погоды
+        self._forecast_cache = (
+            forecast_cache
+            if forecast_cache is not None
+            else WeatherCache(ttl=3600, stale_ttl=3 * 3600, max_entries=2_000)
+        )
+        self._governor = governor if governor is not None else QuotaGovernor()
+        self._geocoding = (
+            geocoding_cache if geocoding_cache is not None else GeocodingCache()
+        )
+        self._reverse_geocoding = (
+            reverse_geocoding
+            if reverse_geocoding is not None
+            else ReverseGeocodingIndex()
+        )
+        self._breaker = (
+            breaker if breaker is not None else CircuitBreaker("openweathermap")
+        )
+        self._retry = retry_policy if retry_policy is not None else RetryPolicy()
+        self._refresh_tasks: Dict[Hashable, asyncio.Task] = {}
+        self._flights = SingleFlight()
+        # ячейка сетки координат -> id города, запомненный из прошлых ответов
+        self._city_ids: "OrderedDict[Hashable, int]" = OrderedDict()
 
     @classmethod
     def get_instance(cls, api_key: str) -> "WeatherApi":
@@ -20,157 +111,455 @@ class WeatherApi:
             cls._instance = cls(api_key)
         return cls._instance
 
-    async def get_weather_in_location_by_name(
-        self, location_name: str
-    ) -> Optional[str]:
+    async def start(self) -> None:
+        if self._session is not None and not self._session.closed:
+            return
+
+        await self._reverse_geocoding.load()
+        await self._geocoding.purge_expired()
+
+        connector = aiohttp.TCPConnector(
+            limit=self.CONNECTION_LIMIT,
+            limit_per_host=self.CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=self.DNS_CACHE_TTL,
+            keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=self._timeout
+        )
+
+    async def close(self) -> None:
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        self._refresh_tasks.clear()
+        self._flights.cancel_all()
+        self._governor.close()
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # сессия создается лениво, если start() не был вызван хуком диспетчера
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats
+
+    @property
+    def forecast_cache_stats(self) -> Dict[str, int]:
+        return self._forecast_cache.stats
+
+    @property
+    def quota_stats(self) -> Dict[str, float]:
+        return self._governor.stats
+
+    def quota_wait_budget(self, requests: int) -> float:
+        return self._governor.wait_budget(requests)
+
+    @property
+    def geocoding_stats(self) -> Dict[str, int]:
+        return self._geocoding.stats
+
+    @property
+    def reverse_geocoding_stats(self) -> Dict[str, int]:
+        return self._reverse_geocoding.stats
+
+    @property
+    def breaker_stats(self) -> Dict[str, int]:
+        return self._breaker.stats
+
+    async def _cached(
+        self,
+        key: Hashable,
+        fetch: ObservationFetch,
+        cache: Optional[WeatherCache] = None,
+    ) -> Optional[Any]:
+        cache = cache if cache is not None else self._cache
+        cached = cache.get(key)
+        if cached is not None:
+            value, fresh = cached
+            if not fresh:
+                self._schedule_refresh(key, fetch, cache)
+            return value
+
+        try:
+            return await self._flights.do(
+                key, lambda: self._fetch_and_store(key, fetch, cache)
+            )
+        except CircuitOpenError:
+            # API недоступен: лучше старая погода, чем никакой
+            value = cache.last_known(key)
+            if value is None:
+                raise
+            return value
+
+    async def _fetch_and_store(
+        self, key: Hashable, fetch: ObservationFetch, cache: WeatherCache
+    ) -> Optional[Any]:
+        value = await fetch()
+        if value is None:
+            return None
+        if cache is self._cache:
+            self._store(key, value)
+        else:
+            cache.set(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: WeatherObservation) -> None:
+        self._cache.set(key, value)
+        if value.city_id:
+            self._city_ids[key] = value.city_id
+            self._city_ids.move_to_end(key)
+            if len(self._city_ids) > self.CITY_IDS_LIMIT:
+                self._city_ids.popitem(last=False)
+
+    def _schedule_refresh(
+        self, key: Hashable, fetch: ObservationFetch, cache: WeatherCache
+    ) -> None:
+        # stale-while-revalidate: устаревшая карточка уже отдана, обновляем в фоне
+        if key in self._refresh_tasks:
+            return
+
+        async def refresh() -> None:
+            current_priority.set(Priority.BACKGROUND)
+            try:
+                await self._flights.do(
+                    key, lambda: self._fetch_and_store(key, fetch, cache)
+                )
+            except CircuitOpenError:
+                # предохранитель уже сообщил о недоступности API
+                pass
+            except Exception as e:
+                logger.warning("Фоновое обновление %s не удалось: %r", key, e)
+            finally:
+                self._refresh_tasks.pop(key, None)
+
+        self._refresh_tasks[key] = asyncio.create_task(refresh())
+
+    def coord_key(self, coord: Tuple[float, float]) -> Hashable:
+        return self._cache.coord_key(coord)
+
+    @classmethod
+    def _retry_after(cls, response: aiohttp.ClientResponse) -> float:
+        try:
+            retry_after = float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return cls.DEFAULT_RETRY_AFTER
+        return min(max(retry_after, 0.0), cls.MAX_RETRY_AFTER)
+
+    @staticmethod
+    def _is_valid_coord(coord: Tuple[float, float]) -> bool:
+        return (
+            coord is not None
+            and len(coord) == 2
+            and isinstance(coord[0], (int, float))
+            and isinstance(coord[1], (int, float))
+        )
+
+    async def geocode(self, location_name: str) -> List[GeoCandidate]:
+        if not location_name or not location_name.strip():
+            return []
+
+        key = self._geocoding.normalize(location_name)
+        candidates = await self._geocoding.get(key)
+        if candidates is not None:
+            return candidates
+
+        return await self._flights.do(
+            ("geo", key), lambda: self._fetch_candidates(key, location_name)
+        )
+
+    async def _fetch_candidates(
+        self, key: str, location_name: str
+    ) -> List[GeoCandidate]:
         params = {
             "q": location_name,
-            "lang": "ru",
-            "units": "metric",
+            "limit": self.GEOCODING_LIMIT,
             "appid": self._api_key,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    return self._format_weather_data(response_data)
-                return None
+        response_data = await self._get_json(self.GEOCODING_URL, params)
+        if not isinstance(response_data, list):
+            # ошибку сервиса не запоминаем, в отличие от честного "не найдено"
+            return []
 
-    async def get_weather_in_location_by_coord(
-        self, coord: Tuple[float, float]
-    ) -> Optional[str]:
-        if (
-            len(coord) != 2
-            or not isinstance(coord[0], (int, float))
-            or not isinstance(coord[1], (int, float))
-        ):
+        candidates = parse_candidates(response_data)
+        await self._geocoding.set(key, candidates)
+        return candidates
+
+    async def get_observation_by_name(
+        self, location_name: str
+    ) -> Optional[WeatherObservation]:
+        # название сводится к координатам, дальше работает общий кэш по сетке
+        coord = await self.get_location_coords(location_name)
+        if coord is None:
             return None
+        return await self.get_observation_by_coord(coord)
 
-        lat, lon = coord[0], coord[1]
+    async def get_observation_by_coord(
+        self, coord: Tuple[float, float]
+    ) -> Optional[WeatherObservation]:
+        if not self._is_valid_coord(coord):
+            return None
 
+        # запрашивается центр ячейки: запись делят все ее пользователи, и в ней
+        # не должно оказаться точных координат того, кто спросил первым
+        lat, lon = self._cache.snap(coord)
+        return await self._cached(
+            self._cache.coord_key(coord),
+            lambda: self._fetch_observation({"lat": lat, "lon": lon}),
+        )
+
+    async def _get_json(self, url: str, params: dict) -> Optional[Any]:
+        # все запросы к API - идемпотентные GET, поэтому таймауты и 5xx повторяются
+        # метка эндпоинта - последняя часть пути: weather, group, direct, reverse
+        endpoint = url.rsplit("/", 1)[-1]
+        for attempt in range(self._retry.attempts):
+            if attempt:
+                UPSTREAM_RETRIES.labels(endpoint).inc()
+                await asyncio.sleep(self._retry.delay(attempt - 1))
+
+            # при разомкнутой цепи запрос падает сразу, не тратя квоту
+            self._breaker.allow()
+            last_attempt = attempt == self._retry.attempts - 1
+            try:
+                status, data = await self._request(endpoint, url, params)
+            except self.RETRY_EXCEPTIONS as e:
+                self._breaker.record_failure()
+                if last_attempt:
+                    raise
+                logger.info("Запрос %s не удался: %r, повторяем", endpoint, e)
+                continue
+            except BaseException:
+                self._breaker.release()
+                raise
+
+            if status == 429:
+                # квота исчерпана, но сервис жив: предохранитель это не считает,
+                # а следующая попытка подождет паузу в QuotaGovernor
+                self._breaker.release()
+                if last_attempt:
+                    return None
+                continue
+            if not self._retry.should_retry_status(status):
+                self._breaker.record_success()
+                return data
+            self._breaker.record_failure()
+            if last_attempt:
+                return None
+        return None
+
+    async def _request(
+        self, endpoint: str, url: str, params: dict
+    ) -> Tuple[int, Optional[Any]]:
+        # каждая попытка проходит через общий лимит квоты
+        await self._governor.acquire()
+
+        session = await self._get_session()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with session.get(url=url, params=params) as response:
+                status = str(response.status)
+                if response.status == 200:
+                    return response.status, await response.json()
+                if response.status == 429:
+                    self._governor.throttle(self._retry_after(response))
+                return response.status, None
+        finally:
+            UPSTREAM_REQUEST_SECONDS.labels(endpoint).observe(
+                time.perf_counter() - started
+            )
+            UPSTREAM_RESPONSES.labels(endpoint, status).inc()
+
+    async def _fetch_observation(self, query: dict) -> Optional[WeatherObservation]:
         params = {
-            "lat": lat,
-            "lon": lon,
+            **query,
             "lang": "ru",
             "units": "metric",
             "appid": self._api_key,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    return self._format_weather_data(response_data)
-                return None
-
-    def _format_weather_data(self, weather_data: dict) -> str:
-        code = weather_data.get("cod", None)
-
-        if code == 200:
-            coord = weather_data["coord"]
-            main = weather_data["main"]
-            weather = weather_data["weather"][0]
-
-            location_name = weather_data["name"]
-            lat, lon = coord["lat"], coord["lon"]
-
-            temp, feels_like = main["temp"], main["feels_like"]
-            description = weather["description"]
-            wind_speed = weather_data["wind"]["speed"]
-
-            return f"""
-<b>Локация {location_name}</b> 🏙️
+        response_data = await self._get_json(self.BASE_URL, params)
+        if response_data is None:
+            return None
+        return WeatherObservation.from_response(response_data)
+
+    async def get_observations_by_coords(
+        self, coords: List[Tuple[float, float]]
+    ) -> List[Optional[WeatherObservation]]:
+        # точки из кэша отдаются сразу, точки с известным id города идут пачками
+        # через /group, остальные - параллельными одиночными запросами
+        keys = [
+            self._cache.coord_key(coord) if self._is_valid_coord(coord) else None
+            for coord in coords
+        ]
+        by_key: Dict[Hashable, Optional[WeatherObservation]] = {}
+        coord_by_key = {key: coord for key, coord in zip(keys, coords) if key}
+
+        grouped: Dict[int, List[Hashable]] = {}
+        single: List[Hashable] = []
+        for key in coord_by_key:
+            if key in self._cache:
+                single.append(key)
+            elif key in self._city_ids:
+                grouped.setdefault(self._city_ids[key], []).append(key)
+            else:
+                single.append(key)
+
+        semaphore = asyncio.Semaphore(self.FANOUT_CONCURRENCY)
+
+        async def fetch_single(key: Hashable) -> None:
+            # одна неудачная точка не должна ронять всю сводку
+            async with semaphore:
+                try:
+                    by_key[key] = await self.get_observation_by_coord(coord_by_key[key])
+                except Exception as e:
+                    logger.warning("Погода для %s не получена: %r", key, e)
+
+        async def fetch_group(ids: List[int]) -> None:
+            async with semaphore:
+                try:
+                    observations = await self._fetch_group(ids)
+                except Exception as e:
+                    logger.warning("Пакетный запрос /group не удался: %r", e)
+                    observations = {}
+            missing: List[Hashable] = []
+            for city_id in ids:
+                observation = observations.get(city_id)
+                if observation is None:
+                    # id устарел или /group недоступен - точки запрашиваются отдельно
+                    missing.extend(grouped[city_id])
+                    continue
+                for key in grouped[city_id]:
+                    self._store(key, observation)
+                    by_key[key] = observation
+            # одиночные запросы параллельно, каждый сам берет тот же семафор
+            await asyncio.gather(*(fetch_single(key) for key in missing))
+
+        ids = list(grouped)
+        tasks = [fetch_single(key) for key in single]
+        tasks += [
+            fetch_group(ids[i : i + self.GROUP_MAX_IDS])
+            for i in range(0, len(ids), self.GROUP_MAX_IDS)
+        ]
+        await asyncio.gather(*tasks)
+
+        return [by_key.get(key) if key else None for key in keys]
+
+    async def _fetch_group(self, ids: List[int]) -> Dict[int, WeatherObservation]:
+        params = {
+            "id": ",".join(str(city_id) for city_id in ids),
+            "lang": "ru",
+            "units": "metric",
+            "appid": self._api_key,
+        }
 
-<b>Координаты 🌏</b>:
-<i>широта: {lat}</i>
-<i>долгота: {lon}</i>
+        response_data = await self._get_json(self.GROUP_URL, params)
+        if response_data is None:
+            return {}
 
-<b>Погода ☁️</b>
+        observations = {}
+        for item in response_data.get("list", []):
+            observation = WeatherObservation.from_response({**item, "cod": 200})
+            if observation is not None and observation.city_id:
+                observations[observation.city_id] = observation
+        return observations
 
-<i>{description}</i>
+    async def get_forecast_by_coord(
+        self, coord: Tuple[float, float]
+    ) -> Optional[Forecast]:
+        if not self._is_valid_coord(coord):
+            return None
 
-<i>температура: {temp}℃</i>
-<i>ощущается как: {feels_like}℃</i>
-<i>скорость ветра: {wind_speed} м/c</i>
-"""
-        return "Не удалось извлечь данные :("
+        # прогноз кэшируется по той же сетке, что и текущая погода, и так же
+        # запрашивается по центру ячейки
+        cell = self._forecast_cache.snap(coord)
+        return await self._cached(
+            ("forecast", self._forecast_cache.coord_key(coord)),
+            lambda: self._fetch_forecast(cell),
+            self._forecast_cache,
+        )
+
+    async def get_forecast_by_name(self, location_name: str) -> Optional[Forecast]:
+        coord = await self.get_location_coords(location_name)
+        if coord is None:
+            return None
+        return await self.get_forecast_by_coord(coord)
 
-    async def get_location_coords(
-        self, location_name: str
-    ) -> Optional[Tuple[float, float]]:
+    async def _fetch_forecast(self, coord: Tuple[float, float]) -> Optional[Forecast]:
         params = {
-            "q": location_name,
+            "lat": coord[0],
+            "lon": coord[1],
             "lang": "ru",
             "units": "metric",
             "appid": self._api_key,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    coord = response_data["coord"]
-                    lat, lon = coord["lat"], coord["lon"]
-                    return (lat, lon)
-                return None
+        response_data = await self._get_json(self.FORECAST_URL, params)
+        if response_data is None:
+            return None
+        return Forecast.from_response(response_data)
 
-    async def exist_location_by_coord(self, coord: Tuple[float, float]) -> bool:
-        if (
-            len(coord) != 2
-            or not isinstance(coord[0], (int, float))
-            or not isinstance(coord[1], (int, float))
-        ):
-            return False
+    async def get_weather_in_location_by_name(
+        self, location_name: str
+    ) -> Optional[str]:
+        coord = await self.get_location_coords(location_name)
+        if coord is None:
+            return None
+        return await self.get_weather_in_location_by_coord(coord)
 
-        lat, lon = coord[0], coord[1]
+    async def get_weather_in_location_by_coord(
+        self, coord: Tuple[float, float]
+    ) -> Optional[str]:
+        observation = await self.get_observation_by_coord(coord)
+        if observation is None:
+            return None
+        # наблюдение общее на ячейку, координаты показываем те, что спросили
+        return format_weather_observation(observation, coord)
 
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "appid": self._api_key,
-        }
+    async def get_location_coords(
+        self, location_name: str
+    ) -> Optional[Tuple[float, float]]:
+        candidates = await self.geocode(location_name)
+        return candidates[0].coord if candidates else None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                return response.status == 200
+    async def exist_location_by_coord(self, coord: Tuple[float, float]) -> bool:
+        return await self.get_observation_by_coord(coord) is not None
 
     async def exist_location_by_name(self, location_name: str) -> bool:
-        if not location_name:
-            return False
-
-        params = {
-            "q": location_name,
-            "appid": self._api_key,
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                return response.status == 200
+        return bool(await self.geocode(location_name))
 
     async def get_location_name_by_coord(
         self, coord: Tuple[float, float]
     ) -> Optional[str]:
-        if (
-            len(coord) != 2
-            or not isinstance(coord[0], (int, float))
-            or not isinstance(coord[1], (int, float))
-        ):
+        if not self._is_valid_coord(coord):
             return None
 
-        lat, lon = coord[0], coord[1]
+        # точка рядом с уже названной берет ее имя без запроса в сеть
+        name = self._reverse_geocoding.lookup(coord[0], coord[1])
+        if name is not None:
+            return name or None
 
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "lang": "ru",
-            "units": "metric",
-            "appid": self._api_key,
-        }
+        name = await self._flights.do(
+            ("reverse", round(coord[0], 5), round(coord[1], 5)),
+            lambda: self._fetch_location_name(coord),
+        )
+        return name or None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=self.BASE_URL, params=params) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    return response_data.get("name")
-                return None
+    async def _fetch_location_name(self, coord: Tuple[float, float]) -> Optional[str]:
+        params = {"lat": coord[0], "lon": coord[1], "limit": 1, "appid": self._api_key}
+
+        response_data = await self._get_json(self.REVERSE_GEOCODING_URL, params)
+        if not isinstance(response_data, list):
+            return None
+
+        candidates = parse_candidates(response_data)
+        # пустое имя тоже запоминаем: рядом с этой точкой названия нет
+        name = candidates[0].name if candidates else ""
+        await self._reverse_geocoding.add(coord[0], coord[1], name)
+        return name
@@ -0,0 +1,131 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class WeatherCache:
+    """LRU-кэш с TTL и окном stale-while-revalidate.
+
+    Запись свежая в течение ``ttl`` секунд, затем еще ``stale_ttl`` секунд
+    отдается как устаревшая (вызывающий код обновляет ее в фоне).
+    Просроченная запись не удаляется сразу: пока ее не вытеснит LRU, она
+    доступна через ``last_known`` на случай, если API недоступен.
+    Размер ограничен и количеством записей, и примерным объемом памяти.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        stale_ttl: float = 1800,
+        max_entries: int = 10_000,
+        max_bytes: int = 16 * 1024 * 1024,
+        grid_step: float = 0.05,
+        size_of: Callable[[Any], int] = sys.getsizeof,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.grid_step = grid_step
+        self._size_of = size_of
+        self._clock = clock
+
+        # key -> (value, created_at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.last_known_hits = 0
+
+    def snap(self, coord: Tuple[float, float]) -> Tuple[float, float]:
+        # центр ячейки сетки, в которую попадает точка
+        step = self.grid_step
+        lat = round(round(coord[0] / step) * step, 6)
+        lon = round(round(coord[1] / step) * step, 6)
+        return (lat, lon)
+
+    def coord_key(self, coord: Tuple[float, float]) -> Tuple[str, float, float]:
+        # близкие точки попадают в одну ячейку сетки и делят запись кэша
+        return ("coord", *self.snap(coord))
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """Возвращает (значение, свежее ли оно) или None при промахе."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, created_at, _ = entry
+        age = self._clock() - created_at
+        if age > self.ttl + self.stale_ttl:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if age <= self.ttl:
+            self.hits += 1
+            return value, True
+
+        self.stale_hits += 1
+        return value, False
+
+    def last_known(self, key: Hashable) -> Optional[Any]:
+        """Последнее сохраненное значение независимо от возраста."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.last_known_hits += 1
+        return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        # проверка без учета в статистике и без продления LRU
+        entry = self._entries.get(key)
+        return entry is not None and self._clock() - entry[1] <= self.ttl + self.stale_ttl
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = self._size_of(value)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, self._clock(), size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "last_known_hits": self.last_known_hits,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from html import escape
+from typing import List, Optional, Tuple
+
+from api.forecast import DailyForecast, Forecast
+from api.weather_observation import WeatherObservation
+
+# лимит Telegram на длину сообщения с запасом под хвост
+MESSAGE_LIMIT = 4000
+
+
+def format_weather_observation(
+    observation: WeatherObservation, coord: Optional[Tuple[float, float]] = None
+) -> str:
+    lat, lon = coord if coord is not None else observation.coord
+    return f"""
+<b>Локация {observation.name}</b> 🏙️
+
+<b>Координаты 🌏</b>:
+<i>широта: {lat}</i>
+<i>долгота: {lon}</i>
+
+<b>Погода ☁️</b>
+
+<i>{observation.description}</i>
+
+<i>температура: {observation.temp}℃</i>
+<i>ощущается как: {observation.feels_like}℃</i>
+<i>скорость ветра: {observation.wind_speed} м/c</i>
+"""
+
+
+def format_weather_summary(
+    locations: List[Tuple[str, Optional[WeatherObservation]]],
+    title: str = "Погода во всех ваших локациях 🌍",
+) -> str:
+    lines = [f"<b>{title}</b>", ""]
+    length = len(lines[0]) + 1
+
+    for index, (name, observation) in enumerate(locations):
+        name = escape(name)
+        if observation is None:
+            line = f"<b>{name}</b>: <i>нет данных</i>"
+        else:
+            line = (
+                f"<b>{name}</b>: {observation.temp}℃, {observation.description}, "
+                f"ветер {observation.wind_speed} м/c"
+            )
+
+        if length + len(line) + 1 > MESSAGE_LIMIT:
+            lines.append(f"<i>...и еще {len(locations) - index}</i>")
+            break
+        lines.append(line)
+        length += len(line) + 1
+
+    return "\n".join(lines)
+
+
+WEEKDAYS = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+
+
+def _day_title(daily: DailyForecast) -> str:
+    day = daily.date
+    return f"{WEEKDAYS[day.weekday()]} {day.day:02d}.{day.month:02d}"
+
+
+def _rain_mark(daily: DailyForecast) -> str:
+    return "🌧 дождь" if daily.rain_expected else "без осадков"
+
+
+def format_forecast_day(forecast: Forecast, daily: DailyForecast, title: str) -> str:
+    lines = [
+        f"<b>{title}: {escape(forecast.name)}, {_day_title(daily)}</b>",
+        "",
+        f"<i>{daily.description}</i>",
+        f"<i>температура: от {daily.temp_min:.0f} до {daily.temp_max:.0f}℃, "
+        f"в среднем {daily.temp_mean:.0f}℃</i>",
+        f"<i>ветер до {daily.wind_max:.1f} м/c, {_rain_mark(daily)}</i>",
+        "",
+    ]
+    # шаги этого дня - срезы колонок между границами дня
+    start, end = daily.start, daily.end
+    for timestamp, temp, wind, precipitation in zip(
+        forecast.times[start:end],
+        forecast.temp[start:end],
+        forecast.wind[start:end],
+        forecast.precipitation[start:end],
+    ):
+        local = datetime.fromtimestamp(timestamp + forecast.tz_offset, timezone.utc)
+        line = f"{local:%H:%M}  {temp:.0f}℃, ветер {wind:.1f} м/c"
+        if precipitation:
+            line += f", осадки {precipitation:.1f} мм"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_forecast_week(forecast: Forecast) -> str:
+    lines = [f"<b>Прогноз на 5 дней: {escape(forecast.name)}</b>", ""]
+    for daily in forecast.days():
+        lines.append(
+            f"<b>{_day_title(daily)}</b>: {daily.temp_min:.0f}..{daily.temp_max:.0f}℃, "
+            f"{daily.description}, {_rain_mark(daily)}"
+        )
+    return "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import sys
+from typing import Optional, Tuple
+
+
+class WeatherObservation:
+    """Компактный результат одного запроса текущей погоды."""
+
+    __slots__ = (
+        "name",
+        "lat",
+        "lon",
+        "description",
+        "temp",
+        "feels_like",
+        "wind_speed",
+        "city_id",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        lat: float,
+        lon: float,
+        description: str,
+        temp: float,
+        feels_like: float,
+        wind_speed: float,
+        city_id: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.description = description
+        self.temp = temp
+        self.feels_like = feels_like
+        self.wind_speed = wind_speed
+        # id города в OpenWeatherMap, нужен для пакетного эндпоинта /group
+        self.city_id = city_id
+
+    @classmethod
+    def from_response(cls, weather_data: dict) -> Optional["WeatherObservation"]:
+        if weather_data.get("cod", None) != 200:
+            return None
+
+        coord = weather_data["coord"]
+        main = weather_data["main"]
+        weather = weather_data["weather"][0]
+
+        return cls(
+            name=weather_data.get("name", ""),
+            lat=coord["lat"],
+            lon=coord["lon"],
+            description=weather["description"],
+            temp=main["temp"],
+            feels_like=main["feels_like"],
+            wind_speed=weather_data["wind"]["speed"],
+            city_id=weather_data.get("id") or None,
+        )
+
+    @property
+    def coord(self) -> Tuple[float, float]:
+        return (self.lat, self.lon)
+
+    def __sizeof__(self) -> int:
+        # учитываем строки, чтобы лимит памяти кэша был честным
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self.name)
+            + sys.getsizeof(self.description)
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"WeatherObservation(name={self.name!r}, lat={self.lat}, lon={self.lon}, "
+            f"temp={self.temp})"
+        )
@@ -0,0 +1,82 @@
+"""Стоимость маршрутизации callback-запроса в зависимости от числа хендлеров.
+
+Цепочка фильтров ``F.data == ...pack()`` в роутере aiogram проверяется по
+очереди, поэтому последняя кнопка стоит O(N). CallbackDispatcher находит
+хендлер по словарю за O(1).
+
+Запуск: python -m benchmarks.bench_callback_dispatch [--calls N]
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery
+
+from callbacks import (
+    CallbackDispatcher,
+    NextPageCallback,
+    UserCallback,
+    UserLocationCallback,
+)
+from benchmarks.stubs import make_callback_update
+
+SIZES = (5, 20, 100, 500)
+
+
+async def handler(callback: CallbackQuery) -> str:
+    return callback.data
+
+
+def make_callback(data: str) -> CallbackQuery:
+    return CallbackQuery.model_validate(make_callback_update(1, 1, data)["callback_query"])
+
+
+def build_linear(size: int) -> Router:
+    router = Router()
+    for i in range(size):
+        data = UserCallback(action=f"a{i}").pack()
+        router.callback_query.register(handler, F.data == data)
+    return router
+
+
+def build_table(size: int) -> CallbackDispatcher:
+    dispatcher = CallbackDispatcher()
+    for i in range(size):
+        dispatcher.register(UserCallback(action=f"a{i}"))(handler)
+    return dispatcher
+
+
+async def timed(router: Router, callback: CallbackQuery, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        result = await router.propagate_event("callback_query", callback)
+    elapsed = time.perf_counter() - started
+    assert result == callback.data, "хендлер не вызван"
+    return elapsed / calls
+
+
+async def main(calls: int) -> None:
+    print(f"{'handlers':>8} {'F.data chain':>14} {'dict table':>12}")
+    for size in SIZES:
+        # худший случай для цепочки - последняя зарегистрированная кнопка
+        callback = make_callback(UserCallback(action=f"a{size - 1}").pack())
+        linear = await timed(build_linear(size), callback, calls)
+        table = await timed(build_table(size).router, callback, calls)
+        print(f"{size:>8} {linear * 1e6:>12.1f}us {table * 1e6:>10.1f}us")
+
+    # название локации с "next_page" внутри больше не уходит в листание
+    dispatcher = CallbackDispatcher()
+    dispatcher.register(UserLocationCallback)(handler)
+    dispatcher.register(NextPageCallback)(handler)
+    data = UserLocationCallback(location_name="next_page").pack()
+    _, callback_data = dispatcher.resolve(data)
+    assert isinstance(callback_data, UserLocationCallback), "ложное совпадение префикса"
+    print("user_location:next_page -> UserLocationCallback")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
@@ -0,0 +1,133 @@
+"""Очередь обновлений по чатам и схлопывание повторных нажатий.
+
+Каждый пользователь несколько раз подряд жмет одну и ту же кнопку локации
+(или "Вперед"), как при медленном ответе бота. Один и тот же поток обновлений
+прогоняется через настоящий Dispatcher без ChatSerializer и с ним; сравниваются
+запросы к OpenWeatherMap, вызовы editMessageText и общее время. Кэш погоды
+отключен, чтобы повторные нажатия, пришедшие после ответа API, тоже шли в сеть.
+
+Запуск:
+    python -m benchmarks.bench_chat_serialization [--users N] [--taps N] [--spread S]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+from aiogram import Bot
+from aiogram.types import Update
+
+import main
+from api import WeatherCache
+from callbacks import NextPageCallback, UserLocationCallback
+from database import SqlliteDatabase
+from benchmarks.bench_e2e import SEEDED_LOCATIONS, SEEDED_USERS, page_cursors, seed_users
+from benchmarks.stubs import (
+    FakeBotApiServer,
+    FakeWeatherServer,
+    make_bot,
+    make_callback_update,
+    make_weather_api,
+)
+
+
+def _burst(users: int, taps: int, spread: float, seed: int) -> list:
+    # (задержка, обновление): у каждого пользователя taps одинаковых нажатий за spread секунд
+    rnd = random.Random(seed)
+    update_id = 0
+    schedule = []
+    for chat_id in SEEDED_USERS[:users]:
+        if rnd.random() < 0.5:
+            name = f"Локация {rnd.randrange(SEEDED_LOCATIONS)}"
+            data = UserLocationCallback(location_name=name).pack()
+        else:
+            data = NextPageCallback(cur_page=1, after_id=page_cursors[chat_id]).pack()
+        for _ in range(taps):
+            update_id += 1
+            schedule.append(
+                (rnd.uniform(0, spread), make_callback_update(update_id, chat_id, data))
+            )
+    return schedule
+
+
+async def _run(
+    bot: Bot, schedule: list, weather_server: FakeWeatherServer, bot_api: FakeBotApiServer
+) -> dict:
+    weather_server.reset()
+    bot_api.calls.clear()
+
+    async def tap(delay: float, update: dict) -> None:
+        await asyncio.sleep(delay)
+        await main.dp.feed_update(bot, Update.model_validate(update))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(tap(delay, update) for delay, update in schedule))
+    return {
+        "elapsed": time.perf_counter() - started,
+        "upstream": weather_server.hits,
+        "edits": len(bot_api.calls_of("editmessagetext")),
+        "answers": len(bot_api.calls_of("answercallbackquery")),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    weather_server = FakeWeatherServer(latency=args.owm_latency)
+    await weather_server.start()
+    bot_api = FakeBotApiServer(latency=args.bot_latency)
+    await bot_api.start()
+    bot = make_bot(bot_api)
+
+    make_weather_api(weather_server, cache=WeatherCache(max_entries=0))
+    await main.on_startup(bot)
+    await seed_users(random.Random(args.seed))
+
+    schedule = _burst(args.users, args.taps, args.spread, args.seed)
+    middlewares = main.dp.update.outer_middleware
+
+    middlewares.unregister(main.chat_serializer)
+    off = await _run(bot, schedule, weather_server, bot_api)
+    middlewares.register(main.chat_serializer)
+    on = await _run(bot, schedule, weather_server, bot_api)
+
+    print(
+        f"users={args.users} taps={args.taps} spread={args.spread}s "
+        f"owm_latency={args.owm_latency}s bot_latency={args.bot_latency}s"
+    )
+    print(f"{'':<16} {'upstream':>9} {'edits':>7} {'answers':>8} {'elapsed':>9}")
+    for name, result in (("without", off), ("chat_serializer", on)):
+        print(
+            f"{name:<16} {result['upstream']:>9} {result['edits']:>7} "
+            f"{result['answers']:>8} {result['elapsed']:>8.2f}s"
+        )
+    print(f"stats: {main.chat_serializer.stats}")
+
+    await main.on_shutdown()
+    await bot.session.close()
+    await bot_api.stop()
+    await weather_server.stop()
+
+    assert on["upstream"] < off["upstream"], "повторные нажатия не схлопнулись"
+    assert on["edits"] < off["edits"]
+    # разные чаты обрабатываются параллельно: очередь по чату не растягивает всплеск
+    assert on["elapsed"] < off["elapsed"] * 1.5 + 0.5
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--taps", type=int, default=4)
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--owm-latency", type=float, default=0.1)
+    parser.add_argument("--bot-latency", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
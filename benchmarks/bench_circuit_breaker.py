@@ -0,0 +1,156 @@
+"""Поведение WeatherApi при сбоях OpenWeatherMap: таймауты, повторы, предохранитель.
+
+Заглушка по очереди отвечает медленно, отдает 500 и восстанавливается.
+Проверяется, что попытка ограничена таймаутом, случайные 5xx закрываются
+повторами, после серии сбоев запросы падают сразу без обращения к заглушке,
+точки из кэша отдаются последним известным значением, а после
+recovery_timeout один пробный запрос замыкает цепь обратно. Ответ 429
+предохранитель не размыкает: повтор ждет Retry-After в QuotaGovernor.
+
+Запуск: python -m benchmarks.bench_circuit_breaker [--requests N]
+"""
+import argparse
+import asyncio
+import time
+
+from api import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    QuotaGovernor,
+    RetryPolicy,
+    WeatherCache,
+)
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _coord(i: int) -> tuple:
+    # точки в разных ячейках сетки кэша
+    return (40 + i * 0.1, 30 + i * 0.1)
+
+
+async def main(requests: int) -> None:
+    server = FakeWeatherServer(seed=1)
+    await server.start()
+
+    cache_clock = FakeClock()
+    breaker_clock = FakeClock()
+    breaker = CircuitBreaker(
+        "bench", failure_threshold=5, recovery_timeout=30, clock=breaker_clock
+    )
+    governor = QuotaGovernor(rate=1000, burst=1000)
+    api = make_weather_api(
+        server,
+        governor=governor,
+        cache=WeatherCache(ttl=600, stale_ttl=0, clock=cache_clock),
+        breaker=breaker,
+        retry_policy=RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.05),
+        connect_timeout=0.5,
+        read_timeout=0.1,
+    )
+    await api.start()
+
+    # погода по точке 0 попадает в кэш и потом служит последним известным значением
+    known = await api.get_observation_by_coord(_coord(0))
+    assert known is not None
+
+    # 1. случайные 500 закрываются повторами
+    server.error_rate = 0.3
+    ok = 0
+    for i in range(1, requests + 1):
+        if await api.get_observation_by_coord(_coord(i)) is not None:
+            ok += 1
+    print(
+        f"error_rate=0.3: ok={ok}/{requests} upstream_hits={server.hits} "
+        f"errors={server.errors} breaker={breaker.state.value}"
+    )
+    # без повторов успешных было бы ~70%, с тремя попытками - ~97%
+    assert ok >= requests * 0.9, f"повторы не помогли: {ok}/{requests}"
+    server.error_rate = 0.0
+    # счетчик неудач подряд после случайных 500 начинаем заново
+    breaker.record_success()
+
+    # 2. медленный ответ обрывается таймаутом, серия сбоев размыкает цепь
+    server.latency = 1.0
+    started = time.perf_counter()
+    try:
+        await api.get_observation_by_coord(_coord(requests + 1))
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("ожидался таймаут")
+    elapsed = time.perf_counter() - started
+    print(f"latency=1s read_timeout=0.1s: 3 попытки за {elapsed * 1000:.0f}ms")
+    assert elapsed < 0.6, f"таймаут попытки не сработал: {elapsed:.2f}s"
+
+    server.latency = 0.0
+    server.error_rate = 1.0
+    for i in range(requests + 2, requests + 5):
+        try:
+            await api.get_observation_by_coord(_coord(i))
+        except CircuitOpenError:
+            break
+    assert breaker.state is CircuitState.OPEN, breaker.stats
+
+    # 3. разомкнутая цепь: мгновенный отказ без запроса к заглушке
+    server.reset()
+    failed = 0
+    started = time.perf_counter()
+    for i in range(requests + 10, 2 * requests + 10):
+        try:
+            await api.get_observation_by_coord(_coord(i))
+        except CircuitOpenError:
+            failed += 1
+    per_request = (time.perf_counter() - started) / requests
+    print(
+        f"breaker open: failed_fast={failed}/{requests} upstream_hits={server.hits} "
+        f"{per_request * 1e6:.0f}us/request"
+    )
+    assert failed == requests and server.hits == 0
+    assert per_request < 0.005
+
+    # 4. точка из кэша отдается последним известным значением, даже просроченная
+    cache_clock.now += 3600
+    stale = await api.get_observation_by_coord(_coord(0))
+    print(f"breaker open, cache expired: last_known={stale is known}")
+    assert stale is known
+    assert server.hits == 0
+
+    # 5. после recovery_timeout пробный запрос замыкает цепь
+    server.error_rate = 0.0
+    breaker_clock.now += 31
+    assert breaker.state is CircuitState.HALF_OPEN
+    recovered = await api.get_observation_by_coord(_coord(3 * requests))
+    print(f"recovery: state={breaker.state.value} stats={breaker.stats}")
+    assert recovered is not None and breaker.state is CircuitState.CLOSED
+
+    # 6. 429 - исчерпанная квота, а не сбой: повтор после Retry-After, цепь замкнута
+    server.rate_limited, server.retry_after = 1, 1
+    started = time.perf_counter()
+    throttled = await api.get_observation_by_coord(_coord(3 * requests + 1))
+    elapsed = time.perf_counter() - started
+    print(f"429 Retry-After=1: retried after {elapsed * 1000:.0f}ms {governor.stats}")
+    assert throttled is not None and 0.9 < elapsed < 2.0
+    server.rate_limited, server.retry_after = 50, 0
+    for i in range(3 * requests + 2, 3 * requests + 20):
+        await api.get_observation_by_coord(_coord(i))
+    print(f"series of 429: breaker={breaker.stats}")
+    assert breaker.state is CircuitState.CLOSED and breaker.stats["consecutive_failures"] == 0
+
+    await api.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
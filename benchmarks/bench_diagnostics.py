@@ -0,0 +1,113 @@
+"""Профиль медленных обновлений и снимки памяти на настоящем Dispatcher.
+
+Медленный OpenWeatherMap должен попасть в отчет как ожидание upstream, а
+медленный Telegram - как telegram. Для быстрых обновлений замеряется цена
+самого middleware. Снимки памяти должны показать строку, где память растет.
+
+Запуск: python -m benchmarks.bench_diagnostics [--updates N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+from aiogram.types import Update
+
+import main
+from database import SqlliteDatabase
+from diagnostics import MemoryTracker
+from settings import slow_update_profiler
+from benchmarks.stubs import (
+    FakeBotApiServer,
+    FakeWeatherServer,
+    make_bot,
+    make_message_update,
+    make_weather_api,
+)
+
+THRESHOLD = 0.2
+
+
+async def feed(bot, update_id: int, text: str) -> None:
+    update = make_message_update(update_id, 1000 + update_id, text)
+    await main.dp.feed_update(bot, Update.model_validate(update))
+
+
+def last_report(directory: str) -> str:
+    name = sorted(os.listdir(directory))[-1]
+    with open(os.path.join(directory, name), encoding="utf-8") as f:
+        return f.read()
+
+
+async def main_bench(updates: int) -> None:
+    assert slow_update_profiler is not None, "slow_update_profiling выключен"
+    tmp = tempfile.mkdtemp()
+    SqlliteDatabase(os.path.join(tmp, "bench.db"))
+    slow_update_profiler.directory = os.path.join(tmp, "slow")
+    slow_update_profiler.threshold = THRESHOLD
+    slow_update_profiler.cooldown = 0
+
+    weather_server = FakeWeatherServer(latency=0.6)
+    await weather_server.start()
+    bot_api = FakeBotApiServer()
+    await bot_api.start()
+    bot = make_bot(bot_api)
+    make_weather_api(weather_server)
+    await main.on_startup(bot)
+
+    await feed(bot, 1, "/weather_coord 55.75 37.61")
+    report = last_report(slow_update_profiler.directory)
+    print(report)
+    assert "message /weather_coord" in report
+    assert "upstream" in report.split("частые стеки:")[0], "время не отнесено к upstream"
+
+    bot_api.latency = 0.6
+    await feed(bot, 2, "/start")
+    report = last_report(slow_update_profiler.directory)
+    assert "telegram" in report.split("частые стеки:")[0], "время не отнесено к telegram"
+    bot_api.latency = 0.0
+    print(f"stats: {slow_update_profiler.stats}")
+
+    # цена middleware на быстром обновлении: сам middleware против голого хендлера
+    async def handler(event, data):
+        return None
+
+    event = Update.model_validate(make_message_update(3, 3, "/start"))
+    slow_update_profiler.threshold = THRESHOLD
+    started = time.perf_counter()
+    for _ in range(updates):
+        await handler(event, {})
+    bare = (time.perf_counter() - started) / updates
+    started = time.perf_counter()
+    for _ in range(updates):
+        await slow_update_profiler(handler, event, {})
+    wrapped = (time.perf_counter() - started) / updates
+    print(f"middleware overhead: {(wrapped - bare) * 1e6:.1f}us/update")
+    assert wrapped - bare < 50e-6, "профилировщик дорог для быстрых обновлений"
+
+    await main.on_shutdown()
+    await bot.session.close()
+    await bot_api.stop()
+    await weather_server.stop()
+
+    tracker = MemoryTracker(os.path.join(tmp, "memory"))
+    tracker.start()
+    assert tracker.snapshot() == ([], None), "первый снимок - точка отсчета"
+    leak = [bytearray(1024) for _ in range(5000)]
+    lines, path = tracker.snapshot()
+    tracker.stop()
+    print("\n".join(lines[:3]))
+    assert "bench_diagnostics.py" in lines[0], "рост памяти не найден"
+    assert os.path.exists(path)
+    del leak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(main_bench(args.updates))
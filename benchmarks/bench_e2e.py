@@ -0,0 +1,281 @@
+"""Сквозной бенчмарк: настоящий Dispatcher и роутеры из main.py против заглушек.
+
+OpenWeatherMap и Telegram Bot API заменены локальными серверами с
+настраиваемой задержкой и долей ошибок. Для каждого сценария (меню, погода по
+имени и по координатам, добавление локации, листание, нажатие на локацию)
+генерируются синтетические обновления, которые идут через dp.feed_update.
+Результат - пропускная способность и p50/p95/p99 времени обработки, он же
+сохраняется в JSON, чтобы сравнивать коммиты между собой.
+
+Запуск:
+    python -m benchmarks.bench_e2e [--updates N] [--concurrency N] [--flows menu,paging]
+        [--owm-latency S] [--owm-error-rate P] [--bot-latency S] [--bot-error-rate P]
+        [--output FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+from aiogram import Bot
+from aiogram.types import Update
+
+import main
+from callbacks import NextPageCallback, UserLocationCallback
+from database import SqlliteDatabase
+from settings import database
+from benchmarks.stubs import (
+    FakeBotApiServer,
+    FakeWeatherServer,
+    make_bot,
+    make_callback_update,
+    make_message_update,
+    make_weather_api,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# пользователи с длинным списком локаций для листания и нажатий
+SEEDED_USERS = range(900_000, 900_100)
+SEEDED_LOCATIONS = 20
+# популярные города: их запрашивают чаще остальных
+CITY_NAMES = [f"Город {i}" for i in range(50)]
+
+UpdateFactory = Callable[[int, int, random.Random], dict]
+
+
+def _menu(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    return make_message_update(update_id, chat_id, "/start")
+
+
+def _weather_name(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    # распределение с длинным хвостом, как у настоящих запросов городов
+    name = CITY_NAMES[min(int(rnd.expovariate(0.2)), len(CITY_NAMES) - 1)]
+    return make_message_update(update_id, chat_id, f"/weather_name {name}")
+
+
+def _weather_coord(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    lat, lon = rnd.uniform(41, 70), rnd.uniform(20, 150)
+    return make_message_update(update_id, chat_id, f"/weather_coord {lat:.4f} {lon:.4f}")
+
+
+def _add_location(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    if rnd.random() < 0.5:
+        name = rnd.choice(CITY_NAMES)
+        return make_message_update(update_id, chat_id, f"/add_location name {name}")
+    # половина добавляет по координатам, как при отправке геопозиции
+    lat, lon = rnd.uniform(41, 70), rnd.uniform(20, 150)
+    return make_message_update(
+        update_id, chat_id, f"/add_location coord {lat:.4f} {lon:.4f}"
+    )
+
+
+def _paging(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    chat_id = rnd.choice(SEEDED_USERS)
+    data = NextPageCallback(cur_page=1, after_id=page_cursors[chat_id]).pack()
+    return make_callback_update(update_id, chat_id, data)
+
+
+def _location_tap(update_id: int, chat_id: int, rnd: random.Random) -> dict:
+    chat_id = rnd.choice(SEEDED_USERS)
+    name = f"Локация {rnd.randrange(SEEDED_LOCATIONS)}"
+    data = UserLocationCallback(location_name=name).pack()
+    return make_callback_update(update_id, chat_id, data)
+
+
+FLOWS: Dict[str, UpdateFactory] = {
+    "menu": _menu,
+    "weather_name": _weather_name,
+    "weather_coord": _weather_coord,
+    "add_location": _add_location,
+    "paging": _paging,
+    "location_tap": _location_tap,
+}
+
+# id последней локации на первой странице у каждого засеянного пользователя
+page_cursors: Dict[int, int] = {}
+
+
+async def seed_users(rnd: random.Random) -> None:
+    for user_id in SEEDED_USERS:
+        for i in range(SEEDED_LOCATIONS):
+            await database.add_location(
+                f"Локация {i}", user_id, rnd.uniform(41, 70), rnd.uniform(20, 150)
+            )
+        page = await database.get_user_locations_page(user_id, 6)
+        page_cursors[user_id] = page[-1][0]
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_flow(
+    bot: Bot,
+    factory: UpdateFactory,
+    updates: int,
+    concurrency: int,
+    update_ids: "itertools.count[int]",
+    rnd: random.Random,
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(update: dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await main.dp.feed_update(bot, Update.model_validate(update))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    batch = [
+        factory(next(update_ids), 100_000 + i, rnd) for i in range(updates)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in batch))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "updates": updates,
+        "errors": errors,
+        "throughput": round(updates / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_comparison(results: dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nсравнение с {baseline.get('commit', baseline_path)}:")
+    for flow, current in results["flows"].items():
+        old = baseline.get("flows", {}).get(flow)
+        if not old:
+            continue
+        print(
+            f"  {flow:<14} throughput {old['throughput']:>8} -> {current['throughput']:<8} "
+            f"p95 {old['p95_ms']:>7}ms -> {current['p95_ms']}ms"
+        )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rnd = random.Random(args.seed)
+    # не трогаем resourses/sqlite.db
+    SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+    weather_server = FakeWeatherServer(
+        latency=args.owm_latency, error_rate=args.owm_error_rate, seed=args.seed
+    )
+    await weather_server.start()
+    bot_api = FakeBotApiServer(
+        latency=args.bot_latency, error_rate=args.bot_error_rate, seed=args.seed
+    )
+    await bot_api.start()
+    bot = make_bot(bot_api)
+
+    # глобальный WeatherApi - синглтон, так он перенастраивается на заглушку
+    make_weather_api(weather_server)
+    await main.on_startup(bot)
+    await seed_users(rnd)
+
+    flows = args.flows.split(",") if args.flows else list(FLOWS)
+    update_ids = itertools.count(1)
+    results = {
+        "commit": _git_commit(),
+        "timestamp": int(time.time()),
+        "config": {
+            "updates": args.updates,
+            "concurrency": args.concurrency,
+            "owm_latency": args.owm_latency,
+            "owm_error_rate": args.owm_error_rate,
+            "bot_latency": args.bot_latency,
+            "bot_error_rate": args.bot_error_rate,
+            "seed": args.seed,
+        },
+        "flows": {},
+    }
+
+    print(f"{'flow':<14} {'upd/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} errors")
+    for flow in flows:
+        result = await run_flow(
+            bot, FLOWS[flow], args.updates, args.concurrency, update_ids, rnd
+        )
+        results["flows"][flow] = result
+        print(
+            f"{flow:<14} {result['throughput']:>8} {result['p50_ms']:>6}ms "
+            f"{result['p95_ms']:>6}ms {result['p99_ms']:>6}ms {result['errors']}"
+        )
+
+    results["upstream"] = {
+        "owm_requests": weather_server.hits,
+        "owm_errors": weather_server.errors,
+        "bot_api_calls": len(bot_api.calls),
+        "bot_api_errors": bot_api.errors,
+    }
+
+    await main.on_shutdown()
+    await bot.session.close()
+    await bot_api.stop()
+    await weather_server.stop()
+    return results
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--flows", default="", help=",".join(FLOWS))
+    parser.add_argument("--owm-latency", type=float, default=0.02)
+    parser.add_argument("--owm-error-rate", type=float, default=0.0)
+    parser.add_argument("--bot-latency", type=float, default=0.01)
+    parser.add_argument("--bot-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="")
+    parser.add_argument("--compare", default="")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"e2e-{results['commit']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nрезультаты: {output}")
+
+    if args.compare:
+        _print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,135 @@
+"""Прогноз на 5 дней: колонки array против списка словарей из ответа API.
+
+Сравнивается объем памяти одного прогноза (40 шагов по 3 часа), время
+подсчета сводок по дням и стоимость показа сегодня/завтра/5 дней многим
+пользователям из кэша WeatherApi: в сеть уходит по одному запросу на место,
+остальное - срезы уже посчитанных колонок.
+
+Запуск: python -m benchmarks.bench_forecast [--places N] [--renders N]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from api import Forecast, format_forecast_day, format_forecast_week
+from benchmarks.stubs import FakeWeatherServer, make_forecast_payload, make_weather_api
+
+
+def _deep_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+def _naive_days(steps: list, tz_offset: int) -> dict:
+    # как было бы без колонок: проход по словарям на каждый показ
+    days = defaultdict(list)
+    for step in steps:
+        days[(step["dt"] + tz_offset) // 86400].append(step)
+    summaries = {}
+    for day, items in days.items():
+        temps = [s["main"]["temp"] for s in items]
+        summaries[day] = (
+            min(temps),
+            max(temps),
+            sum(s.get("rain", {}).get("3h", 0.0) for s in items),
+            sum(temps) / len(temps),
+            max(s["wind"]["speed"] for s in items),
+            max(s.get("pop", 0.0) for s in items),
+            Counter(s["weather"][0]["description"] for s in items).most_common(1)[0][0],
+        )
+    return summaries
+
+
+def _render(forecast: Forecast, view: str) -> str:
+    if view == "week":
+        return format_forecast_week(forecast)
+    daily = forecast.day(1 if view == "tomorrow" else 0) or forecast.days()[0]
+    return format_forecast_day(forecast, daily, "Прогноз")
+
+
+def bench_layout(repeat: int) -> None:
+    payload = make_forecast_payload()
+    forecast = Forecast.from_response(payload)
+    assert len(forecast) == 40
+
+    columns, dicts = sys.getsizeof(forecast), _deep_size(payload["list"])
+    print(f"memory: columns={columns}B list_of_dicts={dicts}B ({dicts / columns:.1f}x)")
+    assert columns * 3 < dicts
+
+    # сводки совпадают с наивным подсчетом по словарям
+    naive = _naive_days(payload["list"], payload["city"]["timezone"])
+    for daily in forecast.days():
+        temp_min, temp_max, rain, _, _, _, description = naive[daily.day]
+        assert daily.description == description
+        assert abs(daily.temp_min - temp_min) < 1e-3 and abs(daily.temp_max - temp_max) < 1e-3
+        assert abs(daily.precipitation - rain) < 1e-3
+    assert any(daily.rain_expected for daily in forecast.days())
+    assert not all(daily.rain_expected for daily in forecast.days())
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        _naive_days(payload["list"], payload["city"]["timezone"])
+    naive_us = (time.perf_counter() - started) / repeat * 1e6
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        forecast._days = None
+        forecast.days()
+    columns_us = (time.perf_counter() - started) / repeat * 1e6
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        forecast.days()
+    cached_us = (time.perf_counter() - started) / repeat * 1e6
+    # время зависит от загрузки машины, поэтому соотношение только печатается
+    print(
+        f"daily aggregates: dicts={naive_us:.1f}us columns={columns_us:.1f}us "
+        f"({naive_us / columns_us:.1f}x) memoized={cached_us:.2f}us"
+    )
+
+
+async def bench_cached_renders(places: int, renders: int) -> None:
+    server = FakeWeatherServer(latency=0.02)
+    await server.start()
+    api = make_weather_api(server)
+    await api.start()
+
+    rnd = random.Random(1)
+    coords = [(40 + i * 0.5, 30 + i * 0.5) for i in range(places)]
+    views = ("today", "tomorrow", "week")
+
+    # первый показ каждого места идет в сеть
+    for coord in coords:
+        await api.get_forecast_by_coord(coord)
+
+    started = time.perf_counter()
+    for _ in range(renders):
+        forecast = await api.get_forecast_by_coord(rnd.choice(coords))
+        _render(forecast, rnd.choice(views))
+    per_render = (time.perf_counter() - started) / renders
+
+    print(
+        f"renders={renders} places={places} upstream_hits={server.hits} "
+        f"{per_render * 1e6:.1f}us/render stats={api.forecast_cache_stats}"
+    )
+    assert server.hits == places
+
+    await api.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=50)
+    parser.add_argument("--renders", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=2_000)
+    args = parser.parse_args()
+    bench_layout(args.repeat)
+    asyncio.run(bench_cached_renders(args.places, args.renders))
@@ -0,0 +1,90 @@
+"""FSM-хранилище: память на много разных чатов, переживание перезапуска и чистка.
+
+Сравнивается MemoryStorage aiogram (растет с каждым чатом) и SqlliteStorage
+(горячий слой ограничен, состояния лежат в SQLite).
+
+Запуск: python -m benchmarks.bench_fsm_storage [--chats N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database import SqlliteDatabase, SqlliteStorage
+
+BOT_ID = 42
+WAITING_STATE = "HandleCheckingWeather:waiting_for_name"
+# каждый десятый чат начинает сценарий и бросает его, не дойдя до конца
+ABANDON_EVERY = 10
+
+
+def key_for(chat_id: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=chat_id, user_id=chat_id)
+
+
+async def drive(storage, chats: int) -> float:
+    started = time.perf_counter()
+    for chat_id in range(1, chats + 1):
+        key = key_for(chat_id)
+        # так делает фильтр состояния на каждом апдейте
+        await storage.get_state(key)
+        await storage.get_data(key)
+        if chat_id % ABANDON_EVERY == 0:
+            await storage.set_state(key, WAITING_STATE)
+            await storage.update_data(key, {"page": 1})
+    return time.perf_counter() - started
+
+
+async def measure(storage, chats: int) -> None:
+    tracemalloc.start()
+    elapsed = await drive(storage, chats)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{type(storage).__name__:>14}: chats={chats} memory={current / 1024 / 1024:.1f} MiB "
+        f"total={elapsed:.2f}s ({chats / elapsed:.0f} chats/s)"
+    )
+
+
+async def main(chats: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database = SqlliteDatabase(db_path)
+    await database.initialize()
+
+    await measure(MemoryStorage(), chats)
+    storage = SqlliteStorage(database, max_hot=10_000)
+    await measure(storage, chats)
+    print(f"  stats={storage.stats}")
+    assert storage.stats["hot_entries"] <= 10_000, "горячий слой вырос выше лимита"
+
+    # перезапуск: новый процесс видит незаконченный сценарий
+    await storage.close()
+    await database.close()
+    await database.initialize()
+    restarted = SqlliteStorage(database)
+    key = key_for(ABANDON_EVERY)
+    assert await restarted.get_state(key) == WAITING_STATE
+    assert await restarted.get_data(key) == {"page": 1}
+    print("  restart: state and data restored")
+
+    # через сутки без изменений брошенные состояния вычищаются
+    now = time.time()
+    swept_storage = SqlliteStorage(database, clock=lambda: now + 2 * 24 * 60 * 60)
+    removed = await swept_storage.sweep()
+    print(f"  sweep: removed={removed}")
+    assert removed == chats // ABANDON_EVERY
+    assert await swept_storage.get_state(key) is None
+
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.chats))
@@ -0,0 +1,81 @@
+"""Геокодирование названий: запрос к API один раз на нормализованное название.
+
+Пользователи пишут одно и то же по-разному ("Москва", " москва ", "МОСКВА"),
+а часть названий геокодер не знает - промахи тоже кэшируются. После
+"перезапуска" (новый WeatherApi над тем же файлом SQLite) сеть не нужна вовсе.
+
+Запуск: python -m benchmarks.bench_geocoding [--lookups N] [--names N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from api import GeocodingCache, WeatherApi
+from database import SqlliteDatabase
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+
+def spellings(name: str):
+    return [name, name.lower(), name.upper(), f"  {name}  ", name.replace("е", "ё")]
+
+
+async def run(api: WeatherApi, queries) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        await api.get_location_coords(query)
+    return time.perf_counter() - started
+
+
+async def main(lookups: int, names: int) -> None:
+    server = FakeWeatherServer(latency=0.02)
+    await server.start()
+    database = SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.initialize()
+
+    base = [f"Поселок Березовка {i}" for i in range(names)]
+    base += [f"{FakeWeatherServer.UNKNOWN_PREFIX} {i}" for i in range(names // 10)]
+    rnd = random.Random(1)
+    queries = [rnd.choice(spellings(rnd.choice(base))) for _ in range(lookups)]
+
+    api = make_weather_api(server, geocoding_cache=GeocodingCache(store=database))
+    elapsed = await run(api, queries)
+    print(
+        f"cold: lookups={lookups} distinct_names={len(base)} "
+        f"upstream_requests={server.hits} total={elapsed:.2f}s stats={api.geocoding_stats}"
+    )
+    assert server.hits <= len(base), "одно название запрошено дважды"
+    await api.close()
+
+    # новый процесс: память пуста, но таблица Geocoding в SQLite осталась
+    server.reset()
+    api = make_weather_api(server, geocoding_cache=GeocodingCache(store=database))
+    elapsed = await run(api, queries)
+    print(
+        f"restart: upstream_requests={server.hits} total={elapsed:.2f}s "
+        f"stats={api.geocoding_stats}"
+    )
+    assert server.hits == 0, "после перезапуска названия снова ушли в сеть"
+    await api.close()
+
+    # через 40 дней истекли и названия, и промахи: старт чистит таблицу
+    later = GeocodingCache(store=database, clock=lambda: time.time() + 40 * 24 * 60 * 60)
+    api = make_weather_api(server, geocoding_cache=later)
+    await api.start()
+    print(f"purge after ttl: stats={api.geocoding_stats}")
+    assert api.geocoding_stats["purged"] == len(base)
+    assert await later.purge_expired() == 0
+
+    await api.close()
+    await database.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--names", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.names))
@@ -0,0 +1,98 @@
+"""Стоимость клавиатур на одно обновление: время и выделения памяти.
+
+Сравнивается сборка клавиатуры заново (как раньше на каждом апдейте) с
+готовым объектом, а для страниц локаций - сборка против мемоизации по
+версии списка. Запуск: python -m benchmarks.bench_keyboards [--calls N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+from database import SqlliteDatabase
+from keyboards import inline
+from keyboards.inline import UserLocationsKeyboardCreator
+
+USER_ID = 1
+
+
+def _dump(markup) -> dict:
+    return markup.model_dump(exclude_none=True)
+
+
+def _report(title: str, elapsed: float, allocated: int, calls: int) -> None:
+    print(f"{title:<28} {elapsed / calls * 1e6:8.2f}us/call {allocated:8d} B/call")
+
+
+async def measure(title: str, fn, calls: int) -> None:
+    # время - без трассировки, память - пик выделений за один вызов
+    started = time.perf_counter()
+    for _ in range(calls):
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    if asyncio.iscoroutine(result):
+        result = await result
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _report(title, elapsed, peak - baseline, calls)
+
+
+async def main(calls: int) -> None:
+    for name in ("main", "back_to_main", "check_weather_way", "add_location_way"):
+        build = getattr(inline, f"_build_{name}_keyboard")
+        get = getattr(inline, f"get_{name}_keyboard")
+        assert _dump(build()) == _dump(get()), "готовая клавиатура отличается от собранной"
+        # хендлер может дописать ряд в свою копию, другим она не достается
+        get().inline_keyboard.append([])
+        assert _dump(build()) == _dump(get()), "общая клавиатура изменилась"
+        await measure(f"{name}: rebuild", build, calls)
+        await measure(f"{name}: prebuilt", get, calls)
+
+    database = SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.initialize()
+    for i in range(30):
+        await database.add_location(f"Локация {i}", USER_ID, 55.0 + i / 100, 37.0)
+
+    page_calls = max(1, calls // 10)
+    await measure(
+        "page: rebuild",
+        lambda: UserLocationsKeyboardCreator._build_player_locations_keyboard(
+            USER_ID, 1, None, None
+        ),
+        page_calls,
+    )
+    await measure(
+        "page: memoized",
+        lambda: UserLocationsKeyboardCreator.get_player_locations_keyboard(USER_ID, 1),
+        page_calls,
+    )
+    print(f"memo {UserLocationsKeyboardCreator.memo_stats()}")
+
+    # новая локация меняет версию списка, и страница пересобирается
+    await UserLocationsKeyboardCreator.get_player_locations_keyboard(USER_ID, 1)
+    misses = UserLocationsKeyboardCreator.memo_stats()["misses"]
+    await database.add_location("Новая", USER_ID, 50.0, 30.0)
+    await UserLocationsKeyboardCreator.get_player_locations_keyboard(USER_ID, 1)
+    assert UserLocationsKeyboardCreator.memo_stats()["misses"] == misses + 1, (
+        "после изменения списка отдана старая клавиатура"
+    )
+
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
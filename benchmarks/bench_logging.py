@@ -0,0 +1,131 @@
+"""Задержка хендлеров при медленном приемнике логов.
+
+Приемник (stdout, пайп в сборщик логов) засыпает на каждой записи. С
+обычным StreamHandler это время уходит на цикл событий и достается всем
+пользователям, с QueuedLogging - только потоку-слушателю. Заодно видно, как
+схлопываются одинаковые ошибки.
+
+Запуск: python -m benchmarks.bench_logging [--handlers N] [--stall S]
+"""
+import argparse
+import asyncio
+import gc
+import io
+import logging
+import time
+import weakref
+from typing import List
+
+from logs import ContextFormatter, QueuedLogging, current_handler
+
+
+class StalledStream(io.StringIO):
+    def __init__(self, stall: float) -> None:
+        super().__init__()
+        self.stall = stall
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.stall)
+        self.lines += text.count("\n")
+        return len(text)
+
+
+async def fake_handler(logger: logging.Logger, i: int, latencies: List[float]) -> None:
+    current_handler.set(f"bench.handler_{i % 3}")
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    try:
+        raise ConnectionError("Cannot connect to host api.openweathermap.org")
+    except ConnectionError:
+        logger.exception("Не удалось обработать обновление")
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(logger: logging.Logger, handlers: int) -> List[float]:
+    latencies: List[float] = []
+    await asyncio.gather(*(fake_handler(logger, i, latencies) for i in range(handlers)))
+    return sorted(latencies)
+
+
+def report(title: str, latencies: List[float]) -> float:
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(
+        f"{title:<18} p50 {latencies[len(latencies) // 2] * 1000:8.3f}ms "
+        f"p99 {p99 * 1000:8.3f}ms"
+    )
+    return p99
+
+
+class Payload:
+    pass
+
+
+def raise_with_payload(refs: List[weakref.ref]) -> None:
+    payload = Payload()
+    refs.append(weakref.ref(payload))
+    raise ConnectionError("Cannot connect to host api.openweathermap.org")
+
+
+def check_traceback() -> None:
+    # в очередь уходит текст трейсбека, а не кадры стека с их локальными переменными
+    stream = io.StringIO()
+    queued = QueuedLogging(log_format="json", stream=stream)
+    logger = logging.getLogger("bench.traceback")
+    logger.propagate = False
+    # слушатель еще не запущен: запись лежит в очереди, пока идет проверка
+    logger.addHandler(queued.handler)
+    refs: List[weakref.ref] = []
+    try:
+        raise_with_payload(refs)
+    except ConnectionError:
+        logger.exception("Не удалось обработать обновление")
+    gc.collect()
+    alive = refs[0]() is not None
+    logger.removeHandler(queued.handler)
+    queued.start()
+    queued.stop()
+    print(f"queued traceback keeps frame locals alive: {alive}")
+    assert not alive, "запись в очереди держит кадры стека"
+    assert "Traceback" in stream.getvalue() and "raise_with_payload" in stream.getvalue()
+
+
+def main(handlers: int, stall: float) -> None:
+    logger = logging.getLogger("bench.logging")
+    logger.propagate = False
+
+    stream = StalledStream(stall)
+    direct = logging.StreamHandler(stream)
+    direct.setFormatter(ContextFormatter())
+    logger.addHandler(direct)
+    # прямой приемник: всего несколько записей, иначе ждать слишком долго
+    direct_p99 = report("StreamHandler", asyncio.run(run(logger, 20)))
+    logger.removeHandler(direct)
+
+    stream = StalledStream(stall)
+    queued = QueuedLogging(log_format="text", stream=stream, aggregate_burst=5)
+    queued.start()
+    root = logging.getLogger()
+    logger.propagate = True
+    started = time.perf_counter()
+    queued_p99 = report("QueuedLogging", asyncio.run(run(logger, handlers)))
+    loop_time = time.perf_counter() - started
+    queued.stop()
+    root.setLevel(logging.WARNING)
+
+    print(
+        f"{handlers} errors in {loop_time:.2f}s -> {stream.lines} lines written, "
+        f"stats={queued.stats}"
+    )
+    assert queued_p99 < direct_p99 / 10, "очередь не развязала хендлеры и приемник"
+    # 3 хендлера: по 5 записей на каждый и по сводке
+    assert queued.stats["suppressed"] == handlers - 15, "одинаковые ошибки не схлопнуты"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, default=5000)
+    parser.add_argument("--stall", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.handlers, args.stall)
+    check_traceback()
@@ -0,0 +1,43 @@
+"""Цена метрик на горячем пути и стоимость выдачи /metrics.
+
+Наблюдение гистограммы должно стоить доли микросекунды, чтобы метрики можно
+было не выключать в продакшене. Запуск: python -m benchmarks.bench_metrics [--calls N]
+"""
+import argparse
+import asyncio
+import time
+
+from metrics import MetricsRegistry
+
+
+async def main(calls: int) -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "bench", ("router", "handler"))
+    counter = registry.counter("bench", "bench", ("endpoint", "status"))
+
+    started = time.perf_counter()
+    for i in range(calls):
+        histogram.labels("main_router", "cmd_menu_handler").observe(i % 100 / 1000)
+    per_observe = (time.perf_counter() - started) / calls
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        counter.labels("weather", "200").inc()
+    per_inc = (time.perf_counter() - started) / calls
+    print(f"histogram observe: {per_observe * 1e9:.0f}ns, counter inc: {per_inc * 1e9:.0f}ns")
+    assert per_observe < 5e-6, "наблюдение гистограммы слишком дорогое"
+
+    # порядок числа серий в боте: хендлеры, методы базы, эндпоинты
+    for i in range(200):
+        histogram.labels("router", f"handler_{i}").observe(0.01)
+    started = time.perf_counter()
+    body = await registry.render()
+    elapsed = time.perf_counter() - started
+    print(f"render: {len(body.splitlines())} lines in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
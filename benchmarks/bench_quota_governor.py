@@ -0,0 +1,89 @@
+"""Приоритеты квоты OpenWeatherMap: фоновая очередь не отклоняет интерактивные запросы.
+
+Пока рассылка держит в очереди фоновые запросы, интерактивный запрос должен
+встать перед ними и получить токен примерно через 1/rate секунд, а не
+QuotaExceededError из-за чужой очереди.
+
+Запуск: python -m benchmarks.bench_quota_governor [--background N] [--rate R]
+"""
+import argparse
+import asyncio
+import time
+
+from api import (
+    Priority,
+    QuotaExceededError,
+    QuotaGovernor,
+    current_max_wait,
+    current_priority,
+)
+
+
+async def check_batch_budget(places: int, rate: float) -> None:
+    # фоновая пачка больше, чем проходит за background_max_wait: с пределом
+    # по размеру пачки хвост дожидается квоты, без него - QuotaExceededError
+    async def run(budget: bool) -> int:
+        governor = QuotaGovernor(
+            rate=rate, burst=1, max_queue=places, background_max_wait=1.0
+        )
+
+        async def batch() -> int:
+            current_priority.set(Priority.BACKGROUND)
+            if budget:
+                current_max_wait.set(governor.wait_budget(places))
+            results = await asyncio.gather(
+                *(governor.acquire() for _ in range(places)), return_exceptions=True
+            )
+            return sum(isinstance(result, QuotaExceededError) for result in results)
+
+        rejected = await asyncio.create_task(batch())
+        governor.close()
+        return rejected
+
+    rejected_default = await run(budget=False)
+    rejected_budget = await run(budget=True)
+    print(
+        f"batch places={places} rate={rate}/s rejected: "
+        f"default={rejected_default} budget={rejected_budget}"
+    )
+    assert rejected_default > 0
+    assert rejected_budget == 0, f"отклонено {rejected_budget} запросов пачки"
+
+
+async def main(background: int, rate: float) -> None:
+    governor = QuotaGovernor(
+        rate=rate, burst=1, max_queue=background, max_wait=5.0, background_max_wait=300.0
+    )
+    # единственный токен забирает первый запрос, дальше все ждут пополнения
+    await governor.acquire(Priority.BACKGROUND)
+
+    queued = [
+        asyncio.create_task(governor.acquire(Priority.BACKGROUND))
+        for _ in range(background)
+    ]
+    await asyncio.sleep(0)
+    assert governor.stats["background_queue_depth"] == background
+
+    started = time.perf_counter()
+    await governor.acquire(Priority.INTERACTIVE)
+    waited = time.perf_counter() - started
+    print(
+        f"background_queued={background} rate={rate}/s "
+        f"interactive_wait={waited * 1000:.0f}ms stats={governor.stats}"
+    )
+    assert waited < 2 / rate, f"интерактивный запрос ждал {waited:.2f}s"
+    # фоновые по-прежнему в очереди, интерактивный обслужен раньше них
+    assert all(not task.done() for task in queued)
+
+    governor.close()
+    await asyncio.gather(*queued, return_exceptions=True)
+
+    await check_batch_budget(places=40, rate=20.0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--background", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.background, args.rate))
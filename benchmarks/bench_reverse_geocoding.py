@@ -0,0 +1,91 @@
+"""Обратное геокодирование: точки рядом с уже названными не ходят в сеть.
+
+Пользователи делятся геопозицией в одних и тех же местах с разбросом в
+десятки метров. Запросов к API должно быть примерно столько, сколько мест,
+а поиск в сетке - стоить микросекунды при любом числе точек.
+
+Запуск: python -m benchmarks.bench_reverse_geocoding [--shares N] [--places N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from api import ReverseGeocodingIndex
+from database import SqlliteDatabase
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+# ~50 м разброса по широте вокруг места
+JITTER_DEG = 0.0005
+
+
+async def main(shares: int, places: int, radius: float) -> None:
+    server = FakeWeatherServer(latency=0.02)
+    await server.start()
+    database = SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.initialize()
+
+    rnd = random.Random(1)
+    centers = [(rnd.uniform(41, 70), rnd.uniform(20, 150)) for _ in range(places)]
+    points = []
+    for _ in range(shares):
+        lat, lon = rnd.choice(centers)
+        points.append(
+            (lat + rnd.uniform(-1, 1) * JITTER_DEG, lon + rnd.uniform(-1, 1) * JITTER_DEG)
+        )
+
+    index = ReverseGeocodingIndex(store=database, radius_m=radius)
+    api = make_weather_api(server, reverse_geocoding=index)
+    started = time.perf_counter()
+    names = [await api.get_location_name_by_coord(point) for point in points]
+    elapsed = time.perf_counter() - started
+    print(
+        f"shares={shares} places={places} radius={radius:.0f}m "
+        f"upstream_requests={server.hits} total={elapsed:.2f}s stats={index.stats}"
+    )
+    assert all(names), "точка осталась без названия"
+    assert server.hits <= places * 2, "слишком много запросов к API"
+
+    # микробенчмарк самого поиска на большом индексе
+    big = ReverseGeocodingIndex(radius_m=radius)
+    for _ in range(100_000):
+        await big.add(rnd.uniform(41, 70), rnd.uniform(20, 150), "точка")
+    started = time.perf_counter()
+    for lat, lon in points:
+        big.lookup(lat, lon)
+    per_lookup = (time.perf_counter() - started) / len(points)
+    print(f"lookup on {len(big)} points: {per_lookup * 1e6:.1f}us")
+
+    # после перезапуска точки подгружаются из SQLite
+    await api.close()
+    server.reset()
+    restarted = ReverseGeocodingIndex(store=database, radius_m=radius)
+    api = make_weather_api(server, reverse_geocoding=restarted)
+    await api.start()
+    for point in points[:100]:
+        await api.get_location_name_by_coord(point)
+    print(f"restart: loaded={len(restarted)} upstream_requests={server.hits}")
+    assert server.hits == 0, "после перезапуска названия снова ушли в сеть"
+
+    # таблица не растет больше max_entries, сколько бы точек ни добавлялось
+    small = ReverseGeocodingIndex(store=database, radius_m=radius, max_entries=10)
+    for i in range(50):
+        await small.add(-10.0 - i, 0.0, f"точка {i}")
+    stored = await database.get_reverse_geocoding_points(10_000)
+    print(f"trim: max_entries=10 stored={len(stored)}")
+    assert len(stored) == 10 and stored[0][2] == "точка 49"
+
+    await api.close()
+    await database.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shares", type=int, default=2000)
+    parser.add_argument("--places", type=int, default=50)
+    parser.add_argument("--radius", type=float, default=500.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.shares, args.places, args.radius))
@@ -0,0 +1,148 @@
+"""Массовая отправка против заглушки Bot API с flood control (429) и блокировками (403).
+
+Сравнивается наивная отправка (все сообщения сразу, на 429 - сон и повтор)
+с SendQueue, которая держит общий и поканальный лимиты сама.
+
+Запуск: python -m benchmarks.bench_send_queue [--chats N] [--per-chat N] [--limit N]
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from outbound import SendQueue
+from benchmarks.stubs import FakeBotApiServer, make_bot
+
+FORBIDDEN_EVERY = 25
+
+
+async def run_naive(bot, messages) -> int:
+    delivered = 0
+
+    async def send(chat_id: int, text: str) -> None:
+        nonlocal delivered
+        while True:
+            try:
+                await bot.send_message(chat_id, text)
+                delivered += 1
+                return
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError:
+                return
+
+    await asyncio.gather(*(send(chat_id, text) for chat_id, text in messages))
+    return delivered
+
+
+async def run_queue(bot, messages, limit: int) -> SendQueue:
+    # 90% от лимита заглушки, как в проде 25 из 30
+    queue = SendQueue(rate=limit * 0.9, per_chat_rate=1.0, max_in_flight=20)
+    queue.start(bot)
+    futures = [queue.enqueue(chat_id, text) for chat_id, text in messages]
+    await asyncio.gather(*futures, return_exceptions=True)
+    await queue.stop()
+    return queue
+
+
+async def check_stop_with_retries() -> None:
+    # на 500 сообщения уходят на отложенный повтор; stop() должен снять их таймеры
+    server = FakeBotApiServer(error_rate=1.0)
+    await server.start()
+    bot = make_bot(server)
+    queue = SendQueue(rate=1000, per_chat_rate=1000)
+    queue.start(bot)
+    futures = [queue.enqueue(chat_id, "повтор") for chat_id in range(1, 6)]
+    while queue.stats["retried"] < len(futures):
+        await asyncio.sleep(0.01)
+    assert queue.stats["queue_depth"] == len(futures), queue.stats
+
+    await queue.stop()
+    assert all(future.cancelled() for future in futures)
+    assert queue.stats["queue_depth"] == 0
+    print(f"stop with pending retries: cancelled={len(futures)}")
+
+    await bot.session.close()
+    await server.stop()
+
+
+async def check_stop_in_flight() -> None:
+    # сообщения уже отправляются; stop() должен отменить и их future
+    server = FakeBotApiServer(latency=30.0)
+    await server.start()
+    bot = make_bot(server)
+    queue = SendQueue(rate=1000, per_chat_rate=1000)
+    queue.start(bot)
+    futures = [queue.enqueue(chat_id, "в полете") for chat_id in range(1, 6)]
+    while queue.stats["in_flight"] < len(futures):
+        await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(queue.stop(), timeout=5)
+    assert all(future.cancelled() for future in futures)
+    assert queue.stats["in_flight"] == 0, queue.stats
+    print(f"stop with in-flight sends: cancelled={len(futures)}")
+
+    await bot.session.close()
+    await server.stop()
+
+
+async def main(chats: int, per_chat: int, limit: int) -> None:
+    forbidden = set(range(FORBIDDEN_EVERY, chats + 1, FORBIDDEN_EVERY))
+    messages = [
+        (chat_id, f"сообщение {n}")
+        for n in range(per_chat)
+        for chat_id in range(1, chats + 1)
+    ]
+    expected = (chats - len(forbidden)) * per_chat
+
+    for name in ("naive", "queue"):
+        server = FakeBotApiServer(
+            latency=0.005,
+            rate_limit=limit,
+            per_chat_interval=1.0,
+            retry_after=1,
+            forbidden_chats=forbidden,
+        )
+        await server.start()
+        bot = make_bot(server)
+
+        started = time.perf_counter()
+        if name == "naive":
+            delivered = await run_naive(bot, messages)
+            extra = ""
+        else:
+            queue = await run_queue(bot, messages, limit)
+            stats = queue.stats
+            delivered = stats["sent"]
+            extra = (
+                f" avg_latency={stats['avg_latency']:.2f}s"
+                f" max_latency={stats['max_latency']:.2f}s"
+                f" forbidden={stats['forbidden']}"
+            )
+        elapsed = time.perf_counter() - started
+
+        print(
+            f"{name:>5}: delivered={delivered}/{expected} 429s={server.flood_errors} "
+            f"403s={server.forbidden_errors} total={elapsed:.2f}s "
+            f"throughput={delivered / elapsed:.1f} msg/s{extra}"
+        )
+        assert delivered == expected, "доставлены не все сообщения"
+        if name == "queue":
+            # заблокированный чат отвечает 403 один раз, остальные его сообщения сброшены
+            assert server.forbidden_errors == len(forbidden), "повторы в заблокированные чаты"
+
+        await bot.session.close()
+        await server.stop()
+
+    await check_stop_with_retries()
+    await check_stop_in_flight()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--per-chat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.per_chat, args.limit))
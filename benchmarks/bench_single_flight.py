@@ -0,0 +1,79 @@
+"""Проверка склейки одинаковых запросов: N одновременных вызовов -> 1 запрос к API.
+
+Запуск: python -m benchmarks.bench_single_flight [--callers N]
+"""
+import argparse
+import asyncio
+import time
+
+from api import Priority, QuotaGovernor, WeatherCache, current_priority
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+
+async def check_priority(server: FakeWeatherServer, background: int = 10) -> None:
+    # интерактивный запрос не должен присоединяться к фоновой задаче по той же
+    # точке и ждать вместе с ней в фоновой очереди квоты
+    governor = QuotaGovernor(
+        rate=2.0, burst=1, max_wait=1.0, background_max_wait=300.0
+    )
+    api = make_weather_api(server, governor=governor, cache=WeatherCache(max_entries=0))
+    await api.start()
+
+    # токен забран, перед фоновой задачей по точке стоит очередь рассылки
+    await governor.acquire(Priority.BACKGROUND)
+    queued = [
+        asyncio.create_task(governor.acquire(Priority.BACKGROUND))
+        for _ in range(background)
+    ]
+
+    async def broadcast() -> None:
+        current_priority.set(Priority.BACKGROUND)
+        await api.get_observations_by_coords([(55.75, 37.61)])
+
+    flight = asyncio.create_task(broadcast())
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    result = await api.get_weather_in_location_by_coord((55.75, 37.61))
+    waited = time.perf_counter() - started
+    print(f"interactive_behind_background_flight={waited * 1000:.0f}ms")
+    assert result is not None
+    assert waited < governor.max_wait, f"интерактивный запрос ждал {waited:.2f}s"
+    assert not flight.done(), "фоновая задача не должна была успеть раньше"
+
+    flight.cancel()
+    await api.close()
+    await asyncio.gather(flight, *queued, return_exceptions=True)
+
+
+async def main(callers: int) -> int:
+    server = FakeWeatherServer(latency=0.05)
+    await server.start()
+
+    # кэш отключен: проверяем именно склейку запросов, а не попадания в кэш
+    api = make_weather_api(server, cache=WeatherCache(max_entries=0))
+    await api.start()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(api.get_weather_in_location_by_coord((55.75, 37.62)) for _ in range(callers))
+    )
+    elapsed = time.perf_counter() - started
+
+    await api.close()
+
+    assert all(result == results[0] for result in results), "разные ответы у ожидающих"
+    assert server.hits == 1, f"ожидался 1 запрос к API, получено {server.hits}"
+    print(f"callers={callers} upstream_hits={server.hits} total={elapsed * 1000:.1f}ms")
+    hits = server.hits
+
+    await check_priority(server)
+    await server.stop()
+    return hits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.callers))
@@ -0,0 +1,122 @@
+"""Запросов в секунду к SQLite: соединение на каждый вызов против пула SqlliteDatabase.
+
+Запуск: python -m benchmarks.bench_sqlite [--queries N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+from database import SqlliteDatabase, UserLocationsCache
+
+USERS = 200
+LOCATIONS_PER_USER = 10
+
+
+async def _per_call_get_location_coordinates(db_path: str, name: str, user_id: int):
+    # поведение SqlliteDatabase до пула: новое соединение (и поток) на каждый запрос
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(
+            "SELECT lat, lon FROM Locations WHERE user_id = ? AND name = ?",
+            (user_id, name),
+        )
+        return await cursor.fetchone()
+
+
+async def _per_call_get_user_locations(db_path: str, user_id: int):
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(
+            "SELECT name FROM Locations WHERE user_id = ?", (user_id,)
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+
+async def _measure(
+    title: str, query: Callable[[int], Awaitable], queries: int, concurrency: int
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await query(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    elapsed = time.perf_counter() - started
+    qps = queries / elapsed
+    print(f"{title:<40} {qps:>10.0f} q/s")
+    return qps
+
+
+async def main(queries: int, concurrency: int) -> None:
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "bench.db")
+
+    # кэш локаций выключен, чтобы мерить сами запросы к SQLite
+    database = SqlliteDatabase(db_path, locations_cache=UserLocationsCache(max_users=0))
+    await database.initialize()
+    for user_id in range(USERS):
+        for n in range(LOCATIONS_PER_USER):
+            await database.add_location(f"Локация {n}", user_id, 55.0 + n, 37.0 + n)
+
+    rnd = random.Random(1)
+    picks = [
+        (f"Локация {rnd.randrange(LOCATIONS_PER_USER)}", rnd.randrange(USERS))
+        for _ in range(queries)
+    ]
+
+    await _measure(
+        "get_location_coordinates, per call",
+        lambda i: _per_call_get_location_coordinates(db_path, *picks[i]),
+        queries,
+        concurrency,
+    )
+    await _measure(
+        "get_location_coordinates, pooled",
+        lambda i: database.get_location_coordinates(*picks[i]),
+        queries,
+        concurrency,
+    )
+    await _measure(
+        "get_user_locations, per call",
+        lambda i: _per_call_get_user_locations(db_path, picks[i][1]),
+        queries,
+        concurrency,
+    )
+    await _measure(
+        "get_user_locations, pooled",
+        lambda i: database.get_user_locations(picks[i][1]),
+        queries,
+        concurrency,
+    )
+
+    await database.close()
+
+    cached = SqlliteDatabase(db_path, locations_cache=UserLocationsCache())
+    await _measure(
+        "get_location_coordinates, pooled+cache",
+        lambda i: cached.get_location_coordinates(*picks[i]),
+        queries,
+        concurrency,
+    )
+    await _measure(
+        "get_user_locations, pooled+cache",
+        lambda i: cached.get_user_locations(picks[i][1]),
+        queries,
+        concurrency,
+    )
+    print(f"locations cache: {cached.locations_cache_stats}")
+    await cached.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.concurrency))
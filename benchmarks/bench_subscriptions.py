@@ -0,0 +1,80 @@
+"""Рассылка подписчикам одной минуты: запросов к API столько, сколько уникальных мест.
+
+Запуск: python -m benchmarks.bench_subscriptions [--users N] [--cities N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import SqlliteDatabase
+from outbound import SendQueue
+from scheduler import DailyForecastScheduler
+from benchmarks.stubs import (
+    FakeBotApiServer,
+    FakeWeatherServer,
+    make_bot,
+    make_weather_api,
+)
+
+
+async def main(users: int, cities: int) -> None:
+    weather_server = FakeWeatherServer(latency=0.02)
+    await weather_server.start()
+    bot_api = FakeBotApiServer()
+    await bot_api.start()
+    bot = make_bot(bot_api)
+
+    database = SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.initialize()
+    weather_api = make_weather_api(weather_server)
+    # лимиты Telegram здесь не проверяются - их меряет bench_send_queue
+    send_queue = SendQueue(rate=100_000, per_chat_rate=100_000, burst=1000)
+    send_queue.start(bot)
+    scheduler = DailyForecastScheduler(database, weather_api, send_queue)
+
+    # города в центрах ячеек сетки; пользователи сохраняют их с небольшим разбросом
+    rnd = random.Random(1)
+    centers = [(45.0 + i * 0.5, 30.0 + (i % 40) * 0.5) for i in range(cities)]
+    for user_id in range(1, users + 1):
+        for n, (lat, lon) in enumerate(rnd.sample(centers, 2)):
+            jitter = rnd.uniform(-0.005, 0.005)
+            await database.add_location(f"Место {n}", user_id, lat + jitter, lon - jitter)
+        await database.set_subscription(user_id, 8 * 60)
+        scheduler.add(user_id, 8 * 60)
+
+    started = time.perf_counter()
+    await scheduler.deliver(list(range(1, users + 1)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"users={users} distinct_places={cities} upstream_requests={weather_server.hits} "
+        f"messages={len(bot_api.calls_of('sendmessage'))} total={elapsed:.2f}s"
+    )
+    assert weather_server.hits <= cities, "запросов к API больше, чем уникальных мест"
+    assert scheduler.stats["failed_ticks"] == 0
+
+    # сбой посреди рассылки не вылетает из фоновой задачи, а попадает в лог и статистику
+    async def broken(coords):
+        raise RuntimeError("bench: API недоступен")
+
+    weather_api.get_observations_by_coords = broken
+    await scheduler.deliver([1])
+    assert scheduler.stats["failed_ticks"] == 1
+
+    await send_queue.stop()
+    await weather_api.close()
+    await database.close()
+    await bot.session.close()
+    await bot_api.stop()
+    await weather_server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--cities", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.cities))
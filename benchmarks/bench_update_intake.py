@@ -0,0 +1,102 @@
+"""Задержка "обновление -> ответ хендлера" в режимах polling и webhook.
+
+Обновления /help идут в настоящий диспетчер и роутеры из main.py, ответы
+ловит заглушка Bot API. Запуск: python -m benchmarks.bench_update_intake [--updates N]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+import aiohttp
+from aiohttp import web
+
+import main
+from database import SqlliteDatabase
+from benchmarks.stubs import FakeBotApiServer, make_bot, make_message_update
+
+WEBHOOK_SECRET = "bench-secret"
+
+
+def _report(title: str, latencies: List[float]) -> None:
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p95 = ordered[int(len(ordered) * 0.95)] * 1000
+    print(f"{title:<8} updates={len(ordered)} p50={p50:.2f}ms p95={p95:.2f}ms")
+
+
+async def _bench_polling(bot_api: FakeBotApiServer, updates: int) -> List[float]:
+    bot = make_bot(bot_api)
+    polling = asyncio.create_task(
+        main.dp.start_polling(bot, handle_signals=False, polling_timeout=10)
+    )
+    await bot_api.wait_for_calls("getme", 1)
+
+    latencies = []
+    sent = len(bot_api.calls_of("sendmessage"))
+    for i in range(updates):
+        started = time.perf_counter()
+        bot_api.push_update(make_message_update(i + 1, 1000 + i, "/help"))
+        sent += 1
+        await bot_api.wait_for_calls("sendmessage", sent)
+        latencies.append(bot_api.calls_of("sendmessage")[-1][0] - started)
+
+    await main.dp.stop_polling()
+    await polling
+    return latencies
+
+
+async def _bench_webhook(bot_api: FakeBotApiServer, updates: int) -> List[float]:
+    bot = make_bot(bot_api)
+    app = main.create_webhook_app(main.dp, bot, path="/webhook", secret_token=WEBHOOK_SECRET)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/webhook"
+
+    latencies = []
+    sent = len(bot_api.calls_of("sendmessage"))
+    async with aiohttp.ClientSession() as session:
+        forged = make_message_update(10**6, 1, "/help")
+        async with session.post(url, json=forged) as response:
+            assert response.status == 401, "запрос без секретного токена должен отклоняться"
+
+        headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+        for i in range(updates):
+            started = time.perf_counter()
+            update = make_message_update(updates + i + 1, 2000 + i, "/help")
+            async with session.post(url, json=update, headers=headers) as response:
+                assert response.status == 200
+            sent += 1
+            await bot_api.wait_for_calls("sendmessage", sent)
+            latencies.append(bot_api.calls_of("sendmessage")[-1][0] - started)
+
+    await runner.cleanup()
+    await bot.session.close()
+    return latencies
+
+
+async def run(updates: int) -> None:
+    # не трогаем resourses/sqlite.db
+    SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+    bot_api = FakeBotApiServer()
+    await bot_api.start()
+
+    _report("polling", await _bench_polling(bot_api, updates))
+    _report("webhook", await _bench_webhook(bot_api, updates))
+
+    await bot_api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.updates))
@@ -0,0 +1,76 @@
+"""Погода во всех локациях: последовательные запросы против параллельного fan-out.
+
+Запуск: python -m benchmarks.bench_weather_all [--locations N] [--latency SEC]
+"""
+import argparse
+import asyncio
+import time
+
+from api import WeatherCache
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+
+async def main(locations: int, latency: float) -> None:
+    server = FakeWeatherServer(latency=latency)
+    await server.start()
+
+    coords = [(40.0 + i * 0.5, 30.0 + i * 0.5) for i in range(locations)]
+
+    api = make_weather_api(server, cache=WeatherCache())
+    await api.start()
+
+    # как раньше: пользователь тыкает локации по одной
+    started = time.perf_counter()
+    for coord in coords:
+        await api._fetch_observation({"lat": coord[0], "lon": coord[1]})
+    print(
+        f"sequential            {time.perf_counter() - started:.3f}s upstream={server.hits}"
+    )
+
+    server.reset()
+    started = time.perf_counter()
+    cold = await api.get_observations_by_coords(coords)
+    print(
+        f"fan-out, cold         {time.perf_counter() - started:.3f}s "
+        f"upstream={server.hits_by_path}"
+    )
+
+    # кэш пуст, но id городов уже известны - идем в /group
+    api._cache.clear()
+    server.reset()
+    started = time.perf_counter()
+    grouped = await api.get_observations_by_coords(coords)
+    print(
+        f"fan-out, known ids    {time.perf_counter() - started:.3f}s "
+        f"upstream={server.hits_by_path}"
+    )
+
+    # id устарели: /group ничего не знает, точки добираются одиночными запросами
+    api._cache.clear()
+    server._cities.clear()
+    server.reset()
+    started = time.perf_counter()
+    fallback = await api.get_observations_by_coords(coords)
+    fallback_elapsed = time.perf_counter() - started
+    print(f"fan-out, stale ids    {fallback_elapsed:.3f}s upstream={server.hits_by_path}")
+    # одиночные запросы идут параллельно, а не по одному после /group
+    assert fallback_elapsed < locations * latency / 2
+
+    server.reset()
+    started = time.perf_counter()
+    await api.get_observations_by_coords(coords)
+    print(
+        f"fan-out, cached       {time.perf_counter() - started:.3f}s upstream={server.hits}"
+    )
+
+    assert all(cold) and all(grouped) and all(fallback)
+    await api.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.locations, args.latency))
@@ -0,0 +1,110 @@
+"""Сравнение сессии на каждый запрос и общей пуловой сессии WeatherApi.
+
+Запуск: python -m benchmarks.bench_weather_session [--requests N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+import aiohttp
+
+from api import WeatherCache
+from benchmarks.stubs import FakeWeatherServer, make_weather_api
+
+
+async def _per_call_session_fetch(url: str, params: dict) -> None:
+    # поведение WeatherApi до перехода на общую сессию
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url=url, params=params) as response:
+            await response.json()
+
+
+async def _run(fetch, requests: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await fetch(i)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def _report(title: str, latencies: List[float], connections: int, elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    print(
+        f"{title:<22} requests={len(latencies):<6} connections={connections:<6} "
+        f"mean={statistics.mean(latencies) * 1000:.2f}ms p50={p50:.2f}ms "
+        f"p99={p99:.2f}ms total={elapsed:.2f}s"
+    )
+
+
+async def check_shared_cell(server: FakeWeatherServer) -> None:
+    # соседи по ячейке сетки делят запись кэша, но не координаты друг друга
+    server.reset()
+    api = make_weather_api(server)
+    await api.start()
+    first, second = (55.7512, 37.6184), (55.7601, 37.6102)
+    assert api.coord_key(first) == api.coord_key(second)
+
+    first_card = await api.get_weather_in_location_by_coord(first)
+    second_card = await api.get_weather_in_location_by_coord(second)
+    observation = await api.get_observation_by_coord(second)
+    await api.close()
+
+    print(f"shared cell: upstream_hits={server.hits} cached_coord={observation.coord}")
+    assert server.hits == 1, "соседняя точка должна браться из кэша"
+    assert "55.7512" in first_card and "55.7601" in second_card
+    assert "55.7512" not in second_card, "в карточке чужие координаты"
+    # в API и в кэш уходит только центр ячейки
+    assert observation.coord == (55.75, 37.6), observation.coord
+
+
+async def main(requests: int, concurrency: int) -> Tuple[int, int]:
+    server = FakeWeatherServer()
+    await server.start()
+
+    params = {"lat": 55.75, "lon": 37.61, "appid": "bench"}
+
+    started = time.perf_counter()
+    before = await _run(
+        lambda i: _per_call_session_fetch(server.weather_url, params),
+        requests,
+        concurrency,
+    )
+    _report("session per call", before, server.connections, time.perf_counter() - started)
+    before_connections = server.connections
+
+    server.reset()
+    # кэш отключен, чтобы каждый вызов доходил до заглушки
+    api = make_weather_api(server, cache=WeatherCache(max_entries=0))
+    await api.start()
+    started = time.perf_counter()
+    after = await _run(
+        # разные координаты, чтобы запросы не склеивались
+        lambda i: api.get_weather_in_location_by_coord((-80 + (i % 1600) * 0.1, 37.61)),
+        requests,
+        concurrency,
+    )
+    _report("shared pooled session", after, server.connections, time.perf_counter() - started)
+    after_connections = server.connections
+    await api.close()
+
+    await check_shared_cell(server)
+    await server.stop()
+    return before_connections, after_connections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,317 @@
+"""Запись и воспроизведение потока обновлений против локальных заглушек.
+
+Поток пишет UpdateRecorder (settings.update_record_path) в боевом боте: по
+строке NDJSON на обновление, ``{"t": мс от начала, "u": обновление}``.
+``synth`` генерирует поток той же формы без продакшена: ровный, с утренним
+пиком или с "вирусным" городом. ``run`` скармливает поток настоящему
+Dispatcher из main.py в исходном темпе, ускоренным в N раз или без пауз, с
+ограничением одновременно обрабатываемых обновлений. По окнам времени видно,
+где входящий поток обгоняет обработку - это и есть точка насыщения
+SqlliteDatabase и WeatherApi.
+
+Запуск:
+    python -m benchmarks.replay synth FILE [--shape steady|morning|viral]
+        [--duration S] [--rate N] [--users N]
+    python -m benchmarks.replay run FILE [--speed 1|N|max] [--concurrency N]
+        [--users N] [--multiply K] [--owm-latency S] [--bot-latency S]
+"""
+import argparse
+import asyncio
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+os.environ.setdefault("BOT_TOKEN", "42:bench-token")
+os.environ.setdefault("WEATHER_API_TOKEN", "bench")
+
+from aiogram.types import Update
+
+import main
+from database import SqlliteDatabase
+from settings import (
+    database,
+    user_callback_help,
+    user_callback_location,
+    weather_api,
+)
+from benchmarks.bench_e2e import CITY_NAMES, percentile
+from benchmarks.stubs import (
+    FakeBotApiServer,
+    FakeWeatherServer,
+    make_bot,
+    make_callback_update,
+    make_message_update,
+    make_weather_api,
+)
+
+Record = Tuple[int, dict]
+
+# сдвиг id для копий пользователей при --multiply
+CLONE_ID_STEP = 10**12
+
+
+def load_recording(path: str) -> List[Record]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records.append((record["t"], record["u"]))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def save_recording(path: str, records: Iterable[Record]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for t, update in records:
+            f.write(json.dumps({"t": t, "u": update}, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+
+
+def _user_objects(update: dict) -> Iterator[dict]:
+    # все места, где в обновлении встречается id пользователя или его чата
+    for key in ("message", "callback_query"):
+        event = update.get(key)
+        if event is None:
+            continue
+        if "from" in event:
+            yield event["from"]
+        message = event if key == "message" else event.get("message")
+        if message is not None:
+            yield message["chat"]
+
+
+def remap_users(records: List[Record], users: int, multiply: int) -> List[Record]:
+    """Сжимает поток до ``users`` пользователей и/или размножает его в ``multiply`` раз.
+
+    Копия ``j`` - те же действия в том же темпе от других пользователей, так
+    поток становится плотнее без изменения своей формы.
+    """
+    mapping: Dict[int, int] = {}
+    remapped: List[Record] = []
+    update_ids = itertools.count(1)
+    for clone in range(multiply):
+        for t, update in records:
+            update = copy.deepcopy(update)
+            update["update_id"] = next(update_ids)
+            for obj in _user_objects(update):
+                user_id = mapping.setdefault(obj["id"], len(mapping) + 1)
+                if users:
+                    user_id = (user_id - 1) % users + 1
+                obj["id"] = user_id + clone * CLONE_ID_STEP
+            remapped.append((t, update))
+    remapped.sort(key=lambda record: record[0])
+    return remapped
+
+
+def _rate_factor(shape: str, t: float, duration: float) -> float:
+    if shape == "morning":
+        # всплеск в 10 раз около 30% длительности, как рассылка в 8 утра
+        peak, width = duration * 0.3, duration / 20
+        return 1 + 9 * math.exp(-((t - peak) ** 2) / (2 * width**2))
+    return 1.0
+
+
+def synthesize(
+    shape: str, duration: float, rate: float, users: int, seed: int
+) -> List[Record]:
+    rnd = random.Random(seed)
+    max_rate = rate * (10 if shape == "morning" else 1)
+    viral_city = CITY_NAMES[7]
+    records: List[Record] = []
+    update_ids = itertools.count(1)
+    t = 0.0
+    while True:
+        # неоднородный пуассоновский поток методом прореживания
+        t += rnd.expovariate(max_rate)
+        if t >= duration:
+            break
+        if rnd.random() > rate * _rate_factor(shape, t, duration) / max_rate:
+            continue
+
+        # немногие активные пользователи пишут чаще остальных
+        user_id = min(int(rnd.paretovariate(1.2)), users)
+        update_id = next(update_ids)
+        action = rnd.random()
+        if action < 0.35:
+            city = CITY_NAMES[min(int(rnd.expovariate(0.2)), len(CITY_NAMES) - 1)]
+            if shape == "viral" and duration / 3 <= t < duration * 2 / 3 and rnd.random() < 0.7:
+                city = viral_city
+            update = make_message_update(update_id, user_id, f"/weather_name {city}")
+        elif action < 0.5:
+            lat, lon = rnd.uniform(41, 70), rnd.uniform(20, 150)
+            update = make_message_update(
+                update_id, user_id, f"/weather_coord {lat:.3f} {lon:.3f}"
+            )
+        elif action < 0.6:
+            city = rnd.choice(CITY_NAMES)
+            update = make_message_update(update_id, user_id, f"/add_location name {city}")
+        elif action < 0.8:
+            update = make_message_update(update_id, user_id, "/start")
+        elif action < 0.9:
+            update = make_callback_update(update_id, user_id, user_callback_location.pack())
+        else:
+            update = make_callback_update(update_id, user_id, user_callback_help.pack())
+        records.append((int(t * 1000), update))
+    return records
+
+
+async def replay(
+    records: List[Record], speed: float, concurrency: int, window: float, bot
+) -> dict:
+    """Воспроизводит поток; ``speed == 0`` - без пауз между обновлениями."""
+    semaphore = asyncio.Semaphore(concurrency)
+    # (время по расписанию, начало обработки, конец обработки, ошибка)
+    samples: List[Tuple[float, float, float, bool]] = []
+    tasks = []
+
+    async def feed(update: dict, scheduled: float) -> None:
+        started = time.perf_counter()
+        failed = False
+        try:
+            await main.dp.feed_update(bot, Update.model_validate(update))
+        except Exception:
+            failed = True
+        finally:
+            semaphore.release()
+        samples.append((scheduled, started, time.perf_counter(), failed))
+
+    origin = time.perf_counter()
+    for t, update in records:
+        scheduled = origin + t / 1000 / speed if speed else time.perf_counter()
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # при насыщении обновления ждут здесь, и отставание от расписания растет
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(feed(update, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - origin
+
+    service = sorted(end - started for _, started, end, _ in samples)
+    total = sorted(end - scheduled for scheduled, _, end, _ in samples)
+    windows = []
+    span = max(elapsed, window)
+    for i in range(int(math.ceil(span / window))):
+        lo, hi = origin + i * window, origin + (i + 1) * window
+        offered = sum(1 for s in samples if lo <= s[0] < hi)
+        done = sorted(s[2] - s[0] for s in samples if lo <= s[2] < hi)
+        windows.append(
+            {
+                "offered_per_s": round(offered / window, 1),
+                "done_per_s": round(len(done) / window, 1),
+                "p95_ms": round(percentile(done, 0.95) * 1000, 1),
+            }
+        )
+    return {
+        "updates": len(samples),
+        "errors": sum(1 for s in samples if s[3]),
+        "elapsed_s": round(elapsed, 2),
+        "throughput": round(len(samples) / elapsed, 1),
+        "service_p50_ms": round(percentile(service, 0.50) * 1000, 2),
+        "service_p95_ms": round(percentile(service, 0.95) * 1000, 2),
+        "service_p99_ms": round(percentile(service, 0.99) * 1000, 2),
+        "total_p95_ms": round(percentile(total, 0.95) * 1000, 2),
+        "total_p99_ms": round(percentile(total, 0.99) * 1000, 2),
+        "max_lag_ms": round(max((s[1] - s[0] for s in samples), default=0) * 1000, 2),
+        "windows": windows,
+    }
+
+
+def _parse_speed(value: str) -> float:
+    return 0.0 if value == "max" else float(value)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    records = remap_users(load_recording(args.file), args.users, args.multiply)
+    # не трогаем resourses/sqlite.db
+    SqlliteDatabase(os.path.join(tempfile.mkdtemp(), "replay.db"))
+
+    weather_server = FakeWeatherServer(latency=args.owm_latency)
+    await weather_server.start()
+    bot_api = FakeBotApiServer(latency=args.bot_latency)
+    await bot_api.start()
+    bot = make_bot(bot_api)
+    make_weather_api(weather_server)
+    await main.on_startup(bot)
+
+    result = await replay(records, args.speed, args.concurrency, args.window, bot)
+    result["upstream"] = {
+        "owm_requests": weather_server.hits,
+        "bot_api_calls": len(bot_api.calls),
+        "weather_cache": weather_api.cache_stats,
+        "geocoding": weather_api.geocoding_stats,
+        "locations_cache": database.locations_cache_stats,
+    }
+
+    await main.on_shutdown()
+    await bot.session.close()
+    await bot_api.stop()
+    await weather_server.stop()
+    return result
+
+
+def _print_result(result: dict, window: float) -> None:
+    print(
+        f"updates={result['updates']} errors={result['errors']} "
+        f"elapsed={result['elapsed_s']}s throughput={result['throughput']}/s"
+    )
+    print(
+        f"service p50/p95/p99 = {result['service_p50_ms']}/{result['service_p95_ms']}/"
+        f"{result['service_p99_ms']}ms, with queueing p95/p99 = "
+        f"{result['total_p95_ms']}/{result['total_p99_ms']}ms, max lag {result['max_lag_ms']}ms"
+    )
+    print(f"\n{'window':>8} {'offered/s':>10} {'done/s':>8} {'p95':>9}")
+    for i, w in enumerate(result["windows"]):
+        print(
+            f"{i * window:>7.0f}s {w['offered_per_s']:>10} {w['done_per_s']:>8} "
+            f"{w['p95_ms']:>7}ms"
+        )
+    print(f"\nupstream: {result['upstream']}")
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synth = commands.add_parser("synth", help="сгенерировать поток обновлений")
+    synth.add_argument("file")
+    synth.add_argument("--shape", choices=("steady", "morning", "viral"), default="steady")
+    synth.add_argument("--duration", type=float, default=60.0)
+    synth.add_argument("--rate", type=float, default=20.0, help="обновлений в секунду")
+    synth.add_argument("--users", type=int, default=1000)
+    synth.add_argument("--seed", type=int, default=1)
+
+    run_parser = commands.add_parser("run", help="воспроизвести поток")
+    run_parser.add_argument("file")
+    run_parser.add_argument("--speed", type=_parse_speed, default=1.0, help="1, N или max")
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--users", type=int, default=0, help="0 - как в записи")
+    run_parser.add_argument("--multiply", type=int, default=1)
+    run_parser.add_argument("--window", type=float, default=5.0)
+    run_parser.add_argument("--owm-latency", type=float, default=0.02)
+    run_parser.add_argument("--bot-latency", type=float, default=0.01)
+    run_parser.add_argument("--output", default="")
+
+    args = parser.parse_args(argv)
+    if args.command == "synth":
+        records = synthesize(args.shape, args.duration, args.rate, args.users, args.seed)
+        save_recording(args.file, records)
+        print(f"{len(records)} updates -> {args.file}")
+        return
+
+    result = asyncio.run(run(args))
+    _print_result(result, args.window)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,453 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiohttp import web
+
+from api import QuotaGovernor, WeatherApi
+
+
+def city_id_for(lat: float, lon: float) -> int:
+    return int(round((lat + 90) * 100)) * 100_000 + int(round((lon + 180) * 100))
+
+
+def make_weather_payload(
+    name: str = "Москва", lat: float = 55.7522, lon: float = 37.6156
+) -> dict:
+    return {
+        "cod": 200,
+        "id": city_id_for(lat, lon),
+        "name": name,
+        "coord": {"lat": lat, "lon": lon},
+        "main": {"temp": 12.3, "feels_like": 10.1},
+        "weather": [{"description": "облачно"}],
+        "wind": {"speed": 3.4},
+    }
+
+
+def make_forecast_payload(
+    lat: float = 55.7522, lon: float = 37.6156, start: int = 0, steps: int = 40
+) -> dict:
+    # 40 шагов по 3 часа от ближайшего кратного трем часа; дождь через сутки на вторые
+    start = start or (int(time.time()) // 10800 + 1) * 10800
+    items = []
+    for i in range(steps):
+        temp = 10 + 6 * ((i % 8) - 4) / 4 + i * 0.1
+        item = {
+            "dt": start + i * 10800,
+            "main": {"temp": round(temp, 2), "feels_like": round(temp - 2, 2)},
+            "weather": [{"description": "небольшой дождь" if i // 8 % 2 else "облачно"}],
+            "wind": {"speed": round(2 + (i % 5) * 0.7, 1)},
+            "pop": 0.8 if i // 8 % 2 else 0.1,
+        }
+        if i // 8 % 2:
+            item["rain"] = {"3h": 0.6}
+        items.append(item)
+    return {
+        "cod": "200",
+        "cnt": steps,
+        "list": items,
+        "city": {
+            "id": city_id_for(lat, lon),
+            "name": "Москва",
+            "coord": {"lat": lat, "lon": lon},
+            "timezone": 10800,
+        },
+    }
+
+
+class StubServer:
+    def __init__(self) -> None:
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def _make_app(self) -> web.Application:
+        raise NotImplementedError
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._runner = web.AppRunner(self._make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sock_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{sock_port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class FakeWeatherServer(StubServer):
+    """Локальная заглушка OpenWeatherMap с подсчетом запросов и соединений."""
+
+    WEATHER_PATH = "/data/2.5/weather"
+    GROUP_PATH = "/data/2.5/group"
+    GEO_PATH = "/geo/1.0/direct"
+    REVERSE_PATH = "/geo/1.0/reverse"
+    FORECAST_PATH = "/data/2.5/forecast"
+    # геокодер не знает названий с таким префиксом
+    UNKNOWN_PREFIX = "нигде"
+
+    def __init__(
+        self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0
+    ) -> None:
+        super().__init__()
+        self.latency = latency
+        # доля ответов 500, чтобы проверять поведение при сбоях API
+        self.error_rate = error_rate
+        self.errors = 0
+        # сколько следующих запросов получат 429 и какой Retry-After в нем
+        self.rate_limited = 0
+        self.retry_after = 1
+        self._random = random.Random(seed)
+        self.hits = 0
+        self.hits_by_path: Dict[str, int] = {}
+        self._peers: Set[Tuple[str, int]] = set()
+        self._cities: Dict[int, dict] = {}
+
+    @property
+    def connections(self) -> int:
+        # каждый новый клиентский порт - это новое TCP-соединение (handshake)
+        return len(self._peers)
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.errors = 0
+        self.hits_by_path.clear()
+        self._peers.clear()
+
+    @property
+    def weather_url(self) -> str:
+        return self.url + self.WEATHER_PATH
+
+    @property
+    def group_url(self) -> str:
+        return self.url + self.GROUP_PATH
+
+    @property
+    def geo_url(self) -> str:
+        return self.url + self.GEO_PATH
+
+    @property
+    def reverse_url(self) -> str:
+        return self.url + self.REVERSE_PATH
+
+    @property
+    def forecast_url(self) -> str:
+        return self.url + self.FORECAST_PATH
+
+    async def _count(self, request: web.Request) -> Optional[web.Response]:
+        self.hits += 1
+        self.hits_by_path[request.path] = self.hits_by_path.get(request.path, 0) + 1
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer:
+            self._peers.add(tuple(peer[:2]))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return web.json_response(
+                {"cod": 429, "message": "stub rate limit"},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"cod": 500, "message": "stub failure"}, status=500)
+        return None
+
+    async def _handle_weather(self, request: web.Request) -> web.Response:
+        failure = await self._count(request)
+        if failure is not None:
+            return failure
+
+        if "lat" in request.query and "lon" in request.query:
+            payload = make_weather_payload(
+                lat=float(request.query["lat"]), lon=float(request.query["lon"])
+            )
+        else:
+            payload = make_weather_payload(name=request.query.get("q", "Москва"))
+        self._cities[payload["id"]] = payload
+        return web.json_response(payload)
+
+    async def _handle_group(self, request: web.Request) -> web.Response:
+        failure = await self._count(request)
+        if failure is not None:
+            return failure
+
+        ids = [int(city_id) for city_id in request.query.get("id", "").split(",") if city_id]
+        items = []
+        for city_id in ids:
+            if city_id in self._cities:
+                item = dict(self._cities[city_id])
+                item.pop("cod")
+                items.append(item)
+        return web.json_response({"cnt": len(items), "list": items})
+
+    async def _handle_geo(self, request: web.Request) -> web.Response:
+        failure = await self._count(request)
+        if failure is not None:
+            return failure
+
+        name = request.query.get("q", "")
+        if not name or name.lower().startswith(self.UNKNOWN_PREFIX):
+            return web.json_response([])
+
+        # стабильные координаты по названию, чтобы разные места не склеивались
+        seed = sum(ord(char) * (i + 1) for i, char in enumerate(name.lower()))
+        lat = 40.0 + (seed % 2000) / 100
+        lon = 20.0 + (seed // 2000 % 4000) / 100
+        candidate = {"name": name, "local_names": {"ru": name}, "lat": lat, "lon": lon}
+        return web.json_response([{**candidate, "country": "RU"}])
+
+    async def _handle_reverse(self, request: web.Request) -> web.Response:
+        failure = await self._count(request)
+        if failure is not None:
+            return failure
+
+        lat, lon = float(request.query["lat"]), float(request.query["lon"])
+        if lat < -60:
+            # в Антарктике и океане названий нет
+            return web.json_response([])
+        name = f"Поселок {lat:.2f} {lon:.2f}"
+        return web.json_response([{"name": name, "lat": lat, "lon": lon, "country": "RU"}])
+
+    async def _handle_forecast(self, request: web.Request) -> web.Response:
+        failure = await self._count(request)
+        if failure is not None:
+            return failure
+
+        lat, lon = float(request.query["lat"]), float(request.query["lon"])
+        return web.json_response(make_forecast_payload(lat, lon))
+
+    def _make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(self.WEATHER_PATH, self._handle_weather)
+        app.router.add_get(self.GROUP_PATH, self._handle_group)
+        app.router.add_get(self.GEO_PATH, self._handle_geo)
+        app.router.add_get(self.REVERSE_PATH, self._handle_reverse)
+        app.router.add_get(self.FORECAST_PATH, self._handle_forecast)
+        return app
+
+
+def make_weather_api(server: FakeWeatherServer, **kwargs) -> WeatherApi:
+    # WeatherApi, направленный на заглушку; квота по умолчанию не ограничивает бенчмарк
+    kwargs.setdefault("governor", QuotaGovernor(rate=1_000_000, burst=1_000_000))
+    api = WeatherApi("bench", **kwargs)
+    api.BASE_URL = server.weather_url
+    api.GROUP_URL = server.group_url
+    api.GEOCODING_URL = server.geo_url
+    api.REVERSE_GEOCODING_URL = server.reverse_url
+    api.FORECAST_URL = server.forecast_url
+    return api
+
+
+BENCH_BOT_TOKEN = "42:bench-token"
+
+
+def make_message_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    }
+
+
+def make_location_update(update_id: int, chat_id: int, lat: float, lon: float) -> dict:
+    update = make_message_update(update_id, chat_id, "")
+    del update["message"]["text"]
+    update["message"]["location"] = {"latitude": lat, "longitude": lon}
+    return update
+
+
+def make_callback_update(update_id: int, chat_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": str(chat_id),
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "menu",
+            },
+        },
+    }
+
+
+class FakeBotApiServer(StubServer):
+    """Заглушка Telegram Bot API: отдает обновления через getUpdates и пишет все вызовы.
+
+    С ``rate_limit`` (сообщений в секунду на бота) и ``per_chat_interval``
+    (секунд между сообщениями в один чат) sendMessage сверх лимита получает
+    429 с ``retry_after``, как настоящий flood control. Чаты из
+    ``forbidden_chats`` отвечают 403, будто пользователь заблокировал бота.
+    Доля ``error_rate`` вызовов получает 500.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_limit: Optional[int] = None,
+        per_chat_interval: float = 0.0,
+        retry_after: int = 1,
+        forbidden_chats: Optional[Set[int]] = None,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors = 0
+        self._random = random.Random(seed)
+        self.rate_limit = rate_limit
+        self.per_chat_interval = per_chat_interval
+        self.retry_after = retry_after
+        self.forbidden_chats = forbidden_chats or set()
+        self.calls: List[Tuple[float, str, Dict[str, Any]]] = []
+        self.flood_errors = 0
+        self.forbidden_errors = 0
+        self._updates: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._call_event = asyncio.Event()
+        self._sent_at: Deque[float] = deque()
+        self._chat_sent_at: Dict[int, float] = {}
+
+    def push_update(self, update: dict) -> None:
+        self._updates.put_nowait(update)
+
+    def calls_of(self, method: str) -> List[Tuple[float, Dict[str, Any]]]:
+        return [(at, payload) for at, name, payload in self.calls if name == method]
+
+    async def wait_for_calls(self, method: str, count: int, timeout: float = 30) -> None:
+        deadline = time.perf_counter() + timeout
+        while len(self.calls_of(method)) < count:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"{method}: {len(self.calls_of(method))}/{count}")
+            self._call_event.clear()
+            try:
+                await asyncio.wait_for(self._call_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _message(payload: Dict[str, Any]) -> dict:
+        chat_id = int(payload.get("chat_id", 0))
+        return {
+            "message_id": int(payload.get("message_id", 1)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": payload.get("text", ""),
+        }
+
+    async def _get_updates(self, payload: Dict[str, Any]) -> list:
+        timeout = float(payload.get("timeout", 0) or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    async def _result(self, method: str, payload: Dict[str, Any]) -> Any:
+        if method == "getupdates":
+            return await self._get_updates(payload)
+        if method == "getme":
+            return {"id": 42, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        if method in ("sendmessage", "editmessagetext"):
+            return self._message(payload)
+        return True
+
+    def _check_limits(self, payload: Dict[str, Any]) -> Optional[web.Response]:
+        chat_id = int(payload.get("chat_id", 0))
+        if chat_id in self.forbidden_chats:
+            self.forbidden_errors += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 403,
+                    "description": "Forbidden: bot was blocked by the user",
+                },
+                status=403,
+            )
+
+        now = time.perf_counter()
+        while self._sent_at and now - self._sent_at[0] >= 1:
+            self._sent_at.popleft()
+        too_fast = self.rate_limit is not None and len(self._sent_at) >= self.rate_limit
+        last_sent = self._chat_sent_at.get(chat_id)
+        if last_sent is not None and now - last_sent < self.per_chat_interval:
+            too_fast = True
+        if too_fast:
+            self.flood_errors += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        self._sent_at.append(now)
+        self._chat_sent_at[chat_id] = now
+        return None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        if request.content_type == "application/json":
+            payload = await request.json()
+        else:
+            payload = dict(await request.post())
+
+        if method == "sendmessage":
+            rejected = self._check_limits(payload)
+            if rejected is not None:
+                return rejected
+
+        if method != "getupdates":
+            self.calls.append((time.perf_counter(), method, payload))
+            self._call_event.set()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return web.json_response(
+                    {"ok": False, "error_code": 500, "description": "Internal Server Error"},
+                    status=500,
+                )
+
+        return web.json_response({"ok": True, "result": await self._result(method, payload)})
+
+    def _make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+
+def make_bot(server: FakeBotApiServer) -> Bot:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.url))
+    return Bot(
+        token=BENCH_BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
@@ -1,3 +1,5 @@
 from callbacks.user import UserCallback
 from callbacks.user_location import UserLocationCallback
-from callbacks.page_callback import NextPageCallback, PreviousPageCallback
\ No newline at end of file
+from callbacks.page import NextPageCallback, PreviousPageCallback
+from callbacks.forecast import ForecastCallback
+from callbacks.dispatcher import CallbackDispatcher
\ No newline at end of file
@@ -0,0 +1,84 @@
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+CallbackHandler = Callable[..., Any]
+
+# разделитель aiogram по умолчанию, его используют все наши CallbackData
+SEPARATOR = ":"
+
+
+class CallbackDispatcher:
+    """Таблица хендлеров callback-запросов вместо цепочки фильтров F.data.
+
+    Конкретный экземпляр CallbackData (например, ``UserCallback(action=...)``)
+    регистрируется по своей упакованной строке, класс - по префиксу. Поиск -
+    одно обращение к словарю по строке и, если не нашлось, одно по префиксу,
+    сколько бы хендлеров ни было. Хендлер класса получает ``callback_data``
+    уже распакованным. Все остальное (bot, state и т.д.) передается так же,
+    как в обычный хендлер aiogram.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, CallableObject] = {}
+        self._by_prefix: Dict[str, Tuple[CallableObject, Type[CallbackData]]] = {}
+        self.router = Router(name="callback_dispatcher")
+        self.router.callback_query.register(self._route)
+
+    def register(
+        self, callback_data: Union[CallbackData, Type[CallbackData]]
+    ) -> Callable[[CallbackHandler], CallbackHandler]:
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            if isinstance(callback_data, CallbackData):
+                key = callback_data.pack()
+                if key in self._exact:
+                    raise ValueError(f"Callback {key!r} уже зарегистрирован")
+                self._exact[key] = CallableObject(handler)
+            else:
+                prefix = callback_data.__prefix__
+                if callback_data.__separator__ != SEPARATOR:
+                    raise ValueError(
+                        f"{callback_data.__name__}: ожидается sep={SEPARATOR!r}"
+                    )
+                if prefix in self._by_prefix:
+                    raise ValueError(f"Префикс {prefix!r} уже зарегистрирован")
+                self._by_prefix[prefix] = (CallableObject(handler), callback_data)
+            return handler
+
+        return decorator
+
+    def resolve(
+        self, data: str
+    ) -> Optional[Tuple[CallableObject, Optional[CallbackData]]]:
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler, None
+
+        prefix, _, _ = data.partition(SEPARATOR)
+        entry = self._by_prefix.get(prefix)
+        if entry is None:
+            return None
+        handler, callback_data_cls = entry
+        try:
+            return handler, callback_data_cls.unpack(data)
+        except (TypeError, ValueError):
+            # префикс наш, но данные битые или от старой версии клавиатуры
+            return None
+
+    async def _route(self, callback: CallbackQuery, **kwargs: Any) -> Any:
+        resolved = self.resolve(callback.data or "")
+        if resolved is None:
+            # пусть обработают следующие роутеры (catching_unknown_updates_router)
+            raise SkipHandler()
+
+        handler, callback_data = resolved
+        if callback_data is not None:
+            kwargs["callback_data"] = callback_data
+        return await handler.call(callback, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._by_prefix)
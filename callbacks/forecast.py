@@ -0,0 +1,9 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class ForecastCallback(CallbackData, prefix="forecast"):
+    # координаты округлены до сотых: прогноз все равно кэшируется по сетке
+    lat: float
+    lon: float
+    # today, tomorrow или week
+    view: str
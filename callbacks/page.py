@@ -3,7 +3,11 @@ from aiogram.filters.callback_data import CallbackData
 
 class NextPageCallback(CallbackData, prefix="next_page"):
     cur_page: int
+    # id последней локации на текущей странице (ключ для keyset-пагинации)
+    after_id: int
 
 
 class PreviousPageCallback(CallbackData, prefix="previous_page"):
     cur_page: int
+    # id первой локации на текущей странице
+    before_id: int
@@ -1 +1,3 @@
-from database.sqllite_database import SqlliteDatabase
\ No newline at end of file
+from database.sqllite_database import SqlliteDatabase
+from database.location_cache import UserLocationsCache
+from database.fsm_storage import SqlliteStorage
\ No newline at end of file
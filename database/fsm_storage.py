@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+from database.sqllite_database import SqlliteDatabase
+
+logger = logging.getLogger(__name__)
+
+# (состояние, данные в компактном JSON, время последней записи)
+FsmRecord = Tuple[Optional[str], Optional[bytes], float]
+
+_EMPTY: FsmRecord = (None, None, 0.0)
+
+
+def _encode_data(data: Mapping[str, Any]) -> Optional[bytes]:
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _decode_data(data: Optional[bytes]) -> Dict[str, Any]:
+    return json.loads(data) if data else {}
+
+
+class SqlliteStorage(BaseStorage):
+    """FSM-хранилище в файле SQLite с горячим LRU-слоем в памяти.
+
+    Запись идет сквозь в таблицу FsmStates, поэтому незаконченные сценарии
+    переживают перезапуск. В памяти держится не больше ``max_hot`` ключей,
+    включая пустые (чтобы обычные апдейты без состояния не ходили в базу), так
+    что память не растет с числом чатов. Состояния, которые не менялись дольше
+    ``state_ttl`` секунд, считаются брошенными и удаляются фоновой чисткой.
+    """
+
+    def __init__(
+        self,
+        database: SqlliteDatabase,
+        key_builder: Optional[KeyBuilder] = None,
+        state_ttl: int = 24 * 60 * 60,
+        max_hot: int = 10_000,
+        sweep_interval: float = 600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._database = database
+        self._key_builder = key_builder if key_builder is not None else DefaultKeyBuilder()
+        self.state_ttl = state_ttl
+        self.max_hot = max_hot
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+
+        self._hot: "OrderedDict[str, FsmRecord]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.swept = 0
+
+    def start(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        self._hot.clear()
+
+    def _remember(self, key: str, record: FsmRecord) -> None:
+        self._hot[key] = record
+        self._hot.move_to_end(key)
+        if len(self._hot) > self.max_hot:
+            self._hot.popitem(last=False)
+            self.evicted += 1
+
+    def _is_idle(self, record: FsmRecord, now: float) -> bool:
+        return record[2] < now - self.state_ttl
+
+    async def _load(self, key: str) -> FsmRecord:
+        record = self._hot.get(key)
+        if record is not None:
+            self.hits += 1
+            self._hot.move_to_end(key)
+            return record
+
+        self.misses += 1
+        row = await self._database.get_fsm_record(key)
+        # пока читали, ключ мог быть записан - свежая запись важнее прочитанной
+        record = self._hot.get(key)
+        if record is not None:
+            return record
+
+        record = _EMPTY if row is None or self._is_idle(row, self._clock()) else row
+        self._remember(key, record)
+        return record
+
+    async def _save(self, key: str, state: Optional[str], data: Optional[bytes]) -> None:
+        if state is None and data is None:
+            self._remember(key, _EMPTY)
+            await self._database.delete_fsm_record(key)
+            return
+
+        now = self._clock()
+        self._remember(key, (state, data, now))
+        await self._database.set_fsm_record(key, state, data, int(now))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self._key_builder.build(key)
+        _, data, _ = await self._load(storage_key)
+        await self._save(
+            storage_key, state.state if isinstance(state, State) else state, data
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(self._key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+
+        storage_key = self._key_builder.build(key)
+        state, _, _ = await self._load(storage_key)
+        await self._save(storage_key, state, _encode_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._load(self._key_builder.build(key))
+        return _decode_data(data)
+
+    async def sweep(self) -> int:
+        now = self._clock()
+        removed = await self._database.delete_fsm_records_before(
+            int(now - self.state_ttl)
+        )
+        for key in [
+            key
+            for key, record in self._hot.items()
+            if record is not _EMPTY and self._is_idle(record, now)
+        ]:
+            self._hot[key] = _EMPTY
+        self.swept += removed
+        return removed
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info("Удалено брошенных состояний FSM: %d", removed)
+            except Exception as e:
+                logger.warning("Чистка состояний FSM не удалась: %r", e)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hot_entries": len(self._hot),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "swept": self.swept,
+        }
@@ -0,0 +1,147 @@
+import itertools
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+LocationRow = Tuple[int, str, float, float]
+
+# общий счетчик версий: у любого загруженного или измененного списка версия новая
+_versions = itertools.count(1)
+
+
+class UserLocations:
+    """Локации одного пользователя, упорядоченные по id."""
+
+    __slots__ = ("ids", "names", "coords", "version")
+
+    def __init__(self, rows: List[LocationRow]) -> None:
+        self.ids: List[int] = [row[0] for row in rows]
+        self.names: List[str] = [row[1] for row in rows]
+        self.coords: Dict[str, Tuple[float, float]] = {
+            row[1]: (row[2], row[3]) for row in rows
+        }
+        self.version = next(_versions)
+
+    def add(self, row: LocationRow) -> None:
+        location_id, name, lat, lon = row
+        index = bisect_left(self.ids, location_id)
+        self.ids.insert(index, location_id)
+        self.names.insert(index, name)
+        self.coords[name] = (lat, lon)
+        self.version = next(_versions)
+
+    def remove(self, name: str) -> None:
+        if self.coords.pop(name, None) is None:
+            return
+        index = self.names.index(name)
+        del self.ids[index]
+        del self.names[index]
+        self.version = next(_versions)
+
+    def page(
+        self, limit: int, after_id: Optional[int] = None, before_id: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        if before_id is not None:
+            end = bisect_left(self.ids, before_id)
+            start = max(0, end - limit)
+        else:
+            start = bisect_right(self.ids, after_id) if after_id is not None else 0
+            end = start + limit
+        return list(zip(self.ids[start:end], self.names[start:end]))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class UserLocationsCache:
+    """Write-through LRU-кэш локаций по пользователям.
+
+    Кэшируются только пользователи с небольшим списком (``max_locations``),
+    большие списки по-прежнему листаются запросами к SQLite.
+    """
+
+    def __init__(self, max_users: int = 10_000, max_locations: int = 200) -> None:
+        self.max_users = max_users
+        self.max_locations = max_locations
+        self._users: "OrderedDict[int, UserLocations]" = OrderedDict()
+        # пользователи, чей список слишком велик для кэша
+        self._oversized: "OrderedDict[int, None]" = OrderedDict()
+        # растет при каждой записи; загрузка, пересекшаяся с записью, не сохраняется
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[UserLocations]:
+        locations = self._users.get(user_id)
+        if locations is None:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return locations
+
+    def is_oversized(self, user_id: int) -> bool:
+        return user_id in self._oversized
+
+    def put(
+        self, user_id: int, rows: List[LocationRow], generation: int
+    ) -> Optional[UserLocations]:
+        if len(rows) > self.max_locations:
+            self._oversized[user_id] = None
+            if len(self._oversized) > self.max_users:
+                self._oversized.popitem(last=False)
+            return None
+
+        locations = UserLocations(rows)
+        if generation != self._generation or self.max_users <= 0:
+            # загрузка пересеклась с записью: отдаем результат, но не кэшируем
+            return locations
+
+        self._users[user_id] = locations
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+            self.evictions += 1
+        return locations
+
+    def on_added(self, user_id: int, row: LocationRow) -> None:
+        self._generation += 1
+        locations = self._users.get(user_id)
+        if locations is None:
+            return
+        locations.add(row)
+        if len(locations) > self.max_locations:
+            del self._users[user_id]
+            self._oversized[user_id] = None
+
+    def on_deleted(self, user_id: int, name: str) -> None:
+        self._generation += 1
+        self._oversized.pop(user_id, None)
+        locations = self._users.get(user_id)
+        if locations is not None:
+            locations.remove(name)
+
+    def invalidate(self, user_id: int) -> None:
+        self._generation += 1
+        self._users.pop(user_id, None)
+        self._oversized.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._users.clear()
+        self._oversized.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "users": len(self._users),
+        }
@@ -1,8 +1,29 @@
+import asyncio
+import time
 import aiosqlite
-from typing import Optional, List, Tuple
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from database.location_cache import UserLocations, UserLocationsCache
+from metrics import SQLITE_QUERY_SECONDS
 
 
 class SqlliteDatabase:
+    # ограничение SQLite на число параметров в одном запросе (с запасом)
+    MAX_QUERY_PARAMS = 900
+
+    # пул соединений: один писатель и несколько читателей (WAL позволяет читать параллельно)
+    READER_POOL_SIZE = 4
+    STATEMENT_CACHE_SIZE = 256
+
+    PRAGMAS = (
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA mmap_size = 67108864",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA busy_timeout = 5000",
+    )
+
     _instance = None
 
     def __new__(cls, *args, **kwargs):
@@ -10,8 +31,18 @@ class SqlliteDatabase:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, db_path: str):
+    def __init__(
+        self, db_path: str, locations_cache: Optional[UserLocationsCache] = None
+    ):
         self._db_path = db_path
+        self._locations_cache = (
+            locations_cache if locations_cache is not None else UserLocationsCache()
+        )
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._init_lock = asyncio.Lock()
 
     @classmethod
     def get_instance(cls, db_path: str) -> Optional["SqlliteDatabase"]:
@@ -19,8 +50,28 @@ class SqlliteDatabase:
             cls(db_path)
         return cls._instance
 
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        if read_only:
+            db = await aiosqlite.connect(
+                f"file:{self._db_path}?mode=ro",
+                uri=True,
+                cached_statements=self.STATEMENT_CACHE_SIZE,
+            )
+        else:
+            db = await aiosqlite.connect(
+                self._db_path, cached_statements=self.STATEMENT_CACHE_SIZE
+            )
+        for pragma in self.PRAGMAS:
+            await db.execute(pragma)
+        return db
+
     async def initialize(self):
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._init_lock:
+            if self._writer is not None:
+                return
+
+            db = await self._connect()
+            await db.execute("PRAGMA journal_mode = WAL")
             await db.execute(
                 """
                 CREATE TABLE IF NOT EXISTS Locations (
@@ -33,54 +84,395 @@ class SqlliteDatabase:
                     )
                 """
             )
+            # упорядоченный индекс для постраничной выборки по ключу (user_id, id)
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_locations_user_id_id ON Locations (user_id, id)"
+            )
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Subscriptions (
+                    user_id INTEGER PRIMARY KEY,
+                    minute_of_day INTEGER NOT NULL
+                    )
+                """
+            )
+            # состояния FSM: одна строка на ключ, данные в компактном JSON
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS FsmStates (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data BLOB,
+                    updated_at INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                """
+            )
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON FsmStates (updated_at)"
+            )
+            # кэш геокодера: нормализованный запрос -> варианты в JSON (пустой список - промах)
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Geocoding (
+                    query TEXT PRIMARY KEY,
+                    candidates TEXT NOT NULL,
+                    expires_at INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                """
+            )
+            # обратное геокодирование: названные точки, сетка строится в памяти
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ReverseGeocoding (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    name TEXT NOT NULL
+                    )
+                """
+            )
             await db.commit()
+            self._writer = db
+
+            self._idle_readers = asyncio.Queue()
+            for _ in range(self.READER_POOL_SIZE):
+                reader = await self._connect(read_only=True)
+                self._readers.append(reader)
+                self._idle_readers.put_nowait(reader)
+
+    async def close(self):
+        async with self._init_lock:
+            for reader in self._readers:
+                await reader.close()
+            self._readers.clear()
+            self._idle_readers = None
+
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+    # method - метка в метрике времени запросов; время считается вместе с
+    # ожиданием блокировки писателя или свободного читателя
+    @asynccontextmanager
+    async def _write(self, method: str) -> AsyncIterator[aiosqlite.Connection]:
+        if self._writer is None:
+            await self.initialize()
+        started = time.perf_counter()
+        try:
+            # одна транзакция записи за раз на общем соединении
+            async with self._write_lock:
+                yield self._writer
+        finally:
+            SQLITE_QUERY_SECONDS.labels(method).observe(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def _read(self, method: str) -> AsyncIterator[aiosqlite.Connection]:
+        if self._writer is None:
+            await self.initialize()
+        started = time.perf_counter()
+        idle_readers = self._idle_readers
+        reader = await idle_readers.get()
+        try:
+            yield reader
+        finally:
+            idle_readers.put_nowait(reader)
+            SQLITE_QUERY_SECONDS.labels(method).observe(time.perf_counter() - started)
+
+    @property
+    def locations_cache_stats(self) -> Dict[str, int]:
+        return self._locations_cache.stats
+
+    async def _get_cached_locations(self, user_id: int) -> Optional[UserLocations]:
+        cache = self._locations_cache
+        locations = cache.get(user_id)
+        if locations is not None or cache.is_oversized(user_id):
+            return locations
+
+        generation = cache.generation
+        async with self._read("get_cached_locations") as db:
+            cursor = await db.execute(
+                "SELECT id, name, lat, lon FROM Locations WHERE user_id = ? "
+                "ORDER BY id LIMIT ?",
+                (user_id, cache.max_locations + 1),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+
+        return cache.put(user_id, [tuple(row) for row in rows], generation)
+
+    async def get_user_locations_version(self, user_id: int) -> Optional[int]:
+        # версия списка из кэша; None - список слишком большой для кэша
+        locations = await self._get_cached_locations(user_id)
+        return locations.version if locations is not None else None
 
     async def add_location(
         self, name: str, user_id: int, lat: float, lon: float
     ) -> bool:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._write("add_location") as db:
             try:
-                await db.execute(
+                cursor = await db.execute(
                     "INSERT INTO Locations (name, user_id, lat, lon) VALUES (?, ?, ?, ?)",
                     (name, user_id, lat, lon),
                 )
                 await db.commit()
+                self._locations_cache.on_added(
+                    user_id, (cursor.lastrowid, name, lat, lon)
+                )
                 return True
             except aiosqlite.IntegrityError:
+                await db.rollback()
                 return False
 
     async def delete_location(self, name: str, user_id: int) -> bool:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._write("delete_location") as db:
             cursor = await db.execute(
                 "DELETE FROM Locations WHERE user_id = ? AND name = ?", (user_id, name)
             )
             await db.commit()
+            self._locations_cache.on_deleted(user_id, name)
             return cursor.rowcount > 0
 
     async def get_user_locations(self, user_id: int) -> List[str]:
-        async with aiosqlite.connect(self._db_path) as db:
+        locations = await self._get_cached_locations(user_id)
+        if locations is not None:
+            return list(locations.names)
+
+        async with self._read("get_user_locations") as db:
             cursor = await db.execute(
-                "SELECT name FROM Locations WHERE user_id = ?", (user_id,)
+                "SELECT name FROM Locations WHERE user_id = ? ORDER BY id", (user_id,)
             )
             locations = await cursor.fetchall()
+            await cursor.close()
             return [loc[0] for loc in locations]
 
-    async def get_limit_user_locations(self, user_id: int, limit: int) -> List[List[str]]:
-        user_locations = await self.get_user_locations(user_id)
+    async def get_user_locations_page(
+        self,
+        user_id: int,
+        limit: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> List[Tuple[int, str]]:
+        locations = await self._get_cached_locations(user_id)
+        if locations is not None:
+            return locations.page(limit, after_id=after_id, before_id=before_id)
 
-        result = []
-        for i in range(0, len(user_locations), limit):
-            chunk = user_locations[i:i + limit]
-            result.append(chunk)
-        return result
+        # keyset-пагинация: страница читается по индексу, без OFFSET и без всего списка
+        async with self._read("get_user_locations_page") as db:
+            if before_id is not None:
+                cursor = await db.execute(
+                    "SELECT id, name FROM Locations WHERE user_id = ? AND id < ? "
+                    "ORDER BY id DESC LIMIT ?",
+                    (user_id, before_id, limit),
+                )
+                rows = await cursor.fetchall()
+                rows.reverse()
+            else:
+                cursor = await db.execute(
+                    "SELECT id, name FROM Locations WHERE user_id = ? AND id > ? "
+                    "ORDER BY id LIMIT ?",
+                    (user_id, after_id if after_id is not None else 0, limit),
+                )
+                rows = await cursor.fetchall()
+            await cursor.close()
+            return [(row[0], row[1]) for row in rows]
+
+    async def count_user_locations(self, user_id: int) -> int:
+        locations = await self._get_cached_locations(user_id)
+        if locations is not None:
+            return len(locations)
+
+        async with self._read("count_user_locations") as db:
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM Locations WHERE user_id = ?", (user_id,)
+            )
+            result = await cursor.fetchone()
+            await cursor.close()
+            return result[0]
+
+    async def get_user_locations_coordinates(
+        self, user_id: int
+    ) -> List[Tuple[str, float, float]]:
+        locations = await self._get_cached_locations(user_id)
+        if locations is not None:
+            return [(name, *locations.coords[name]) for name in locations.names]
+
+        async with self._read("get_user_locations_coordinates") as db:
+            cursor = await db.execute(
+                "SELECT name, lat, lon FROM Locations WHERE user_id = ? ORDER BY id",
+                (user_id,),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return [(row[0], row[1], row[2]) for row in rows]
 
     async def get_location_coordinates(
         self, name: str, user_id: int
     ) -> Optional[Tuple[float, float]]:
-        async with aiosqlite.connect(self._db_path) as db:
+        locations = await self._get_cached_locations(user_id)
+        if locations is not None:
+            return locations.coords.get(name)
+
+        async with self._read("get_location_coordinates") as db:
             cursor = await db.execute(
                 "SELECT lat, lon FROM Locations WHERE user_id = ? AND name = ?",
                 (user_id, name),
             )
             result = await cursor.fetchone()
+            await cursor.close()
             return result if result else None
+
+    async def get_locations_for_users(
+        self, user_ids: Iterable[int]
+    ) -> Dict[int, List[Tuple[str, float, float]]]:
+        result: Dict[int, List[Tuple[str, float, float]]] = {}
+        missing = []
+        for user_id in user_ids:
+            locations = self._locations_cache.get(user_id)
+            if locations is not None:
+                result[user_id] = [
+                    (name, *locations.coords[name]) for name in locations.names
+                ]
+            else:
+                missing.append(user_id)
+
+        if not missing:
+            # все из кэша - соединение из пула читателей не нужно
+            return result
+
+        # остальных пользователей читаем пачками одним запросом на пачку
+        async with self._read("get_locations_for_users") as db:
+            for i in range(0, len(missing), self.MAX_QUERY_PARAMS):
+                chunk = missing[i : i + self.MAX_QUERY_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = await db.execute(
+                    f"SELECT user_id, name, lat, lon FROM Locations "
+                    f"WHERE user_id IN ({placeholders}) ORDER BY user_id, id",
+                    chunk,
+                )
+                for user_id, name, lat, lon in await cursor.fetchall():
+                    result.setdefault(user_id, []).append((name, lat, lon))
+                await cursor.close()
+        return result
+
+    async def set_subscription(self, user_id: int, minute_of_day: int) -> None:
+        async with self._write("set_subscription") as db:
+            await db.execute(
+                "INSERT INTO Subscriptions (user_id, minute_of_day) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET minute_of_day = excluded.minute_of_day",
+                (user_id, minute_of_day),
+            )
+            await db.commit()
+
+    async def delete_subscription(self, user_id: int) -> bool:
+        async with self._write("delete_subscription") as db:
+            cursor = await db.execute(
+                "DELETE FROM Subscriptions WHERE user_id = ?", (user_id,)
+            )
+            await db.commit()
+            return cursor.rowcount > 0
+
+    async def get_subscriptions(self) -> List[Tuple[int, int]]:
+        async with self._read("get_subscriptions") as db:
+            cursor = await db.execute("SELECT user_id, minute_of_day FROM Subscriptions")
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return [(row[0], row[1]) for row in rows]
+
+    async def get_fsm_record(
+        self, key: str
+    ) -> Optional[Tuple[Optional[str], Optional[bytes], int]]:
+        async with self._read("get_fsm_record") as db:
+            cursor = await db.execute(
+                "SELECT state, data, updated_at FROM FsmStates WHERE key = ?", (key,)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            return (row[0], row[1], row[2]) if row else None
+
+    async def set_fsm_record(
+        self, key: str, state: Optional[str], data: Optional[bytes], updated_at: int
+    ) -> None:
+        async with self._write("set_fsm_record") as db:
+            await db.execute(
+                "INSERT INTO FsmStates (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                "data = excluded.data, updated_at = excluded.updated_at",
+                (key, state, data, updated_at),
+            )
+            await db.commit()
+
+    async def delete_fsm_record(self, key: str) -> None:
+        async with self._write("delete_fsm_record") as db:
+            await db.execute("DELETE FROM FsmStates WHERE key = ?", (key,))
+            await db.commit()
+
+    async def delete_fsm_records_before(self, updated_at: int) -> int:
+        async with self._write("delete_fsm_records_before") as db:
+            cursor = await db.execute(
+                "DELETE FROM FsmStates WHERE updated_at < ?", (updated_at,)
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    async def count_fsm_states(self) -> List[Tuple[str, int]]:
+        async with self._read("count_fsm_states") as db:
+            cursor = await db.execute(
+                "SELECT state, COUNT(*) FROM FsmStates WHERE state IS NOT NULL "
+                "GROUP BY state"
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return [(row[0], row[1]) for row in rows]
+
+    async def get_geocoding(self, query: str) -> Optional[Tuple[str, int]]:
+        async with self._read("get_geocoding") as db:
+            cursor = await db.execute(
+                "SELECT candidates, expires_at FROM Geocoding WHERE query = ?", (query,)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            return (row[0], row[1]) if row else None
+
+    async def set_geocoding(self, query: str, candidates: str, expires_at: int) -> None:
+        async with self._write("set_geocoding") as db:
+            await db.execute(
+                "INSERT INTO Geocoding (query, candidates, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET candidates = excluded.candidates, "
+                "expires_at = excluded.expires_at",
+                (query, candidates, expires_at),
+            )
+            await db.commit()
+
+    async def delete_geocoding_before(self, expires_at: int) -> int:
+        async with self._write("delete_geocoding_before") as db:
+            cursor = await db.execute(
+                "DELETE FROM Geocoding WHERE expires_at < ?", (expires_at,)
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    async def get_reverse_geocoding_points(
+        self, limit: int
+    ) -> List[Tuple[float, float, str]]:
+        async with self._read("get_reverse_geocoding_points") as db:
+            cursor = await db.execute(
+                "SELECT lat, lon, name FROM ReverseGeocoding ORDER BY rowid DESC LIMIT ?",
+                (limit,),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return [(row[0], row[1], row[2]) for row in rows]
+
+    async def add_reverse_geocoding(
+        self, lat: float, lon: float, name: str, keep: int
+    ) -> None:
+        async with self._write("add_reverse_geocoding") as db:
+            cursor = await db.execute(
+                "INSERT INTO ReverseGeocoding (lat, lon, name) VALUES (?, ?, ?)",
+                (lat, lon, name),
+            )
+            # при старте читаются только keep последних точек, старые лишь занимают место;
+            # rowid растет с каждой вставкой, поэтому граница - диапазон по первичному ключу
+            await db.execute(
+                "DELETE FROM ReverseGeocoding WHERE rowid <= ?", (cursor.lastrowid - keep,)
+            )
+            await db.commit()
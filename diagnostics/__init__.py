@@ -0,0 +1,3 @@
+from diagnostics.task_sampler import TaskStackSampler, task_stack, categorize
+from diagnostics.memory_tracker import MemoryTracker
+from diagnostics.reports import short_path, write_report
\ No newline at end of file
@@ -0,0 +1,86 @@
+import logging
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from diagnostics.reports import short_path, write_report
+
+logger = logging.getLogger(__name__)
+
+# собственные выделения tracemalloc и импорта только зашумляют сравнение
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryTracker:
+    """Снимки tracemalloc по команде администратора без перезапуска бота.
+
+    tracemalloc замедляет выделения памяти, поэтому по умолчанию выключен и
+    включается ``start()``. Каждый ``snapshot()`` сравнивается с предыдущим:
+    в сообщение идут строки с наибольшим ростом, полный список - в файл.
+    """
+
+    def __init__(
+        self, directory: str, frames: int = 10, top: int = 10, keep: int = 20
+    ) -> None:
+        self.directory = directory
+        self.frames = frames
+        self.top = top
+        self.keep = keep
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> bool:
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(self.frames)
+        self._previous = None
+        return True
+
+    def stop(self) -> bool:
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+        self._previous = None
+        return True
+
+    @staticmethod
+    def _format(stat: tracemalloc.StatisticDiff) -> str:
+        frame = stat.traceback[0]
+        return (
+            f"{short_path(frame.filename)}:{frame.lineno} "
+            f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d}), "
+            f"всего {stat.size / 1024:.1f} KiB"
+        )
+
+    def snapshot(self) -> Tuple[List[str], Optional[str]]:
+        """Снимок и сравнение с прошлым; (строки с наибольшим ростом, путь к отчету).
+
+        Первый снимок после ``start()`` - точка отсчета, строк в нем нет.
+        Снимок большого процесса может занимать секунды, его стоит вызывать
+        через ``asyncio.to_thread``.
+        """
+        if not tracemalloc.is_tracing():
+            self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+        previous, self._previous = self._previous, snapshot
+        if previous is None:
+            return [], None
+
+        stats = snapshot.compare_to(previous, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        header = f"traced {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n\n"
+        path = write_report(
+            self.directory,
+            "memory",
+            header + "\n".join(self._format(stat) for stat in stats),
+            self.keep,
+        )
+        logger.info("Сравнение снимков памяти записано в %s", path)
+        return [self._format(stat) for stat in stats[: self.top]], path
@@ -0,0 +1,39 @@
+import os
+import sysconfig
+import time
+from typing import List
+
+
+def short_path(filename: str) -> str:
+    # путь внутри site-packages, стандартной библиотеки или проекта вместо абсолютного
+    path = filename.replace("\\", "/")
+    marker = "site-packages/"
+    index = path.rfind(marker)
+    if index != -1:
+        return path[index + len(marker):]
+    stdlib = sysconfig.get_paths()["stdlib"].replace("\\", "/") + "/"
+    if path.startswith(stdlib):
+        return path[len(stdlib):]
+    cwd = os.getcwd().replace("\\", "/") + "/"
+    return path[len(cwd):] if path.startswith(cwd) else path
+
+
+def write_report(directory: str, prefix: str, text: str, keep: int) -> str:
+    """Пишет отчет в каталог и оставляет только ``keep`` последних с тем же префиксом."""
+    os.makedirs(directory, exist_ok=True)
+    # наносекунды в имени - чтобы два отчета за секунду не перезаписали друг друга
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}"
+    name = f"{prefix}-{stamp}.txt"
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    reports: List[str] = sorted(
+        entry for entry in os.listdir(directory) if entry.startswith(prefix + "-")
+    )
+    for old in reports[: max(0, len(reports) - keep)]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            pass
+    return path
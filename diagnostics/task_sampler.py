@@ -0,0 +1,101 @@
+import asyncio
+import gc
+import types
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+# чего ждет хендлер, видно по модулям в цепочке await'ов; порядок важен:
+# кэш геокодера из api/ ходит в SQLite, а сессия aiogram тоже идет через aiohttp
+CATEGORIES = (
+    ("sqlite", ("/aiosqlite/", "/database/")),
+    ("telegram", ("/aiogram/client/", "/outbound/")),
+    ("quota", ("/api/quota_governor",)),
+    ("upstream", ("/api/",)),
+)
+
+
+def task_stack(task: asyncio.Task, limit: int = 50) -> Stack:
+    """Цепочка await'ов задачи от внешней корутины к самой глубокой.
+
+    ``Task.get_stack()`` для приостановленной корутины отдает один кадр,
+    поэтому цепочка разворачивается вручную по ``cr_await``.
+    """
+    frames: List[Frame] = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None and len(frames) < limit:
+        frame = (
+            getattr(awaitable, "cr_frame", None)
+            or getattr(awaitable, "gi_frame", None)
+            or getattr(awaitable, "ag_frame", None)
+        )
+        if frame is None:
+            # ``await obj`` с __await__, вернувшим coroutine.__await__() (так
+            # устроены методы aiogram): у обертки нет атрибутов, но корутина
+            # видна через gc
+            awaitable = next(
+                (
+                    ref
+                    for ref in gc.get_referents(awaitable)
+                    if isinstance(ref, types.CoroutineType)
+                ),
+                None,
+            )
+            continue
+        code = frame.f_code
+        frames.append((code.co_filename, code.co_name, frame.f_lineno))
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+            or getattr(awaitable, "ag_await", None)
+        )
+    return tuple(frames)
+
+
+def categorize(stack: Stack) -> str:
+    paths = [filename.replace("\\", "/") for filename, _, _ in stack]
+    for category, markers in CATEGORIES:
+        if any(marker in path for path in paths for marker in markers):
+            return category
+    return "other"
+
+
+class TaskStackSampler:
+    """Периодически снимает стек одной задачи, пока его не остановят.
+
+    Запускается, только когда обновление уже обрабатывается дольше порога,
+    так что быстрые обновления стоят одного ``call_later``.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float, max_samples: int) -> None:
+        self.task = task
+        self.interval = interval
+        self.max_samples = max_samples
+        self.samples: "Counter[Stack]" = Counter()
+        self.total = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        self._sample()
+
+    def _sample(self) -> None:
+        if self.task.done() or self.total >= self.max_samples:
+            self._handle = None
+            return
+        self.samples[task_stack(self.task)] += 1
+        self.total += 1
+        loop = asyncio.get_running_loop()
+        self._handle = loop.call_later(self.interval, self._sample)
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def breakdown(self) -> Dict[str, int]:
+        counts: "Counter[str]" = Counter()
+        for stack, count in self.samples.items():
+            counts[categorize(stack)] += count
+        return dict(counts.most_common())
@@ -1,7 +1,15 @@
-from typing import Optional, List, Tuple
+import sys
+from math import ceil
+from typing import Dict, Optional, List, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from callbacks import UserLocationCallback, NextPageCallback, PreviousPageCallback
+from pydantic import ConfigDict
+from callbacks import (
+    UserLocationCallback,
+    NextPageCallback,
+    PreviousPageCallback,
+    ForecastCallback,
+)
 from settings import (
     user_callback_weather,
     user_callback_add_location,
@@ -12,24 +20,100 @@ from settings import (
     user_callback_weather_by_coord_way,
     user_callback_addloc_by_name_way,
     user_callback_addloc_by_coord_way,
+    user_callback_weather_all,
     database,
 )
+from keyboards.page_memo import PageMemo
+
+# ряды кнопок, которые можно безопасно делить между обновлениями
+FrozenRows = Tuple[Tuple[InlineKeyboardButton, ...], ...]
+
+
+class _FrozenButton(InlineKeyboardButton):
+    # модели aiogram изменяемые, общая кнопка не должна меняться под всеми
+    model_config = ConfigDict(frozen=True)
+
+
+def _freeze(markup: InlineKeyboardMarkup) -> FrozenRows:
+    return tuple(
+        tuple(
+            _FrozenButton(**button.model_dump(exclude_none=True)) for button in row
+        )
+        for row in markup.inline_keyboard
+    )
+
+
+def _thaw(rows: FrozenRows) -> InlineKeyboardMarkup:
+    # каждому вызову своя разметка и свои списки рядов, кнопки общие и неизменяемые
+    return InlineKeyboardMarkup(inline_keyboard=[list(row) for row in rows])
+
+
+def _memo_size(rows: FrozenRows) -> int:
+    # getsizeof модели pydantic не видит ее полей, считаем их строки сами
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for button in row:
+            fields = button.__dict__
+            size += sys.getsizeof(button) + sys.getsizeof(fields)
+            size += sum(sys.getsizeof(v) for v in fields.values() if isinstance(v, str))
+    return size
+
+
+# готовые страницы: (user_id, page, after_id, before_id) -> (версия списка, ряды);
+# страница весит несколько килобайт, поэтому кэш ограничен и объемом памяти
+_page_memo = PageMemo(max_entries=1_000, max_bytes=4 * 1024 * 1024, size_of=_memo_size)
 
 
 class UserLocationsKeyboardCreator:
     KB_SIZE = 6
     ADJUST_SIZE = 3
 
+    @classmethod
+    def memo_stats(cls) -> Dict[str, int]:
+        return _page_memo.stats
+
     @classmethod
     async def get_player_locations_keyboard(
         cls,
         user_id: int,
         page: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> Optional[InlineKeyboardMarkup]:
+        if page < 1:
+            return None
+
+        # пока список локаций не менялся, страница та же самая
+        version = await database.get_user_locations_version(user_id)
+        key = (user_id, page, after_id, before_id)
+        if version is not None:
+            rows = _page_memo.get(key, version)
+            if rows is not None:
+                return _thaw(rows)
+
+        markup = await cls._build_player_locations_keyboard(
+            user_id, page, after_id, before_id
+        )
+        if version is not None and markup is not None:
+            _page_memo.set(key, version, _freeze(markup))
+        return markup
+
+    @classmethod
+    async def _build_player_locations_keyboard(
+        cls,
+        user_id: int,
+        page: int,
+        after_id: Optional[int],
+        before_id: Optional[int],
     ) -> Optional[InlineKeyboardMarkup]:
-        locations = await cls._get_page_locations(user_id, page)
+        locations = await database.get_user_locations_page(
+            user_id, cls.KB_SIZE, after_id=after_id, before_id=before_id
+        )
         if not locations:
             return None
-        total_pages = len(locations)
+        total_locations = await database.count_user_locations(user_id)
+        total_pages = ceil(total_locations / cls.KB_SIZE)
 
         location_buttons = [
             [
@@ -38,36 +122,21 @@ class UserLocationsKeyboardCreator:
                     callback_data=UserLocationCallback(location_name=location).pack(),
                 )
             ]
-            for location in locations
+            for _, location in locations
         ]
 
-        nav_buttons = cls._create_navigation_buttons(page, total_pages)
+        nav_buttons = cls._create_navigation_buttons(
+            page, total_pages, first_id=locations[0][0], last_id=locations[-1][0]
+        )
 
         builder = InlineKeyboardBuilder(location_buttons + [nav_buttons])
         builder.adjust(cls.ADJUST_SIZE)
 
         return builder.as_markup()
 
-    @classmethod
-    async def _get_page_locations(cls, user_id: int, page: int) -> List[str]:
-        all_locations = await database.get_user_locations(user_id)
-        if not all_locations:
-            return []
-
-        # Разбиваем на страницы
-        chunks = [
-            all_locations[i : i + cls.KB_SIZE]
-            for i in range(0, len(all_locations), cls.KB_SIZE)
-        ]
-
-        if page < 1 or page > len(chunks):
-            return []
-
-        return chunks[page - 1]
-
     @classmethod
     def _create_navigation_buttons(
-        cls, current_page: int, total_pages: int
+        cls, current_page: int, total_pages: int, first_id: int, last_id: int
     ) -> List[InlineKeyboardButton]:
         buttons = []
 
@@ -75,7 +144,9 @@ class UserLocationsKeyboardCreator:
             buttons.append(
                 InlineKeyboardButton(
                     text="⬅️ Назад",
-                    callback_data=PreviousPageCallback(cur_page=current_page).pack(),
+                    callback_data=PreviousPageCallback(
+                        cur_page=current_page, before_id=first_id
+                    ).pack(),
                 )
             )
 
@@ -89,14 +160,16 @@ class UserLocationsKeyboardCreator:
             buttons.append(
                 InlineKeyboardButton(
                     text="Вперед ➡️",
-                    callback_data=NextPageCallback(cur_page=current_page).pack(),
+                    callback_data=NextPageCallback(
+                        cur_page=current_page, after_id=last_id
+                    ).pack(),
                 )
             )
 
         return buttons
 
 
-def get_main_keyboard() -> InlineKeyboardMarkup:
+def _build_main_keyboard() -> InlineKeyboardMarkup:
     kb = [
         [
             InlineKeyboardButton(
@@ -115,13 +188,19 @@ def get_main_keyboard() -> InlineKeyboardMarkup:
                 callback_data=user_callback_add_location.pack(),
             ),
         ],
+        [
+            InlineKeyboardButton(
+                text="Погода во всех локациях 🗺️",
+                callback_data=user_callback_weather_all.pack(),
+            ),
+        ],
     ]
 
     inline_kb = InlineKeyboardMarkup(inline_keyboard=kb)
     return inline_kb
 
 
-def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
+def _build_back_to_main_keyboard() -> InlineKeyboardMarkup:
     kb = [
         [
             InlineKeyboardButton(
@@ -135,7 +214,7 @@ def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
     return inline_kb
 
 
-def get_check_weather_way_keyboard() -> InlineKeyboardMarkup:
+def _build_check_weather_way_keyboard() -> InlineKeyboardMarkup:
     kb = [
         [
             InlineKeyboardButton(
@@ -161,7 +240,7 @@ def get_check_weather_way_keyboard() -> InlineKeyboardMarkup:
     return inline_kb
 
 
-def get_add_location_way_keyboard() -> InlineKeyboardMarkup:
+def _build_add_location_way_keyboard() -> InlineKeyboardMarkup:
     kb = [
         [
             InlineKeyboardButton(
@@ -185,3 +264,55 @@ def get_add_location_way_keyboard() -> InlineKeyboardMarkup:
 
     inline_kb = InlineKeyboardMarkup(inline_keyboard=kb)
     return inline_kb
+
+
+# статичные клавиатуры собираются один раз при импорте; вызывающий получает
+# свою разметку поверх общих замороженных кнопок
+MAIN_KEYBOARD = _freeze(_build_main_keyboard())
+BACK_TO_MAIN_KEYBOARD = _freeze(_build_back_to_main_keyboard())
+CHECK_WEATHER_WAY_KEYBOARD = _freeze(_build_check_weather_way_keyboard())
+ADD_LOCATION_WAY_KEYBOARD = _freeze(_build_add_location_way_keyboard())
+
+
+def get_main_keyboard() -> InlineKeyboardMarkup:
+    return _thaw(MAIN_KEYBOARD)
+
+
+def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
+    return _thaw(BACK_TO_MAIN_KEYBOARD)
+
+
+def get_check_weather_way_keyboard() -> InlineKeyboardMarkup:
+    return _thaw(CHECK_WEATHER_WAY_KEYBOARD)
+
+
+def get_add_location_way_keyboard() -> InlineKeyboardMarkup:
+    return _thaw(ADD_LOCATION_WAY_KEYBOARD)
+
+
+FORECAST_VIEWS = (("today", "Сегодня"), ("tomorrow", "Завтра"), ("week", "5 дней"))
+
+
+def get_forecast_keyboard(
+    coord: Tuple[float, float], current_view: str
+) -> InlineKeyboardMarkup:
+    lat, lon = round(coord[0], 2), round(coord[1], 2)
+    views = [
+        InlineKeyboardButton(
+            text=f"• {text} •" if view == current_view else text,
+            callback_data=ForecastCallback(lat=lat, lon=lon, view=view).pack(),
+        )
+        for view, text in FORECAST_VIEWS
+    ]
+    kb = [
+        views,
+        [
+            InlineKeyboardButton(
+                text="Меню 📱",
+                callback_data=user_callback_back_to_main_keyboard.pack(),
+            )
+        ],
+    ]
+
+    inline_kb = InlineKeyboardMarkup(inline_keyboard=kb)
+    return inline_kb
@@ -0,0 +1,71 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class PageMemo:
+    """LRU готовых страниц клавиатуры с проверкой версии списка.
+
+    Запись хранит версию списка локаций, из которой собрана страница: при
+    другой версии она считается промахом и удаляется. Размер ограничен и
+    числом страниц, и примерным объемом памяти.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1_000,
+        max_bytes: int = 4 * 1024 * 1024,
+        size_of: Callable[[Any], int] = sys.getsizeof,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+
+        # key -> (версия, ряды, размер)
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, version: int, rows: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = self._size_of(rows)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        self._entries[key] = (version, rows, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
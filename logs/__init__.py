@@ -0,0 +1,9 @@
+from logs.setup import QueuedLogging, QueuedLogHandler
+from logs.aggregation import ErrorAggregator
+from logs.formatter import JsonFormatter, ContextFormatter
+from logs.context import (
+    current_update_id,
+    current_chat_id,
+    current_handler,
+    inject_context,
+)
\ No newline at end of file
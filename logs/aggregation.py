@@ -0,0 +1,121 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+
+class _Window:
+    __slots__ = ("started_at", "passed", "suppressed", "sample", "exc_name")
+
+    def __init__(self, started_at: float, sample: logging.LogRecord) -> None:
+        self.started_at = started_at
+        self.passed = 1
+        self.suppressed = 0
+        self.sample = sample
+        # exc_info у образца обнулится перед очередью, тип запоминаем сразу
+        self.exc_name = sample.exc_info[0].__name__ if sample.exc_info else None
+
+
+class ErrorAggregator:
+    """Схлопывает одинаковые предупреждения и ошибки.
+
+    Одинаковые - это один логгер, уровень, шаблон сообщения, тип исключения
+    и хендлер. За окно ``interval`` секунд проходят первые ``burst`` записей,
+    остальные только считаются; по окончании окна выходит одна сводка
+    "повторилось еще N раз". Так сбой OpenWeatherMap дает несколько строк в
+    минуту, а не строку на каждый запрос пользователя.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        burst: int = 5,
+        max_keys: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self._clock = clock
+        self._windows: "OrderedDict[Hashable, _Window]" = OrderedDict()
+        self._next_scan = 0.0
+        self._pending: List[logging.LogRecord] = []
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Hashable:
+        exc_type = record.exc_info[0] if record.exc_info else None
+        return (
+            record.name,
+            record.levelno,
+            record.msg,
+            exc_type,
+            getattr(record, "handler", None),
+        )
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+
+        now = self._clock()
+        key = self._key(record)
+        window = self._windows.get(key)
+        if window is None or now - window.started_at >= self.interval:
+            if window is not None and window.suppressed:
+                self._pending.append(self._summary(window))
+            self._windows[key] = _Window(now, record)
+            self._windows.move_to_end(key)
+            if len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+            return True
+
+        if window.passed < self.burst:
+            window.passed += 1
+            return True
+        window.suppressed += 1
+        self.suppressed += 1
+        return False
+
+    def expired(self) -> List[logging.LogRecord]:
+        """Сводки по окнам, которые закончились и в которых что-то скрыто."""
+        summaries, self._pending = self._pending, []
+        now = self._clock()
+        if now < self._next_scan:
+            return summaries
+        self._next_scan = now + min(1.0, self.interval)
+
+        for key, window in list(self._windows.items()):
+            if now - window.started_at < self.interval:
+                continue
+            del self._windows[key]
+            if window.suppressed:
+                summaries.append(self._summary(window))
+        return summaries
+
+    def flush(self) -> List[logging.LogRecord]:
+        """Сводки по всем окнам сразу, например при остановке."""
+        summaries, self._pending = self._pending, []
+        summaries.extend(
+            self._summary(window)
+            for window in self._windows.values()
+            if window.suppressed
+        )
+        self._windows.clear()
+        return summaries
+
+    def _summary(self, window: _Window) -> logging.LogRecord:
+        sample = window.sample
+        exc = f" ({window.exc_name})" if window.exc_name else ""
+        return logging.makeLogRecord(
+            {
+                "name": sample.name,
+                "levelno": sample.levelno,
+                "levelname": sample.levelname,
+                "msg": "повторилось еще %d раз за %.0f с: %s%s",
+                "args": (window.suppressed, self.interval, sample.getMessage(), exc),
+                "handler": getattr(sample, "handler", None),
+                "update_id": None,
+                "chat_id": None,
+                "repeats": window.suppressed,
+            }
+        )
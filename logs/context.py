@@ -0,0 +1,21 @@
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+# контекст обрабатываемого обновления; задача aiogram на обновление своя,
+# поэтому значения не перемешиваются между пользователями
+current_update_id: ContextVar[Optional[int]] = ContextVar("update_id", default=None)
+current_chat_id: ContextVar[Optional[int]] = ContextVar("chat_id", default=None)
+current_handler: ContextVar[Optional[str]] = ContextVar("handler", default=None)
+
+CONTEXT_FIELDS = ("update_id", "chat_id", "handler")
+
+
+def inject_context(record: logging.LogRecord) -> None:
+    # вызывается в потоке, где залогировали: в потоке слушателя контекста уже нет
+    if not hasattr(record, "update_id"):
+        record.update_id = current_update_id.get()
+    if not hasattr(record, "chat_id"):
+        record.chat_id = current_chat_id.get()
+    if not hasattr(record, "handler"):
+        record.handler = current_handler.get()
@@ -0,0 +1,119 @@
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Dict, Optional
+
+from logs.aggregation import ErrorAggregator
+from logs.context import inject_context
+from logs.formatter import ContextFormatter, JsonFormatter
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class QueuedLogHandler(QueueHandler):
+    """QueueHandler, который никогда не ждет.
+
+    Контекст обновления дописывается в записи здесь, в потоке цикла событий.
+    Одинаковые ошибки схлопывает ErrorAggregator еще до очереди. При полной
+    очереди запись выбрасывается и считается, а не блокирует хендлер.
+    """
+
+    def __init__(
+        self, log_queue: "queue.Queue", aggregator: Optional[ErrorAggregator] = None
+    ) -> None:
+        super().__init__(log_queue)
+        self.aggregator = aggregator
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # слушатель в том же процессе, pickle не нужен; но аргументы и трейсбек
+        # фиксируются сразу, как в QueueHandler.prepare: живой exc_info держит
+        # кадры стека со всеми локальными переменными, пока запись в очереди
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            inject_context(record)
+            if self.aggregator is not None:
+                for summary in self.aggregator.expired():
+                    self.enqueue(summary)
+                if not self.aggregator.allow(record):
+                    return
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class QueuedLogging:
+    """Логирование через очередь и фоновый поток-слушатель.
+
+    Все логгеры пишут в QueuedLogHandler корневого логгера, а в stdout (или
+    ``stream``) пишет только поток QueueListener. Медленный или вставший
+    приемник логов задерживает этот поток, но не цикл событий. ``log_format``
+    - "json" (строка JSON на запись) или "text".
+    """
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        log_format: str = "json",
+        queue_size: int = 10_000,
+        aggregate_interval: float = 60.0,
+        aggregate_burst: int = 5,
+        stream: Optional[IO[str]] = None,
+    ) -> None:
+        self.level = level
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue(queue_size)
+        self.aggregator = ErrorAggregator(aggregate_interval, aggregate_burst)
+        self.handler = QueuedLogHandler(self._queue, self.aggregator)
+
+        self.sink = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        if log_format == "json":
+            self.sink.setFormatter(JsonFormatter())
+        else:
+            self.sink.setFormatter(ContextFormatter(TEXT_FORMAT))
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+
+        self._listener = QueueListener(self._queue, self.sink)
+        self._listener.start()
+
+    def stop(self) -> None:
+        if self._listener is None:
+            return
+        # сводки по еще открытым окнам, чтобы скрытые повторы не потерялись
+        for summary in self.aggregator.flush():
+            self.handler.enqueue(summary)
+        # слушатель дописывает все, что осталось в очереди
+        self._listener.stop()
+        self._listener = None
+        logging.getLogger().removeHandler(self.handler)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.handler.dropped,
+            "suppressed": self.aggregator.suppressed,
+        }
@@ -1,41 +1,210 @@
 import asyncio
-import logging
-import sys
+from typing import Optional
 
 from aiogram import Bot, Dispatcher, html
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
-from settings import database, BOT_TOKEN
+from settings import (
+    callback_dispatcher,
+    database,
+    fsm_storage,
+    weather_api,
+    send_queue,
+    forecast_scheduler,
+    update_recorder,
+    chat_serializer,
+    slow_update_profiler,
+    queued_logging,
+    BOT_TOKEN,
+    BOT_MODE,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_BASE_URL,
+    METRICS_ENABLED,
+    METRICS_HOST,
+    METRICS_PORT,
+    METRICS_PATH,
+)
+from keyboards import UserLocationsKeyboardCreator
+from metrics import (
+    REGISTRY,
+    MetricsServer,
+    cache_collector,
+    stats_collector,
+    fsm_states_collector,
+)
+from middlewares import HandlerMetricsMiddleware, LogContextMiddleware
 
 from routers import (
     main_router,
     saving_location_router,
     checking_locations_router,
     checking_weather_router,
+    subscriptions_router,
+    forecast_router,
+    admin_router,
     catching_unknown_updates_router,
 )
 
-dp = Dispatcher()
+ALLOWED_UPDATES = ["callback_query", "message"]
 
+dp = Dispatcher(storage=fsm_storage)
 
-async def main() -> None:
+# id обновления и чата в каждой записи лога за время обработки
+dp.update.outer_middleware(LogContextMiddleware())
+if update_recorder is not None:
+    dp.update.outer_middleware(update_recorder)
+# обновления одного чата по очереди, повторные нажатия кнопки схлопываются
+dp.update.outer_middleware(chat_serializer)
+if slow_update_profiler is not None:
+    dp.update.outer_middleware(slow_update_profiler)
+
+dp.include_routers(
+    main_router,
+    saving_location_router,
+    checking_locations_router,
+    checking_weather_router,
+    subscriptions_router,
+    forecast_router,
+    callback_dispatcher.router,
+    admin_router,
+    catching_unknown_updates_router,
+)
 
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+# время хендлеров по роутерам; роутеры плоские, поэтому достаточно вложенных в dp
+handler_metrics = HandlerMetricsMiddleware()
+for router in dp.sub_routers:
+    router.message.middleware(handler_metrics)
+    router.callback_query.middleware(handler_metrics)
 
-    dp.include_routers(
-        main_router,
-        saving_location_router,
-        checking_locations_router,
-        checking_weather_router,
-        catching_unknown_updates_router,
+# статистика компонентов читается только при запросе /metrics
+REGISTRY.add_collector(
+    cache_collector(
+        {
+            "weather": lambda: weather_api.cache_stats,
+            "forecast": lambda: weather_api.forecast_cache_stats,
+            "geocoding": lambda: weather_api.geocoding_stats,
+            "reverse_geocoding": lambda: weather_api.reverse_geocoding_stats,
+            "user_locations": lambda: database.locations_cache_stats,
+            "fsm": lambda: fsm_storage.stats,
+            "locations_keyboard": UserLocationsKeyboardCreator.memo_stats,
+        }
     )
+)
+components = {
+    "weather_api_quota": lambda: weather_api.quota_stats,
+    "weather_api_breaker": lambda: weather_api.breaker_stats,
+    "send_queue": lambda: send_queue.stats,
+    "forecast_scheduler": lambda: forecast_scheduler.stats,
+    "logging": lambda: queued_logging.stats,
+    "chat_serializer": lambda: chat_serializer.stats,
+}
+if slow_update_profiler is not None:
+    components["slow_updates"] = lambda: slow_update_profiler.stats
+REGISTRY.add_collector(stats_collector(components))
+REGISTRY.add_collector(fsm_states_collector(database.count_fsm_states))
+
 
+@dp.startup()
+async def on_startup(bot: Bot) -> None:
     await database.initialize()
+    fsm_storage.start()
+    await weather_api.start()
+    send_queue.start(bot)
+    await forecast_scheduler.start()
+
+
+@dp.shutdown()
+async def on_shutdown() -> None:
+    await forecast_scheduler.stop()
+    await send_queue.stop()
+    await weather_api.close()
+    await fsm_storage.close()
+    await database.close()
+    if update_recorder is not None:
+        update_recorder.close()
+
+
+def create_bot() -> Bot:
+    return Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+
+def create_webhook_app(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    path: str = WEBHOOK_PATH,
+    secret_token: Optional[str] = WEBHOOK_SECRET,
+) -> web.Application:
+    # обновления из POST-запросов идут в тот же диспетчер и роутеры, что и при polling
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dispatcher, bot=bot, secret_token=secret_token
+    ).register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def register_webhook(bot: Bot) -> None:
+    if not WEBHOOK_BASE_URL:
+        return
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=ALLOWED_UPDATES,
+    )
+
+
+async def run_polling(bot: Bot) -> None:
+    await bot.delete_webhook()
+    await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
+
+
+async def run_webhook(bot: Bot) -> None:
+    if not WEBHOOK_SECRET:
+        # вебхук зарегистрирован снаружи, а сгенерированный секрет Telegram не узнает
+        raise RuntimeError(
+            "В режиме webhook без webhook_base_url нужно задать webhook_secret"
+        )
+    dp.startup.register(register_webhook)
+
+    runner = web.AppRunner(create_webhook_app(dp, bot))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
+
+async def main() -> None:
+    bot = create_bot()
+
+    metrics_server = MetricsServer(
+        REGISTRY, host=METRICS_HOST, port=METRICS_PORT, path=METRICS_PATH
+    )
+    if METRICS_ENABLED:
+        await metrics_server.start()
 
-    await dp.start_polling(bot, allowed_updates=["callback_query", "message"])
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(bot)
+        else:
+            await run_polling(bot)
+    finally:
+        await metrics_server.stop()
 
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
-    asyncio.run(main())
+    queued_logging.start()
+    try:
+        asyncio.run(main())
+    finally:
+        queued_logging.stop()
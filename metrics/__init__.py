@@ -0,0 +1,13 @@
+from metrics.registry import Counter, Histogram, MetricFamily, MetricsRegistry
+from metrics.instruments import (
+    REGISTRY,
+    HANDLER_SECONDS,
+    HANDLER_ERRORS,
+    SQLITE_QUERY_SECONDS,
+    UPSTREAM_REQUEST_SECONDS,
+    UPSTREAM_RESPONSES,
+    UPSTREAM_RETRIES,
+    CIRCUIT_TRANSITIONS,
+)
+from metrics.collectors import cache_collector, stats_collector, fsm_states_collector
+from metrics.server import MetricsServer, create_metrics_app
\ No newline at end of file
@@ -0,0 +1,71 @@
+from typing import Awaitable, Callable, Dict, List, Mapping, Tuple
+
+from metrics.registry import Collector, MetricFamily
+
+Stats = Callable[[], Mapping[str, float]]
+
+# под какими ключами компоненты отдают размер кэша
+CACHE_SIZE_KEYS = ("entries", "points", "users", "hot_entries")
+
+
+def cache_collector(caches: Dict[str, Stats]) -> Collector:
+    """Попадания, промахи и размер кэшей из их ``stats``."""
+
+    def collect() -> List[MetricFamily]:
+        hits = MetricFamily(
+            "weather_bot_cache_hits", "counter", "Попадания в кэш", ("cache",)
+        )
+        misses = MetricFamily(
+            "weather_bot_cache_misses", "counter", "Промахи кэша", ("cache",)
+        )
+        size = MetricFamily(
+            "weather_bot_cache_entries", "gauge", "Записей в кэше", ("cache",)
+        )
+        for name, stats in caches.items():
+            values = stats()
+            hits.add((name,), values.get("hits", 0), "_total")
+            misses.add((name,), values.get("misses", 0), "_total")
+            for key in CACHE_SIZE_KEYS:
+                if key in values:
+                    size.add((name,), values[key])
+                    break
+        return [hits, misses, size]
+
+    return collect
+
+
+def stats_collector(components: Dict[str, Stats]) -> Collector:
+    """Вся статистика компонентов (очереди, квота, рассылка) как gauge."""
+
+    def collect() -> List[MetricFamily]:
+        family = MetricFamily(
+            "weather_bot_component_stat",
+            "gauge",
+            "Значения stats компонентов бота",
+            ("component", "stat"),
+        )
+        for name, stats in components.items():
+            for key, value in stats().items():
+                family.add((name, key), value)
+        return [family]
+
+    return collect
+
+
+def fsm_states_collector(
+    count_states: Callable[[], Awaitable[List[Tuple[str, int]]]]
+) -> Collector:
+    """Сколько пользователей сейчас в каждом состоянии FSM."""
+
+    async def collect() -> List[MetricFamily]:
+        family = MetricFamily(
+            "weather_bot_fsm_states",
+            "gauge",
+            "Пользователей в состоянии FSM",
+            ("state",),
+        )
+        for state, count in await count_states():
+            family.add((state,), count)
+        return [family]
+
+    return collect
@@ -0,0 +1,40 @@
+from metrics.registry import MetricsRegistry
+
+# общий реестр процесса, его отдает /metrics
+REGISTRY = MetricsRegistry()
+
+HANDLER_SECONDS = REGISTRY.histogram(
+    "weather_bot_handler_seconds",
+    "Время обработки обновления хендлером",
+    ("router", "handler"),
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "weather_bot_handler_errors",
+    "Исключения, вылетевшие из хендлера",
+    ("router", "handler"),
+)
+SQLITE_QUERY_SECONDS = REGISTRY.histogram(
+    "weather_bot_sqlite_query_seconds",
+    "Время запроса к SQLite вместе с ожиданием соединения",
+    ("method",),
+)
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "weather_bot_upstream_request_seconds",
+    "Время HTTP-запроса к OpenWeatherMap без ожидания квоты",
+    ("endpoint",),
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "weather_bot_upstream_responses",
+    "Ответы OpenWeatherMap по коду статуса (error - сетевая ошибка)",
+    ("endpoint", "status"),
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "weather_bot_upstream_retries",
+    "Повторы запросов к OpenWeatherMap после таймаута или 5xx",
+    ("endpoint",),
+)
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "weather_bot_circuit_transitions",
+    "Переходы предохранителя внешнего сервиса в состояние",
+    ("breaker", "state"),
+)
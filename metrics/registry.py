@@ -0,0 +1,216 @@
+import asyncio
+import math
+from bisect import bisect_left
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+# границы по умолчанию (секунды): от быстрого запроса в SQLite до медленного API
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class MetricFamily:
+    """Метрика, собранная в момент запроса /metrics: имя, тип и набор значений."""
+
+    def __init__(
+        self, name: str, kind: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples: List[Tuple[str, LabelValues, float]] = []
+
+    def add(self, labels: Sequence[str], value: float, suffix: str = "") -> None:
+        self.samples.append((suffix, tuple(str(label) for label in labels), value))
+
+    def render(self, lines: List[str]) -> None:
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for suffix, labels, value in self.samples:
+            names = self.labelnames
+            if len(labels) > len(names):
+                # у бакетов гистограммы в конце добавлен le
+                names = names + ("le",)
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, labels)} {_format_value(value)}"
+            )
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter:
+    """Монотонный счетчик с метками. ``labels()`` кэширует дочерний счетчик."""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "counter", self.documentation, self.labelnames)
+        for values, child in self._children.items():
+            family.add(values, child.value, "_total")
+        return family
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # последний элемент - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами.
+
+    Наблюдение - бинарный поиск по границам и три сложения, накопительные
+    суммы по бакетам считаются только при выдаче /metrics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "histogram", self.documentation, self.labelnames)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                family.add(values + (_format_value(bound),), cumulative, "_bucket")
+            family.add(values, child.sum, "_sum")
+            family.add(values, child.count, "_count")
+        return family
+
+
+Metric = Union[Counter, Histogram]
+Collector = Callable[[], Union[Iterable[MetricFamily], Awaitable[Iterable[MetricFamily]]]]
+
+
+class MetricsRegistry:
+    """Набор метрик и сборщиков, которые выдаются в текстовом формате Prometheus.
+
+    Сборщики вызываются только при запросе /metrics и читают уже имеющуюся
+    статистику компонентов (``stats`` кэшей, очередей), поэтому ничего не
+    стоят на горячем пути.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    async def collect(self) -> List[MetricFamily]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            result: Any = collector()
+            if asyncio.iscoroutine(result):
+                result = await result
+            families.extend(result)
+        return families
+
+    async def render(self) -> str:
+        lines: List[str] = []
+        for family in await self.collect():
+            family.render(lines)
+        return "\n".join(lines) + "\n"
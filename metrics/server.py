@@ -0,0 +1,53 @@
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from metrics.registry import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_metrics_app(
+    registry: MetricsRegistry, path: str = "/metrics"
+) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        body = await registry.render()
+        return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(path, handle)
+    return app
+
+
+class MetricsServer:
+    """Отдельный HTTP-сервер для /metrics, чтобы не светить метрики на порту вебхука."""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        host: str = "127.0.0.1",
+        port: int = 9100,
+        path: str = "/metrics",
+    ) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(create_metrics_app(self.registry, self.path))
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info("Метрики на http://%s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,5 @@
+from middlewares.update_recorder import UpdateRecorder, sanitize_update
+from middlewares.handler_metrics import HandlerMetricsMiddleware
+from middlewares.slow_update_profiler import SlowUpdateProfiler, describe_update
+from middlewares.log_context import LogContextMiddleware
+from middlewares.chat_serializer import ChatSerializer
\ No newline at end of file
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from middlewares.log_context import update_chat_id
+
+logger = logging.getLogger(__name__)
+
+
+class _ChatSlot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # сколько обновлений чата держат или ждут lock
+        self.users = 0
+
+
+class ChatSerializer(BaseMiddleware):
+    """Обрабатывает обновления одного чата по очереди, разные чаты - параллельно.
+
+    Повторное нажатие той же кнопки того же сообщения, пока первое еще
+    обрабатывается или ждет очереди, хендлер не запускает: на callback сразу
+    отвечается пустым answer, чтобы у пользователя не крутились часики.
+    Очередь чата - asyncio.Lock, он будит ожидающих в порядке прихода.
+    """
+
+    def __init__(self) -> None:
+        self._slots: Dict[int, _ChatSlot] = {}
+        self._in_flight: Set[Hashable] = set()
+
+        self.serialized = 0
+        self.waited = 0
+        self.collapsed = 0
+
+    @staticmethod
+    def _callback_key(chat_id: int, query: CallbackQuery) -> Hashable:
+        message_id = query.message.message_id if query.message else query.inline_message_id
+        return chat_id, message_id, query.data
+
+    async def _acknowledge(self, query: CallbackQuery, data: Dict[str, Any]) -> None:
+        try:
+            await data["bot"].answer_callback_query(query.id)
+        except TelegramAPIError as e:
+            # callback мог устареть, повтор все равно не нужен
+            logger.debug("Не удалось ответить на повторный callback: %r", e)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        chat_id = update_chat_id(event)
+        if chat_id is None:
+            return await handler(event, data)
+
+        key: Optional[Hashable] = None
+        if event.callback_query is not None:
+            key = self._callback_key(chat_id, event.callback_query)
+            if key in self._in_flight:
+                self.collapsed += 1
+                await self._acknowledge(event.callback_query, data)
+                return None
+            self._in_flight.add(key)
+
+        slot = self._slots.get(chat_id)
+        if slot is None:
+            slot = self._slots[chat_id] = _ChatSlot()
+        slot.users += 1
+        self.serialized += 1
+        if slot.lock.locked():
+            self.waited += 1
+
+        try:
+            async with slot.lock:
+                return await handler(event, data)
+        finally:
+            slot.users -= 1
+            if not slot.users:
+                del self._slots[chat_id]
+            if key is not None:
+                self._in_flight.discard(key)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "serialized": self.serialized,
+            "waited": self.waited,
+            "collapsed": self.collapsed,
+            "active_chats": len(self._slots),
+            "in_flight_callbacks": len(self._in_flight),
+        }
@@ -0,0 +1,68 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.types import CallbackQuery, TelegramObject
+
+from callbacks import CallbackDispatcher
+from logs import current_handler
+from metrics import HANDLER_ERRORS, HANDLER_SECONDS
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время работы и исключения хендлеров в разрезе роутера и хендлера.
+
+    Вешается внутренним middleware на message и callback_query каждого
+    роутера. Роутер - модуль, где объявлен хендлер; для кнопок из
+    CallbackDispatcher берется настоящий хендлер, а не общий ``_route``.
+    Заодно кладет "роутер.хендлер" в контекст логов.
+    """
+
+    def __init__(self) -> None:
+        self._labels: Dict[Callable[..., Any], Tuple[Tuple[str, str], str]] = {}
+
+    def _label(self, callback: Callable[..., Any]) -> Tuple[Tuple[str, str], str]:
+        # (метки метрики, имя для логов)
+        labels = self._labels.get(callback)
+        if labels is None:
+            router = callback.__module__.rsplit(".", 1)[-1]
+            labels = self._labels[callback] = (
+                (router, callback.__name__),
+                f"{router}.{callback.__name__}",
+            )
+        return labels
+
+    def _resolve(
+        self, event: TelegramObject, data: Dict[str, Any]
+    ) -> Callable[..., Any]:
+        callback = data["handler"].callback
+        owner = getattr(callback, "__self__", None)
+        if isinstance(owner, CallbackDispatcher) and isinstance(event, CallbackQuery):
+            resolved = owner.resolve(event.data or "")
+            if resolved is not None:
+                callback = resolved[0].callback
+        return callback
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        labels, name = self._label(self._resolve(event, data))
+        token = current_handler.set(name)
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except SkipHandler:
+            # хендлер отказался от обновления, его обработает следующий роутер
+            raise
+        except Exception:
+            HANDLER_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
+        finally:
+            current_handler.reset(token)
+        HANDLER_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+        return result
@@ -0,0 +1,42 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from logs import current_chat_id, current_update_id
+
+
+def update_chat_id(update: Update) -> Optional[int]:
+    if update.message is not None:
+        return update.message.chat.id
+    if update.callback_query is not None:
+        message = update.callback_query.message
+        if message is not None:
+            return message.chat.id
+        return update.callback_query.from_user.id
+    return None
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Кладет id обновления и чата в контекст логов на время обработки.
+
+    Имя хендлера добавляет HandlerMetricsMiddleware, который и так его
+    определяет.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        update_token = current_update_id.set(event.update_id)
+        chat_token = current_chat_id.set(update_chat_id(event))
+        try:
+            return await handler(event, data)
+        finally:
+            current_chat_id.reset(chat_token)
+            current_update_id.reset(update_token)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from diagnostics import TaskStackSampler, categorize, short_path, write_report
+
+logger = logging.getLogger(__name__)
+
+
+def describe_update(update: Update) -> str:
+    # только тип и команда: текст и id пользователей в отчет не попадают
+    if update.message is not None:
+        text = update.message.text or ""
+        if text.startswith("/"):
+            return f"message {text.split(maxsplit=1)[0]}"
+        return "message location" if update.message.location else "message text"
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        return f"callback_query {data.split(':', 1)[0]}"
+    return update.event_type
+
+
+class SlowUpdateProfiler(BaseMiddleware):
+    """Сэмплирует стек обновлений, которые обрабатываются дольше ``threshold``.
+
+    Время замеряется у каждого обновления, но стек задачи начинает сниматься
+    только после порога (раз в ``interval`` секунд), поэтому быстрые
+    обновления ничего не стоят. Отчет медленного обновления - доли времени
+    в ожидании SQLite, OpenWeatherMap, квоты и Telegram и самые частые стеки -
+    пишется в ``directory``, где хранятся ``keep`` последних отчетов. Не
+    чаще одного отчета в ``cooldown`` секунд, чтобы перегрузка не превратилась
+    в запись на диск.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        threshold: float = 2.0,
+        interval: float = 0.005,
+        max_samples: int = 2000,
+        keep: int = 100,
+        cooldown: float = 1.0,
+        top_stacks: int = 5,
+    ) -> None:
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.max_samples = max_samples
+        self.keep = keep
+        self.cooldown = cooldown
+        self.top_stacks = top_stacks
+        self.updates = 0
+        self.slow = 0
+        self.reports = 0
+        self._last_report = 0.0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        if task is None:
+            return await handler(event, data)
+
+        sampler = TaskStackSampler(task, self.interval, self.max_samples)
+        timer = asyncio.get_running_loop().call_later(self.threshold, sampler.start)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            timer.cancel()
+            sampler.stop()
+            self.updates += 1
+            if elapsed >= self.threshold:
+                self.slow += 1
+                await self._report(event, elapsed, sampler)
+
+    def _format(
+        self, event: TelegramObject, elapsed: float, sampler: TaskStackSampler
+    ) -> str:
+        if isinstance(event, Update):
+            title = describe_update(event)
+        else:
+            title = type(event).__name__
+        lines: List[str] = [
+            f"{title}: {elapsed:.3f}s (порог {self.threshold}s)",
+            f"сэмплов {sampler.total} раз в {self.interval * 1000:.0f}ms после порога",
+            "",
+            "ожидание:",
+        ]
+        total = sampler.total or 1
+        for category, count in sampler.breakdown().items():
+            lines.append(f"  {category:<9} {count / total:6.1%}")
+
+        lines += ["", "частые стеки:"]
+        for stack, count in sampler.samples.most_common(self.top_stacks):
+            lines.append(f"  {count} ({count / total:.1%}) - {categorize(stack)}")
+            for filename, name, lineno in stack:
+                lines.append(f"    {short_path(filename)}:{lineno} {name}")
+        return "\n".join(lines) + "\n"
+
+    async def _report(
+        self, event: TelegramObject, elapsed: float, sampler: TaskStackSampler
+    ) -> None:
+        now = time.monotonic()
+        if now - self._last_report < self.cooldown:
+            return
+        self._last_report = now
+        text = self._format(event, elapsed, sampler)
+        try:
+            path = await asyncio.to_thread(
+                write_report, self.directory, "slow", text, self.keep
+            )
+        except OSError as e:
+            logger.warning("Не удалось записать отчет о медленном обновлении: %r", e)
+            return
+        self.reports += 1
+        logger.warning("Медленное обновление %.3f с, профиль в %s", elapsed, path)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"updates": self.updates, "slow": self.slow, "reports": self.reports}
@@ -0,0 +1,155 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from typing import IO, Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# точность координат в записи: ~100 м, сетке кэша погоды этого хватает
+COORD_DIGITS = 3
+
+# дробные числа в тексте - это координаты (/add_location coord, /forecast_coord,
+# ответ в состоянии ввода координат); их округляем так же, как location
+_PRECISE_NUMBER = re.compile(r"-?\d+([.,])\d{%d,}" % (COORD_DIGITS + 1))
+
+
+def _pseudonym(salt: bytes, value: Any) -> int:
+    digest = hmac.new(salt, str(value).encode(), hashlib.sha256).digest()
+    # положительный id в пределах, которые принимает Telegram
+    return int.from_bytes(digest[:6], "big") % (2**40) + 1
+
+
+def _round_number(match: "re.Match[str]") -> str:
+    separator = match.group(1)
+    value = round(float(match.group(0).replace(",", ".")), COORD_DIGITS)
+    return f"{value:.{COORD_DIGITS}f}".replace(".", separator)
+
+
+def _sanitize_text(text: str) -> str:
+    return _PRECISE_NUMBER.sub(_round_number, text)
+
+
+def _sanitize_chat(chat: Dict[str, Any], salt: bytes) -> Dict[str, Any]:
+    return {"id": _pseudonym(salt, chat["id"]), "type": chat.get("type", "private")}
+
+
+def _sanitize_user(user: Dict[str, Any], salt: bytes) -> Dict[str, Any]:
+    return {
+        "id": _pseudonym(salt, user["id"]),
+        "is_bot": user.get("is_bot", False),
+        "first_name": "user",
+    }
+
+
+def _sanitize_message(
+    message: Dict[str, Any], salt: bytes, keep_text: bool = True
+) -> Dict[str, Any]:
+    sanitized = {
+        "message_id": message["message_id"],
+        "date": message["date"],
+        "chat": _sanitize_chat(message["chat"], salt),
+    }
+    if "from" in message:
+        sanitized["from"] = _sanitize_user(message["from"], salt)
+    if keep_text and "text" in message:
+        sanitized["text"] = _sanitize_text(message["text"])
+    if "location" in message:
+        location = message["location"]
+        sanitized["location"] = {
+            "latitude": round(location["latitude"], COORD_DIGITS),
+            "longitude": round(location["longitude"], COORD_DIGITS),
+        }
+    return sanitized
+
+
+def sanitize_update(update: Update, salt: bytes) -> Dict[str, Any]:
+    """Оставляет от обновления только то, что нужно роутерам бота.
+
+    Имена, username, контакты и прочие поля выбрасываются, id пользователей и
+    чатов заменяются стабильными псевдонимами (HMAC с солью записи), координаты
+    округляются, в том числе записанные в тексте и данных кнопок. Остальной
+    текст сохраняется: названия городов и есть нагрузка.
+    """
+    raw = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+    sanitized: Dict[str, Any] = {"update_id": raw["update_id"]}
+    if "message" in raw:
+        sanitized["message"] = _sanitize_message(raw["message"], salt)
+    elif "callback_query" in raw:
+        query = raw["callback_query"]
+        sanitized_query = {
+            "id": query["id"],
+            "chat_instance": str(_pseudonym(salt, query["chat_instance"])),
+            "from": _sanitize_user(query["from"], salt),
+        }
+        if "data" in query:
+            # в данных кнопок бывают имена локаций вида "Локация (lat, lon)"
+            sanitized_query["data"] = _sanitize_text(query["data"])
+        if "message" in query:
+            # текст сообщения бота под кнопками хендлерам не нужен, а в нем бывают локации
+            sanitized_query["message"] = _sanitize_message(
+                query["message"], salt, keep_text=False
+            )
+        sanitized["callback_query"] = sanitized_query
+    return sanitized
+
+
+class UpdateRecorder(BaseMiddleware):
+    """Пишет входящие обновления в NDJSON для последующего воспроизведения.
+
+    Каждая строка - ``{"t": мс от начала записи, "u": обновление}`` без
+    пробелов; обновление очищено ``sanitize_update``. Соль псевдонимов своя
+    у каждой записи и нигде не сохраняется. После ``max_updates`` строк запись
+    прекращается, чтобы забытый флаг не заполнил диск.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_updates: int = 1_000_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = path
+        self.max_updates = max_updates
+        self.recorded = 0
+        self._clock = clock
+        self._salt = os.urandom(16)
+        self._started_at: Optional[float] = None
+        self._file: Optional[IO[str]] = None
+
+    def _write(self, update: Update) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._started_at = self._clock()
+        line = {
+            "t": int((self._clock() - self._started_at) * 1000),
+            "u": sanitize_update(update, self._salt),
+        }
+        self._file.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+        self.recorded += 1
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update) and self.recorded < self.max_updates:
+            try:
+                self._write(event)
+            except (OSError, KeyError, ValueError) as e:
+                # запись - вспомогательная, обработку обновления она не ломает
+                logger.warning("Не удалось записать обновление: %r", e)
+        return await handler(event, data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1 @@
+from outbound.send_queue import OutboundMessage, SendQueue
\ No newline at end of file
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundMessage:
+    __slots__ = ("chat_id", "text", "kwargs", "future", "enqueued_at", "attempts")
+
+    def __init__(
+        self,
+        chat_id: int,
+        text: str,
+        kwargs: Dict[str, Any],
+        future: asyncio.Future,
+        now: float,
+    ) -> None:
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = now
+        self.attempts = 0
+
+
+class SendQueue:
+    """Очередь исходящих сообщений с учетом flood-лимитов Telegram.
+
+    Общий бюджет - token bucket на ``rate`` сообщений в секунду, бюджет чата -
+    не чаще одного сообщения в ``1 / per_chat_rate`` секунд. Чаты с готовыми
+    сообщениями лежат в куче по времени, когда им снова можно писать, поэтому
+    выбор следующего сообщения стоит O(log чатов). На 429 отправка ставится на
+    паузу на ``retry_after``, сообщение возвращается в начало очереди своего
+    чата. Заблокировавший бота чат - постоянная ошибка: его сообщения
+    сбрасываются без повторов.
+    """
+
+    # запас, чтобы не упираться ровно в лимиты Telegram (30/с всего, 1/с в чат)
+    DEFAULT_RATE = 25.0
+    DEFAULT_PER_CHAT_RATE = 1.0
+
+    # окно сетевых повторов и предел для чата, чтобы словарь не рос бесконечно
+    MAX_BACKOFF = 30.0
+    CHAT_NEXT_LIMIT = 10_000
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        per_chat_rate: float = DEFAULT_PER_CHAT_RATE,
+        burst: int = 1,
+        max_in_flight: int = 10,
+        max_retries: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.per_chat_rate = per_chat_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._clock = clock
+
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._sending: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+        self._chats: Dict[int, Deque[OutboundMessage]] = {}
+        # (когда чату снова можно писать, порядковый номер, chat_id)
+        self._ready: List[Tuple[float, int, int]] = []
+        self._in_ready: Set[int] = set()
+        self._chat_next: Dict[int, float] = {}
+        self._seq = itertools.count()
+        self._pending = 0
+        # сообщения, ждущие сетевого повтора, и таймеры их возврата в очередь
+        self._delayed: Dict[OutboundMessage, asyncio.TimerHandle] = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.forbidden = 0
+        self.retried = 0
+        self.flood_waits = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        sending = list(self._sending)
+        for task in sending:
+            task.cancel()
+        # _deliver отменяет future своего сообщения, дожидаемся этого
+        await asyncio.gather(*sending, return_exceptions=True)
+        for message, handle in self._delayed.items():
+            handle.cancel()
+            if not message.future.done():
+                message.future.cancel()
+        self._delayed.clear()
+        for queue in self._chats.values():
+            for message in queue:
+                if not message.future.done():
+                    message.future.cancel()
+        self._chats.clear()
+        self._ready.clear()
+        self._in_ready.clear()
+        self._pending = 0
+
+    def enqueue(self, chat_id: int, text: str, **kwargs: Any) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(chat_id, text, kwargs, future, self._clock())
+        self._push(message)
+        return future
+
+    async def send(self, chat_id: int, text: str, **kwargs: Any):
+        return await self.enqueue(chat_id, text, **kwargs)
+
+    def _push(self, message: OutboundMessage, front: bool = False) -> None:
+        chat_id = message.chat_id
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+        if front:
+            queue.appendleft(message)
+        else:
+            queue.append(message)
+        self._pending += 1
+
+        if chat_id not in self._in_ready:
+            self._in_ready.add(chat_id)
+            heapq.heappush(
+                self._ready, (self._chat_next.get(chat_id, 0.0), next(self._seq), chat_id)
+            )
+        self._wakeup.set()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _delay(self, now: float) -> float:
+        self._refill(now)
+        token_delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return max(self._ready[0][0] - now, self._paused_until - now, token_delay)
+
+    async def _sleep(self, delay: Optional[float]) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                await self._sleep(None)
+                continue
+
+            delay = self._delay(self._clock())
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+
+            await self._slots.acquire()
+            # пока ждали слот, мог прийти 429 или поменяться голова кучи
+            now = self._clock()
+            if not self._ready or self._delay(now) > 0:
+                self._slots.release()
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            self._in_ready.discard(chat_id)
+            queue = self._chats.get(chat_id)
+            if not queue:
+                self._slots.release()
+                continue
+
+            message = queue.popleft()
+            self._pending -= 1
+            self._tokens -= 1
+            next_at = now + 1 / self.per_chat_rate
+            self._remember_chat(chat_id, next_at, now)
+            if queue:
+                self._in_ready.add(chat_id)
+                heapq.heappush(self._ready, (next_at, next(self._seq), chat_id))
+            else:
+                del self._chats[chat_id]
+
+            task = asyncio.create_task(self._deliver(message))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    def _remember_chat(self, chat_id: int, next_at: float, now: float) -> None:
+        self._chat_next[chat_id] = next_at
+        if len(self._chat_next) > self.CHAT_NEXT_LIMIT:
+            # прошедшие отметки больше ничего не ограничивают
+            self._chat_next = {
+                chat: at for chat, at in self._chat_next.items() if at > now
+            }
+
+    async def _deliver(self, message: OutboundMessage) -> None:
+        message.attempts += 1
+        try:
+            result = await self._bot.send_message(
+                message.chat_id, message.text, **message.kwargs
+            )
+        except TelegramRetryAfter as e:
+            # flood control действует на весь бот, поэтому пауза общая
+            self.flood_waits += 1
+            self._paused_until = max(self._paused_until, self._clock() + e.retry_after)
+            self._retry(message, e)
+        except TelegramForbiddenError as e:
+            self.forbidden += 1
+            self._fail(message, e)
+            self._drop_chat(message.chat_id, e)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            self._retry(message, e, backoff=True)
+        except asyncio.CancelledError:
+            # очередь останавливается: ожидающий enqueue() не должен зависнуть
+            if not message.future.done():
+                message.future.cancel()
+            raise
+        except Exception as e:
+            self._fail(message, e)
+        else:
+            latency = self._clock() - message.enqueued_at
+            self.sent += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if not message.future.done():
+                message.future.set_result(result)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    def _retry(
+        self, message: OutboundMessage, error: Exception, backoff: bool = False
+    ) -> None:
+        if message.attempts > self.max_retries:
+            self._fail(message, error)
+            return
+
+        self.retried += 1
+        if not backoff:
+            self._push(message, front=True)
+            return
+
+        # экспоненциальная задержка с разбросом, чтобы повторы не шли пачкой
+        delay = min(self.MAX_BACKOFF, 2 ** (message.attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        self._delayed[message] = asyncio.get_running_loop().call_later(
+            delay, self._push_delayed, message
+        )
+
+    def _push_delayed(self, message: OutboundMessage) -> None:
+        del self._delayed[message]
+        self._push(message, front=True)
+
+    def _fail(self, message: OutboundMessage, error: Exception) -> None:
+        self.failed += 1
+        logger.warning("Сообщение в чат %d не доставлено: %r", message.chat_id, error)
+        if not message.future.done():
+            message.future.set_exception(error)
+
+    def _drop_chat(self, chat_id: int, error: Exception) -> None:
+        queue = self._chats.pop(chat_id, None)
+        if not queue:
+            return
+        # запись в куче удалится лениво, когда до нее дойдет очередь
+        self._pending -= len(queue)
+        for message in queue:
+            self.failed += 1
+            if not message.future.done():
+                message.future.set_exception(error)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._pending + len(self._delayed),
+            "in_flight": len(self._sending),
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "failed": self.failed,
+            "forbidden": self.forbidden,
+            "retried": self.retried,
+            "flood_waits": self.flood_waits,
+            "avg_latency": self.total_latency / self.sent if self.sent else 0.0,
+            "max_latency": self.max_latency,
+        }
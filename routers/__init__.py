@@ -2,4 +2,7 @@ from routers.main_router import main_router
 from routers.saving_location_router import saving_location_router
 from routers.checking_weather_router import checking_weather_router
 from routers.checking_locations_router import checking_locations_router
+from routers.subscriptions_router import subscriptions_router
+from routers.forecast_router import forecast_router
+from routers.admin_router import admin_router
 from routers.catching_unknown_update_router import catching_unknown_updates_router
\ No newline at end of file
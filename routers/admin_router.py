@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from aiogram import Router, html
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from settings import ADMIN_IDS, memory_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class TextMessages:
+    MEMORY_STARTED = "<i>tracemalloc включен, /memory_snapshot снимет точку отсчета</i>"
+    MEMORY_ALREADY_STARTED = "<i>tracemalloc уже включен</i>"
+    MEMORY_STOPPED = "<i>tracemalloc выключен</i>"
+    MEMORY_NOT_STARTED = "<i>tracemalloc не включен</i>"
+    MEMORY_BASELINE = "<i>Точка отсчета снята, следующий /memory_snapshot покажет рост</i>"
+    MEMORY_DIFF = (
+        "<b>Рост памяти с прошлого снимка</b>\n<pre>{lines}</pre>\n"
+        "<i>Полный отчет: {path}</i>"
+    )
+    REQUEST_ERROR = "<i>Произошла ошибка при обработке запроса</i>"
+
+
+async def is_admin(message: Message) -> bool:
+    return message.from_user is not None and message.from_user.id in ADMIN_IDS
+
+
+admin_router = Router()
+admin_router.message.filter(is_admin)
+
+
+@admin_router.message(Command("memory_start"))
+async def cmd_memory_start(message: Message):
+    if memory_tracker.start():
+        await message.answer(TextMessages.MEMORY_STARTED)
+    else:
+        await message.answer(TextMessages.MEMORY_ALREADY_STARTED)
+
+
+@admin_router.message(Command("memory_stop"))
+async def cmd_memory_stop(message: Message):
+    if memory_tracker.stop():
+        await message.answer(TextMessages.MEMORY_STOPPED)
+    else:
+        await message.answer(TextMessages.MEMORY_NOT_STARTED)
+
+
+@admin_router.message(Command("memory_snapshot"))
+async def cmd_memory_snapshot(message: Message):
+    try:
+        # снимок большого процесса занимает секунды, цикл событий не ждет
+        lines, path = await asyncio.to_thread(memory_tracker.snapshot)
+        if path is None:
+            await message.answer(TextMessages.MEMORY_BASELINE)
+            return
+        await message.answer(
+            TextMessages.MEMORY_DIFF.format(
+                lines=html.quote("\n".join(lines)), path=html.quote(path)
+            )
+        )
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.REQUEST_ERROR)
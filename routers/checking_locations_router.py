@@ -1,10 +1,22 @@
-from aiogram import Router, F
+import logging
+from typing import Optional
+
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 
 from keyboards import UserLocationsKeyboardCreator, get_main_keyboard
-from settings import user_callback_location, database, weather_api
+from settings import (
+    callback_dispatcher,
+    user_callback_location,
+    user_callback_weather_all,
+    database,
+    weather_api,
+)
 from callbacks import UserLocationCallback, PreviousPageCallback, NextPageCallback
+from api import QuotaExceededError, format_weather_summary
+
+logger = logging.getLogger(__name__)
 
 
 class LocationTextMessages:
@@ -13,11 +25,61 @@ class LocationTextMessages:
     TECH_ISSUES = "<b>Тех.неполадки</b>"
     SOMETHING_WRONG = "<b>Что-то пошло не так!</b>"
     CANT_SCROLL = "Невозможно пролистнуть"
+    QUOTA_EXCEEDED = "Сервис погоды сейчас перегружен, попробуйте через минуту"
 
 
 checking_locations_router = Router()
 
 
+async def _get_all_locations_weather(user_id: int) -> Optional[str]:
+    locations = await database.get_user_locations_coordinates(user_id)
+    if not locations:
+        return None
+
+    observations = await weather_api.get_observations_by_coords(
+        [(lat, lon) for _, lat, lon in locations]
+    )
+    return format_weather_summary(
+        [(name, observation) for (name, _, _), observation in zip(locations, observations)]
+    )
+
+
+@checking_locations_router.message(Command("weather_all"))
+async def cmd_weather_all(message: Message):
+    try:
+        summary = await _get_all_locations_weather(message.chat.id)
+        if not summary:
+            await message.answer(
+                LocationTextMessages.NO_LOCATIONS, reply_markup=get_main_keyboard()
+            )
+            return
+
+        await message.answer(summary, reply_markup=get_main_keyboard())
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(
+            LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
+        )
+
+
+@callback_dispatcher.register(user_callback_weather_all)
+async def callback_weather_all(callback: CallbackQuery):
+    try:
+        summary = await _get_all_locations_weather(callback.message.chat.id)
+        if not summary:
+            await callback.message.edit_text(
+                LocationTextMessages.NO_LOCATIONS, reply_markup=get_main_keyboard()
+            )
+            return
+
+        await callback.message.edit_text(summary, reply_markup=get_main_keyboard())
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await callback.message.edit_text(
+            LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
+        )
+
+
 @checking_locations_router.message(Command("locations"))
 async def cmd_check_locations(message: Message):
     try:
@@ -37,14 +99,14 @@ async def cmd_check_locations(message: Message):
             LocationTextMessages.LOCATIONS_TITLE,
             reply_markup=kb,
         )
-    except Exception as e:
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(
             LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
         )
-        print(e)
 
 
-@checking_locations_router.callback_query(F.data == user_callback_location.pack())
+@callback_dispatcher.register(user_callback_location)
 async def callback_check_locations(callback: CallbackQuery):
     try:
         user_id = callback.message.chat.id
@@ -63,42 +125,46 @@ async def callback_check_locations(callback: CallbackQuery):
             LocationTextMessages.LOCATIONS_TITLE,
             reply_markup=kb,
         )
-    except Exception as e:
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await callback.message.edit_text(
             LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
         )
-        print(e)
 
 
-@checking_locations_router.callback_query(F.data.contains(UserLocationCallback.__prefix__))
-async def callback_check_location(callback: CallbackQuery):
+@callback_dispatcher.register(UserLocationCallback)
+async def callback_check_location(
+    callback: CallbackQuery, callback_data: UserLocationCallback
+):
     try:
-        data = callback.data.split(":")
         user_id = callback.message.chat.id
-        location = data[1]
+        location = callback_data.location_name
 
         coord = await database.get_location_coordinates(location, user_id)
         weather = await weather_api.get_weather_in_location_by_coord(coord)
         if not weather:
-            await callback.message.edit_text(LocationTextMessages.SOMETHING_WRONG)
+            await callback.message.edit_text(
+                LocationTextMessages.SOMETHING_WRONG, reply_markup=get_main_keyboard()
+            )
+            return
         await callback.message.edit_text(weather, reply_markup=get_main_keyboard())
 
-    except Exception as e:
+    except QuotaExceededError:
+        await callback.answer(LocationTextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await callback.message.edit_text(
             LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
         )
-        print(e)
 
 
-@checking_locations_router.callback_query(F.data.contains(NextPageCallback.__prefix__))
-async def callback_next_page(callback: CallbackQuery):
+@callback_dispatcher.register(NextPageCallback)
+async def callback_next_page(callback: CallbackQuery, callback_data: NextPageCallback):
     try:
-        data = callback.data.split(":")
         user_id = callback.message.chat.id
-        cur_page = int(data[1])
 
         kb = await UserLocationsKeyboardCreator.get_player_locations_keyboard(
-            user_id, cur_page + 1
+            user_id, callback_data.cur_page + 1, after_id=callback_data.after_id
         )
         if kb:
             await callback.message.edit_text(
@@ -108,22 +174,22 @@ async def callback_next_page(callback: CallbackQuery):
         else:
             await callback.answer(LocationTextMessages.CANT_SCROLL)
 
-    except Exception as e:
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await callback.message.edit_text(
             LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
         )
-        print(e)
 
 
-@checking_locations_router.callback_query(F.data.contains(PreviousPageCallback.__prefix__))
-async def callback_previous_page(callback: CallbackQuery):
+@callback_dispatcher.register(PreviousPageCallback)
+async def callback_previous_page(
+    callback: CallbackQuery, callback_data: PreviousPageCallback
+):
     try:
-        data = callback.data.split(":")
         user_id = callback.message.chat.id
-        cur_page = int(data[1])
 
         kb = await UserLocationsKeyboardCreator.get_player_locations_keyboard(
-            user_id, cur_page - 1
+            user_id, callback_data.cur_page - 1, before_id=callback_data.before_id
         )
         if kb:
             await callback.message.edit_text(
@@ -133,8 +199,8 @@ async def callback_previous_page(callback: CallbackQuery):
         else:
             await callback.answer(LocationTextMessages.CANT_SCROLL)
 
-    except Exception as e:
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await callback.message.edit_text(
             LocationTextMessages.TECH_ISSUES, reply_markup=get_main_keyboard()
         )
-        print(e)
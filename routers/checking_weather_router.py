@@ -1,16 +1,22 @@
-from aiogram import F, Router
+import logging
+
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
 from settings import (
+    callback_dispatcher,
     weather_api,
     user_callback_weather,
     user_callback_weather_by_name_way,
     user_callback_weather_by_coord_way,
 )
 from keyboards import get_check_weather_way_keyboard, get_back_to_main_keyboard
+from api import QuotaExceededError
+
+logger = logging.getLogger(__name__)
 
 
 class TextMessages:
@@ -18,6 +24,7 @@ class TextMessages:
     RESPONSE_EXCEPTION = "<i>Ошибка при обработке запроса</i>"
     LOCATION_NOT_FOUND = "<i>Не удалось распознать локацию :(. Попробуйте снова!</i>"
     TECH_ISSUES = "<b>Тех.неполадки</b>"
+    QUOTA_EXCEEDED = "<i>Сервис погоды сейчас перегружен, попробуйте через минуту</i>"
 
     # Сообщения для weather_coord
     ENTER_COORDS = "<i>Введите координаты!</i>"
@@ -59,8 +66,11 @@ async def cmd_get_weather_by_name(message: Message, command: CommandObject):
             if output:
                 await message.answer(output)
                 return
-    except Exception as e:
-        print(e)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+        return
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(TextMessages.RESPONSE_EXCEPTION)
         return
 
@@ -90,8 +100,11 @@ async def cmd_get_weather_by_coord(message: Message, command: CommandObject):
 
     try:
         output = await weather_api.get_weather_in_location_by_coord(coord)
-    except Exception as e:
-        print(e)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+        return
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(TextMessages.RESPONSE_EXCEPTION)
         return
 
@@ -101,14 +114,14 @@ async def cmd_get_weather_by_coord(message: Message, command: CommandObject):
         await message.answer(TextMessages.LOCATION_NOT_FOUND)
 
 
-@checking_weather_router.callback_query(F.data == user_callback_weather.pack())
+@callback_dispatcher.register(user_callback_weather)
 async def callback_get_weather(callback_query: CallbackQuery):
     await callback_query.message.edit_text(
         TextMessages.SELECT_METHOD, reply_markup=get_check_weather_way_keyboard()
     )
 
 
-@checking_weather_router.callback_query(F.data == user_callback_weather_by_name_way.pack())
+@callback_dispatcher.register(user_callback_weather_by_name_way)
 async def callback_get_weather_by_name(
     callback_query: CallbackQuery, state: FSMContext
 ):
@@ -118,9 +131,7 @@ async def callback_get_weather_by_name(
     await state.set_state(HandleCheckingWeather.waiting_for_name)
 
 
-@checking_weather_router.callback_query(
-    F.data == user_callback_weather_by_coord_way.pack()
-)
+@callback_dispatcher.register(user_callback_weather_by_coord_way)
 async def callback_get_weather_by_coord(
     callback_query: CallbackQuery, state: FSMContext
 ):
@@ -143,11 +154,15 @@ async def state_get_name_location(message: Message, state: FSMContext):
                 TextMessages.LOCATION_NOT_DETERMINED,
                 reply_markup=get_back_to_main_keyboard(),
             )
-    except Exception as e:
+    except QuotaExceededError:
+        await message.answer(
+            TextMessages.QUOTA_EXCEEDED, reply_markup=get_back_to_main_keyboard()
+        )
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(
             TextMessages.TECH_ISSUES, reply_markup=get_back_to_main_keyboard()
         )
-        print(e)
     finally:
         await state.clear()
 
@@ -200,8 +215,12 @@ async def state_get_coord_location(message: Message, state: FSMContext):
                     TextMessages.ENTER_COORDS, reply_markup=get_back_to_main_keyboard()
                 )
                 return
-    except Exception as e:
+    except QuotaExceededError:
+        await message.answer(
+            TextMessages.QUOTA_EXCEEDED, reply_markup=get_back_to_main_keyboard()
+        )
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(
             TextMessages.TECH_ISSUES, reply_markup=get_back_to_main_keyboard()
         )
-        print(e)
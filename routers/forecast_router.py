@@ -0,0 +1,132 @@
+import logging
+from typing import Optional, Tuple
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
+
+from api import Forecast, QuotaExceededError, format_forecast_day, format_forecast_week
+from callbacks import ForecastCallback
+from keyboards import get_forecast_keyboard, get_back_to_main_keyboard
+from settings import callback_dispatcher, weather_api
+
+logger = logging.getLogger(__name__)
+
+
+class TextMessages:
+    ENTER_LOCATION = "<i>Введите название локации, например: /forecast Москва</i>"
+    ENTER_COORDS = "<i>Введите координаты, например: /forecast_coord 55.7522 37.6156</i>"
+    INVALID_COORDS = "<i>Неверные аргументы команды. Десятичные числа записываются с точкой.</i>"
+    LOCATION_NOT_FOUND = "<i>Не удалось распознать локацию :(. Попробуйте снова!</i>"
+    NO_FORECAST_FOR_DAY = "<i>На этот день прогноза пока нет</i>"
+    RESPONSE_EXCEPTION = "<i>Ошибка при обработке запроса</i>"
+    QUOTA_EXCEEDED = "<i>Сервис погоды сейчас перегружен, попробуйте через минуту</i>"
+
+    TODAY_TITLE = "Прогноз на сегодня"
+    TOMORROW_TITLE = "Прогноз на завтра"
+    NEAREST_TITLE = "Ближайший прогноз"
+
+
+forecast_router = Router()
+
+
+def render_forecast(forecast: Forecast, view: str) -> str:
+    # из кэша приходит готовый Forecast, здесь только срезы его колонок
+    if view == "week":
+        return format_forecast_week(forecast)
+
+    if view == "tomorrow":
+        daily, title = forecast.day(1), TextMessages.TOMORROW_TITLE
+    else:
+        daily, title = forecast.day(0), TextMessages.TODAY_TITLE
+        if daily is None and forecast.days():
+            # поздно вечером шагов на сегодня уже не осталось
+            daily, title = forecast.days()[0], TextMessages.NEAREST_TITLE
+    if daily is None:
+        return TextMessages.NO_FORECAST_FOR_DAY
+    return format_forecast_day(forecast, daily, title)
+
+
+def _parse_coord(args: Optional[str]) -> Optional[Tuple[float, float]]:
+    parts = args.split() if args else []
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
+
+async def _answer_forecast(message: Message, forecast: Optional[Forecast]) -> None:
+    if forecast is None:
+        await message.answer(TextMessages.LOCATION_NOT_FOUND)
+        return
+    await message.answer(
+        render_forecast(forecast, "today"),
+        reply_markup=get_forecast_keyboard(forecast.coord, "today"),
+    )
+
+
+@forecast_router.message(Command("forecast"))
+async def cmd_forecast_by_name(message: Message, command: CommandObject):
+    if not command.args:
+        await message.answer(TextMessages.ENTER_LOCATION)
+        return
+
+    try:
+        forecast = await weather_api.get_forecast_by_name(command.args)
+        await _answer_forecast(message, forecast)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.RESPONSE_EXCEPTION)
+
+
+@forecast_router.message(Command("forecast_coord"))
+async def cmd_forecast_by_coord(message: Message, command: CommandObject):
+    if not command.args:
+        await message.answer(TextMessages.ENTER_COORDS)
+        return
+    coord = _parse_coord(command.args)
+    if coord is None:
+        await message.answer(TextMessages.INVALID_COORDS)
+        return
+
+    try:
+        forecast = await weather_api.get_forecast_by_coord(coord)
+        await _answer_forecast(message, forecast)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.RESPONSE_EXCEPTION)
+
+
+@callback_dispatcher.register(ForecastCallback)
+async def callback_forecast_view(
+    callback: CallbackQuery, callback_data: ForecastCallback
+):
+    coord = (callback_data.lat, callback_data.lon)
+    try:
+        forecast = await weather_api.get_forecast_by_coord(coord)
+        if forecast is None:
+            await callback.message.edit_text(
+                TextMessages.LOCATION_NOT_FOUND, reply_markup=get_back_to_main_keyboard()
+            )
+            return
+        await callback.message.edit_text(
+            render_forecast(forecast, callback_data.view),
+            reply_markup=get_forecast_keyboard(coord, callback_data.view),
+        )
+    except QuotaExceededError:
+        await callback.answer(TextMessages.QUOTA_EXCEEDED)
+    except TelegramBadRequest:
+        # нажата кнопка уже открытого вида: текст не изменился
+        await callback.answer()
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await callback.message.edit_text(
+            TextMessages.RESPONSE_EXCEPTION, reply_markup=get_back_to_main_keyboard()
+        )
@@ -1,10 +1,14 @@
-from aiogram import Router, F, Bot
+from aiogram import Router, Bot
 from aiogram.filters import Command, CommandStart, CommandObject
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
 
 from settings import weather_api
 from keyboards import get_main_keyboard, get_back_to_main_keyboard
-from settings import user_callback_help, user_callback_back_to_main_keyboard
+from settings import (
+    callback_dispatcher,
+    user_callback_help,
+    user_callback_back_to_main_keyboard,
+)
 
 
 class TextMessages:
@@ -28,6 +32,12 @@ class TextMessages:
 
 <i><b>Пример использования:</b></i>
 <i>    /weather_coord 55.7522 37.6156</i>
+
+<b>/forecast  имя локации:</b> <i>прогноз на сегодня, завтра и 5 дней, /forecast_coord  широта  долгота - по координатам.</i>
+
+<b>/weather_all:</b> <i>погода сразу во всех сохраненных локациях.</i>
+
+<b>/subscribe  ЧЧ:ММ:</b> <i>ежедневная рассылка погоды (по умолчанию в 08:00), /unsubscribe - отключить.</i>
     """
 
     TEXT_MENU = "<b>Меню 😎</b>"
@@ -47,14 +57,14 @@ async def cmd_help_handler(message: Message) -> None:
     await message.answer(TextMessages.TEXT_HELP)
 
 
-@main_router.callback_query(F.data == user_callback_back_to_main_keyboard.pack())
+@callback_dispatcher.register(user_callback_back_to_main_keyboard)
 async def callback_menu_handler(callback: CallbackQuery) -> None:
     await callback.message.edit_text(
         TextMessages.TEXT_MENU, reply_markup=get_main_keyboard()
     )
 
 
-@main_router.callback_query(F.data == user_callback_help.pack())
+@callback_dispatcher.register(user_callback_help)
 async def callback_help_handler(callback_query: CallbackQuery):
     await callback_query.message.edit_text(
         TextMessages.TEXT_HELP, reply_markup=get_back_to_main_keyboard()
@@ -1,3 +1,5 @@
+import logging
+
 from aiogram import Router, F
 from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, ContentType, CallbackQuery
@@ -5,6 +7,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
 from settings import (
+    callback_dispatcher,
     weather_api,
     database,
     user_callback_add_location,
@@ -12,6 +15,9 @@ from settings import (
     user_callback_addloc_by_name_way,
 )
 from keyboards import get_add_location_way_keyboard, get_back_to_main_keyboard
+from api import QuotaExceededError
+
+logger = logging.getLogger(__name__)
 
 
 class TextMessages:
@@ -23,6 +29,7 @@ class TextMessages:
     REQUEST_ERROR = "<i>Произошла ошибка при обработке запроса</i>"
     LOCATION_PROCESSING_ERROR = "<i>Произошла ошибка при обработке локации</i>"
     ACTION_CANCELLED = "<i>Действие успешно отменено!</i>"
+    QUOTA_EXCEEDED = "<i>Сервис погоды сейчас перегружен, попробуйте через минуту</i>"
 
     # Сообщения для координат
     INVALID_COORDS = "<i>Неверные координаты. Используйте точку как разделитель.</i>"
@@ -55,6 +62,10 @@ class HandleSavingLocation(StatesGroup):
 saving_location_router = Router()
 
 
+def _is_valid_coord(coord) -> bool:
+    return -90 <= coord[0] <= 90 and -180 <= coord[1] <= 180
+
+
 @saving_location_router.message(
     Command("cancel"), HandleSavingLocation.waiting_for_sending_location
 )
@@ -85,14 +96,17 @@ async def cmd_add_location(message: Message, command: CommandObject, state: FSMC
     try:
         if args[0] == AddLocationCommandArguments.NAME_ARG and len(args) > 1:
             name_location = " ".join(args[1:])
-            coords = await weather_api.get_location_coords(name_location)
+            coord = await weather_api.get_location_coords(name_location)
 
-            if not coords:
+            if not coord:
                 await message.answer(TextMessages.LOCATION_NOT_FOUND)
                 return
 
             success = await database.add_location(
-                name=name_location, user_id=user_chat_id, lat=coords[0], lon=coords[1]
+                name=name_location,
+                user_id=user_chat_id,
+                lat=coord[0],
+                lon=coord[1],
             )
 
             if success:
@@ -114,8 +128,7 @@ async def cmd_add_location(message: Message, command: CommandObject, state: FSMC
                     await message.answer(TextMessages.INVALID_COORDS)
                     return
 
-                exists = await weather_api.exist_location_by_coord(coords)
-                if not exists:
+                if not _is_valid_coord(coords):
                     await message.answer(TextMessages.LOCATION_NOT_FOUND)
                     return
 
@@ -141,21 +154,21 @@ async def cmd_add_location(message: Message, command: CommandObject, state: FSMC
         else:
             await message.answer(TextMessages.INVALID_ARGUMENT)
 
-    except Exception as e:
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(TextMessages.REQUEST_ERROR)
-        print(e)
 
 
-@saving_location_router.callback_query(F.data == user_callback_add_location.pack())
+@callback_dispatcher.register(user_callback_add_location)
 async def show_add_location_keyboard(callback_query: CallbackQuery):
     await callback_query.message.edit_text(
         TextMessages.SELECT_METHOD, reply_markup=get_add_location_way_keyboard()
     )
 
 
-@saving_location_router.callback_query(
-    F.data == user_callback_addloc_by_coord_way.pack()
-)
+@callback_dispatcher.register(user_callback_addloc_by_coord_way)
 async def setting_state_waiting_for_sending_location(
     callback_query: CallbackQuery, state: FSMContext
 ):
@@ -165,9 +178,7 @@ async def setting_state_waiting_for_sending_location(
     await state.set_state(HandleSavingLocation.waiting_for_sending_location)
 
 
-@saving_location_router.callback_query(
-    F.data == user_callback_addloc_by_name_way.pack()
-)
+@callback_dispatcher.register(user_callback_addloc_by_name_way)
 async def setting_state_waiting_for_sending_name(
     callback_query: CallbackQuery, state: FSMContext
 ):
@@ -201,9 +212,11 @@ async def get_user_location_and_register_it(message: Message, state: FSMContext)
         else:
             await message.answer(TextMessages.LOCATION_EXISTS)
 
-    except Exception as e:
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(TextMessages.LOCATION_PROCESSING_ERROR)
-        print(e)
     finally:
         await state.clear()
 
@@ -225,8 +238,7 @@ async def get_coord_and_register_it(message: Message, state: FSMContext):
             await message.answer(TextMessages.INVALID_COORDS)
             return
 
-        exists = await weather_api.exist_location_by_coord(coords)
-        if not exists:
+        if not _is_valid_coord(coords):
             await message.answer(TextMessages.LOCATION_NOT_FOUND)
             return
 
@@ -245,8 +257,10 @@ async def get_coord_and_register_it(message: Message, state: FSMContext):
             await message.answer(TextMessages.LOCATION_ADDED.format(name=location_name))
         else:
             await message.answer(TextMessages.LOCATION_EXISTS)
-    except Exception as e:
-        print(e)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
         await message.answer(TextMessages.REQUEST_ERROR)
     finally:
         await state.clear()
@@ -255,19 +269,33 @@ async def get_coord_and_register_it(message: Message, state: FSMContext):
 @saving_location_router.message(HandleSavingLocation.waiting_for_sending_name)
 async def get_name_location_and_register_it(message: Message, state: FSMContext):
     name_location = message.text
+    if not name_location or not name_location.strip():
+        await message.answer(TextMessages.SEND_NAME_PROMPT)
+        return
+
     user_chat_id = message.chat.id
-    coords = await weather_api.get_location_coords(name_location)
 
-    if not coords:
-        await message.answer(TextMessages.LOCATION_NOT_FOUND)
-        return
+    try:
+        coord = await weather_api.get_location_coords(name_location)
+        if not coord:
+            await message.answer(TextMessages.LOCATION_NOT_FOUND)
+            return
 
-    success = await database.add_location(
-        name=name_location, user_id=user_chat_id, lat=coords[0], lon=coords[1]
-    )
+        success = await database.add_location(
+            name=name_location,
+            user_id=user_chat_id,
+            lat=coord[0],
+            lon=coord[1],
+        )
 
-    if success:
-        await message.answer(TextMessages.LOCATION_ADDED.format(name=name_location))
-    else:
-        await message.answer(TextMessages.LOCATION_EXISTS)
-    await state.clear()
+        if success:
+            await message.answer(TextMessages.LOCATION_ADDED.format(name=name_location))
+        else:
+            await message.answer(TextMessages.LOCATION_EXISTS)
+    except QuotaExceededError:
+        await message.answer(TextMessages.QUOTA_EXCEEDED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.REQUEST_ERROR)
+    finally:
+        await state.clear()
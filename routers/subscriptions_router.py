@@ -0,0 +1,59 @@
+import logging
+
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+
+from settings import database, forecast_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class TextMessages:
+    SUBSCRIBED = "<i>Каждый день в <b>{time}</b> буду присылать погоду в ваших локациях</i>"
+    UNSUBSCRIBED = "<i>Рассылка отключена</i>"
+    NOT_SUBSCRIBED = "<i>Вы не подписаны на рассылку</i>"
+    INVALID_TIME = "<i>Неверное время. Пример: /subscribe 07:30</i>"
+    REQUEST_ERROR = "<i>Произошла ошибка при обработке запроса</i>"
+
+
+DEFAULT_SUBSCRIPTION_TIME = "08:00"
+
+subscriptions_router = Router()
+
+
+@subscriptions_router.message(Command("subscribe"))
+async def cmd_subscribe(message: Message, command: CommandObject):
+    time_text = command.args or DEFAULT_SUBSCRIPTION_TIME
+    minute_of_day = forecast_scheduler.parse_time(time_text)
+    if minute_of_day is None:
+        await message.answer(TextMessages.INVALID_TIME)
+        return
+
+    try:
+        user_id = message.chat.id
+        await database.set_subscription(user_id, minute_of_day)
+        forecast_scheduler.add(user_id, minute_of_day)
+        await message.answer(
+            TextMessages.SUBSCRIBED.format(
+                time=f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+            )
+        )
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.REQUEST_ERROR)
+
+
+@subscriptions_router.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: Message):
+    try:
+        user_id = message.chat.id
+        deleted = await database.delete_subscription(user_id)
+        forecast_scheduler.remove(user_id)
+        if deleted:
+            await message.answer(TextMessages.UNSUBSCRIBED)
+        else:
+            await message.answer(TextMessages.NOT_SUBSCRIBED)
+    except Exception:
+        logger.exception("Не удалось обработать обновление")
+        await message.answer(TextMessages.REQUEST_ERROR)
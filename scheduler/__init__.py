@@ -0,0 +1 @@
+from scheduler.daily_forecast import DailyForecastScheduler
\ No newline at end of file
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from api import (
+    Priority,
+    WeatherApi,
+    current_max_wait,
+    current_priority,
+    format_weather_summary,
+)
+from database import SqlliteDatabase
+from outbound import SendQueue
+
+logger = logging.getLogger(__name__)
+
+MINUTES_IN_DAY = 24 * 60
+
+
+class DailyForecastScheduler:
+    """Утренняя рассылка погоды подписчикам.
+
+    Подписки разложены по корзинам "минута суток -> пользователи", а в куче
+    лежит по одной записи на непустую корзину. Пробуждение стоит O(log корзин)
+    плюс работа по самим сработавшим подпискам, без обхода всех пользователей.
+    """
+
+    TITLE = "Доброе утро! Погода в ваших локациях ☀️"
+
+    def __init__(
+        self,
+        database: SqlliteDatabase,
+        weather_api: WeatherApi,
+        send_queue: SendQueue,
+        timezone: str = "Europe/Moscow",
+    ) -> None:
+        self._database = database
+        self._weather_api = weather_api
+        self._send_queue = send_queue
+        self._tz = ZoneInfo(timezone)
+
+        self._buckets: Dict[int, Set[int]] = {}
+        self._user_minutes: Dict[int, int] = {}
+        # (unix-время срабатывания, минута суток)
+        self._heap: List[Tuple[float, int]] = []
+        self._scheduled: Set[int] = set()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+
+        self.ticks = 0
+        self.delivered = 0
+        self.places = 0
+        self.failed = 0
+        self.failed_ticks = 0
+
+    @staticmethod
+    def parse_time(text: str) -> Optional[int]:
+        try:
+            hours, minutes = text.strip().split(":")
+            hours, minutes = int(hours), int(minutes)
+        except ValueError:
+            return None
+        if not (0 <= hours < 24 and 0 <= minutes < 60):
+            return None
+        return hours * 60 + minutes
+
+    def _next_fire_at(self, minute_of_day: int, now: Optional[float] = None) -> float:
+        now_dt = datetime.fromtimestamp(now if now is not None else time.time(), self._tz)
+        fire = now_dt.replace(
+            hour=minute_of_day // 60, minute=minute_of_day % 60, second=0, microsecond=0
+        )
+        if fire <= now_dt:
+            fire += timedelta(days=1)
+        return fire.timestamp()
+
+    def add(self, user_id: int, minute_of_day: int) -> None:
+        self.remove(user_id)
+        self._user_minutes[user_id] = minute_of_day
+        self._buckets.setdefault(minute_of_day, set()).add(user_id)
+
+        if minute_of_day not in self._scheduled:
+            self._scheduled.add(minute_of_day)
+            heapq.heappush(self._heap, (self._next_fire_at(minute_of_day), minute_of_day))
+            self._changed.set()
+
+    def remove(self, user_id: int) -> None:
+        minute_of_day = self._user_minutes.pop(user_id, None)
+        if minute_of_day is None:
+            return
+        bucket = self._buckets.get(minute_of_day)
+        if bucket is not None:
+            bucket.discard(user_id)
+            if not bucket:
+                # запись в куче удалится лениво при срабатывании
+                del self._buckets[minute_of_day]
+
+    async def start(self) -> None:
+        for user_id, minute_of_day in await self._database.get_subscriptions():
+            self.add(user_id, minute_of_day)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._deliveries):
+            task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            self._changed.clear()
+            if not self._heap:
+                await self._changed.wait()
+                continue
+
+            fire_at, minute_of_day = self._heap[0]
+            delay = fire_at - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            users = self._buckets.get(minute_of_day)
+            if not users:
+                self._scheduled.discard(minute_of_day)
+                continue
+
+            heapq.heappush(self._heap, (self._next_fire_at(minute_of_day), minute_of_day))
+            task = asyncio.create_task(self.deliver(list(users)))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def deliver(self, user_ids: List[int]) -> None:
+        current_priority.set(Priority.BACKGROUND)
+        self.ticks += 1
+        # задача запущена без ожидающего, исключение иначе потерялось бы молча
+        try:
+            await self._deliver(user_ids)
+        except Exception:
+            self.failed_ticks += 1
+            logger.exception("Рассылка для %d пользователей не удалась", len(user_ids))
+
+    async def _deliver(self, user_ids: List[int]) -> None:
+        user_locations = await self._database.get_locations_for_users(user_ids)
+
+        # одна точка на ячейку сетки, сколько бы пользователей ее ни сохранили
+        places: Dict[Hashable, Tuple[float, float]] = {}
+        for locations in user_locations.values():
+            for _, lat, lon in locations:
+                places.setdefault(self._weather_api.coord_key((lat, lon)), (lat, lon))
+
+        keys = list(places)
+        # хвост большой рассылки должен дождаться квоты, а не получить "нет данных"
+        current_max_wait.set(self._weather_api.quota_wait_budget(len(keys)))
+        observations = await self._weather_api.get_observations_by_coords(
+            [places[key] for key in keys]
+        )
+        by_key = dict(zip(keys, observations))
+        self.places += len(keys)
+        logger.info(
+            "Рассылка: пользователей %d, уникальных мест %d", len(user_locations), len(keys)
+        )
+
+        # сообщения уходят через общую очередь, которая соблюдает flood-лимиты
+        recipients = list(user_locations)
+        futures = [
+            self._send_queue.enqueue(
+                user_id,
+                format_weather_summary(
+                    [
+                        (name, by_key.get(self._weather_api.coord_key((lat, lon))))
+                        for name, lat, lon in user_locations[user_id]
+                    ],
+                    title=self.TITLE,
+                ),
+            )
+            for user_id in recipients
+        ]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+
+        for user_id, result in zip(recipients, results):
+            if not isinstance(result, BaseException):
+                self.delivered += 1
+                continue
+            self.failed += 1
+            if isinstance(result, TelegramForbiddenError):
+                # бот заблокирован - подписка больше не нужна
+                self.remove(user_id)
+                try:
+                    await self._database.delete_subscription(user_id)
+                except Exception:
+                    logger.exception(
+                        "Не удалось удалить подписку пользователя %d", user_id
+                    )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._user_minutes),
+            "buckets": len(self._buckets),
+            "ticks": self.ticks,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "failed_ticks": self.failed_ticks,
+            "places": self.places,
+        }
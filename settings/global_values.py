@@ -1,20 +1,158 @@
 import os
+import secrets
 
 from settings.settings import Settings
-from database import SqlliteDatabase
-from api import WeatherApi
-from callbacks import UserCallback
+from database import SqlliteDatabase, SqlliteStorage, UserLocationsCache
+from api import (
+    WeatherApi,
+    WeatherCache,
+    GeocodingCache,
+    ReverseGeocodingIndex,
+    QuotaGovernor,
+    CircuitBreaker,
+    RetryPolicy,
+)
+from callbacks import CallbackDispatcher, UserCallback
+from scheduler import DailyForecastScheduler
+from outbound import SendQueue
+from middlewares import UpdateRecorder, SlowUpdateProfiler, ChatSerializer
+from diagnostics import MemoryTracker
+from logs import QueuedLogging
 
 # иницилизация настроек для получения некоторых констант
 settings = Settings()
 
+# логи пишет фоновый поток, хендлеры не ждут stdout
+queued_logging = QueuedLogging(
+    level=settings.log_level,
+    log_format=settings.log_format,
+    queue_size=settings.log_queue_size,
+    aggregate_interval=settings.log_aggregate_interval,
+    aggregate_burst=settings.log_aggregate_burst,
+)
+
 # константы для иницилизации ключевых частей бота
 DATABASE_FILE_PATH = os.path.join("resourses", "sqlite.db")
 BOT_TOKEN = settings.bot_token.get_secret_value()
 WEATHER_API_TOKEN = settings.weather_api_token.get_secret_value()
 
-database = SqlliteDatabase(DATABASE_FILE_PATH)
-weather_api = WeatherApi(WEATHER_API_TOKEN)
+# константы режима вебхука
+BOT_MODE = settings.bot_mode
+WEBHOOK_HOST = settings.webhook_host
+WEBHOOK_PORT = settings.webhook_port
+WEBHOOK_PATH = settings.webhook_path
+WEBHOOK_BASE_URL = settings.webhook_base_url
+# без секрета любой, кому виден порт, может прислать поддельное обновление;
+# если бот сам регистрирует вебхук, недостающий секрет генерируется и уходит в set_webhook
+WEBHOOK_SECRET = (
+    settings.webhook_secret.get_secret_value()
+    if settings.webhook_secret
+    else secrets.token_urlsafe(32) if WEBHOOK_BASE_URL else None
+)
+
+# администраторы бота
+ADMIN_IDS = frozenset(settings.admin_ids)
+
+# константы эндпоинта метрик
+METRICS_ENABLED = settings.metrics_enabled
+METRICS_HOST = settings.metrics_host
+METRICS_PORT = settings.metrics_port
+METRICS_PATH = settings.metrics_path
+
+database = SqlliteDatabase(
+    DATABASE_FILE_PATH,
+    locations_cache=UserLocationsCache(
+        max_users=settings.locations_cache_max_users,
+        max_locations=settings.locations_cache_max_locations,
+    ),
+)
+fsm_storage = SqlliteStorage(
+    database,
+    state_ttl=settings.fsm_state_ttl,
+    max_hot=settings.fsm_hot_max_entries,
+    sweep_interval=settings.fsm_sweep_interval,
+)
+weather_api = WeatherApi(
+    WEATHER_API_TOKEN,
+    cache=WeatherCache(
+        ttl=settings.weather_cache_ttl,
+        stale_ttl=settings.weather_cache_stale_ttl,
+        max_entries=settings.weather_cache_max_entries,
+        max_bytes=settings.weather_cache_max_bytes,
+        grid_step=settings.weather_cache_grid_step,
+    ),
+    forecast_cache=WeatherCache(
+        ttl=settings.forecast_cache_ttl,
+        stale_ttl=settings.forecast_cache_stale_ttl,
+        max_entries=settings.forecast_cache_max_entries,
+        grid_step=settings.weather_cache_grid_step,
+    ),
+    governor=QuotaGovernor(
+        rate=settings.weather_api_rate_per_minute / 60,
+        burst=settings.weather_api_burst,
+        max_queue=settings.weather_api_max_queue,
+        max_wait=settings.weather_api_max_wait,
+        background_max_wait=settings.weather_api_background_max_wait,
+    ),
+    geocoding_cache=GeocodingCache(
+        store=database,
+        ttl=settings.geocoding_ttl,
+        negative_ttl=settings.geocoding_negative_ttl,
+        max_entries=settings.geocoding_cache_max_entries,
+    ),
+    reverse_geocoding=ReverseGeocodingIndex(
+        store=database,
+        radius_m=settings.reverse_geocoding_radius_m,
+        max_entries=settings.reverse_geocoding_max_entries,
+    ),
+    breaker=CircuitBreaker(
+        "openweathermap",
+        failure_threshold=settings.weather_api_breaker_failures,
+        recovery_timeout=settings.weather_api_breaker_recovery,
+    ),
+    retry_policy=RetryPolicy(
+        attempts=settings.weather_api_retry_attempts,
+        base_delay=settings.weather_api_retry_base_delay,
+        max_delay=settings.weather_api_retry_max_delay,
+    ),
+    connect_timeout=settings.weather_api_connect_timeout,
+    read_timeout=settings.weather_api_read_timeout,
+)
+send_queue = SendQueue(
+    rate=settings.outbound_rate_per_second,
+    per_chat_rate=settings.outbound_per_chat_rate,
+)
+forecast_scheduler = DailyForecastScheduler(
+    database, weather_api, send_queue, timezone=settings.subscriptions_timezone
+)
+
+# запись входящих обновлений для benchmarks/replay.py, включается update_record_path
+update_recorder = (
+    UpdateRecorder(
+        settings.update_record_path,
+        max_updates=settings.update_record_max_updates,
+    )
+    if settings.update_record_path
+    else None
+)
+
+# обновления одного чата по очереди, повторные нажатия кнопки схлопываются
+chat_serializer = ChatSerializer()
+
+# диагностика: профиль медленных обновлений и снимки памяти по команде администратора
+slow_update_profiler = (
+    SlowUpdateProfiler(
+        settings.slow_update_dir,
+        threshold=settings.slow_update_threshold,
+        keep=settings.slow_update_keep,
+    )
+    if settings.slow_update_profiling
+    else None
+)
+memory_tracker = MemoryTracker(settings.memory_snapshot_dir)
+
+# таблица хендлеров callback-запросов, роутеры регистрируют в ней свои кнопки
+callback_dispatcher = CallbackDispatcher()
 
 # callbacks для main_keyboard(меню)
 user_callback_help = UserCallback(action="show_help")
@@ -22,6 +160,7 @@ user_callback_weather = UserCallback(action="check_weather")
 user_callback_location = UserCallback(action="show_locations")
 user_callback_add_location = UserCallback(action="add_location")
 user_callback_back_to_main_keyboard = UserCallback(action="back_to_main_keyboard")
+user_callback_weather_all = UserCallback(action="weather_all")
 
 # callbacks для check_weather_way_keyboard
 user_callback_weather_by_name_way = UserCallback(action="check_weather_by_name")
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -5,6 +7,103 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     bot_token: SecretStr
     weather_api_token: SecretStr
+
+    # способ получения обновлений: "polling" или "webhook"
+    bot_mode: str = "polling"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/webhook"
+    # секрет из заголовка X-Telegram-Bot-Api-Secret-Token; без него генерируется случайный
+    webhook_secret: Optional[SecretStr] = None
+    # публичный адрес бота; если задан, вебхук регистрируется в Telegram при старте
+    webhook_base_url: Optional[str] = None
+
+    # кэш погоды: время жизни, окно устаревания, границы и шаг сетки координат
+    weather_cache_ttl: int = 600
+    weather_cache_stale_ttl: int = 1800
+    weather_cache_max_entries: int = 10_000
+    weather_cache_max_bytes: int = 16 * 1024 * 1024
+    weather_cache_grid_step: float = 0.05
+
+    # кэш прогноза на 5 дней: OpenWeatherMap обновляет его раз в 3 часа
+    forecast_cache_ttl: int = 60 * 60
+    forecast_cache_stale_ttl: int = 3 * 60 * 60
+    forecast_cache_max_entries: int = 2_000
+
+    # кэш геокодера: сколько помнить найденное название и сколько - ненайденное
+    geocoding_ttl: int = 30 * 24 * 60 * 60
+    geocoding_negative_ttl: int = 24 * 60 * 60
+    geocoding_cache_max_entries: int = 10_000
+
+    # обратное геокодирование: в каком радиусе (м) чужое название подходит точке
+    reverse_geocoding_radius_m: int = 500
+    reverse_geocoding_max_entries: int = 100_000
+
+    # квота OpenWeatherMap: запросов в минуту, запас, длина очереди и макс. ожидание
+    weather_api_rate_per_minute: int = 60
+    weather_api_burst: int = 10
+    weather_api_max_queue: int = 100
+    weather_api_max_wait: float = 5.0
+    # фоновые запросы (рассылки, обновления кэша) ждут дольше; рассылка сама
+    # увеличивает предел, если мест в ней больше, чем успеет пройти за это время
+    weather_api_background_max_wait: float = 300.0
+
+    # устойчивость к сбоям OpenWeatherMap: таймауты одной попытки, число попыток
+    # и пауза между ними, порог и время восстановления предохранителя
+    weather_api_connect_timeout: float = 3.0
+    weather_api_read_timeout: float = 10.0
+    weather_api_retry_attempts: int = 3
+    weather_api_retry_base_delay: float = 0.2
+    weather_api_retry_max_delay: float = 2.0
+    weather_api_breaker_failures: int = 5
+    weather_api_breaker_recovery: float = 30.0
+
+    # исходящие сообщения: общий лимит в секунду и лимит на один чат
+    outbound_rate_per_second: float = 25.0
+    outbound_per_chat_rate: float = 1.0
+
+    # часовой пояс, в котором пользователи указывают время рассылки
+    subscriptions_timezone: str = "Europe/Moscow"
+
+    # кэш локаций пользователей перед SQLite
+    locations_cache_max_users: int = 10_000
+    locations_cache_max_locations: int = 200
+
+    # состояния FSM: сколько живет брошенное состояние, размер горячего слоя, период чистки
+    fsm_state_ttl: int = 24 * 60 * 60
+    fsm_hot_max_entries: int = 10_000
+    fsm_sweep_interval: int = 600
+
+    # логирование: уровень, формат ("json" или "text"), длина очереди и
+    # схлопывание одинаковых ошибок (не больше burst за interval секунд)
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10_000
+    log_aggregate_interval: float = 60.0
+    log_aggregate_burst: int = 5
+
+    # метрики в формате Prometheus на отдельном порту; эндпоинт без авторизации,
+    # поэтому по умолчанию слушает только localhost. Для внешнего Prometheus
+    # задайте metrics_host=0.0.0.0 и закройте порт сетевыми правилами
+    metrics_enabled: bool = True
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 8081
+    metrics_path: str = "/metrics"
+
+    # профиль обновлений дольше порога (секунды) и каталог с последними отчетами
+    slow_update_profiling: bool = True
+    slow_update_threshold: float = 2.0
+    slow_update_dir: str = "resourses/slow_updates"
+    slow_update_keep: int = 100
+
+    # id администраторов (JSON-список в .env), им доступны /memory_* команды
+    admin_ids: List[int] = []
+    memory_snapshot_dir: str = "resourses/memory"
+
+    # запись входящих обновлений для benchmarks/replay.py; без пути запись выключена
+    update_record_path: Optional[str] = None
+    update_record_max_updates: int = 1_000_000
+
     model_config = SettingsConfigDict(
         env_file="resourses/.env", env_file_encoding="utf-8"
     )